@@ -0,0 +1,195 @@
+"""
+清洗管道基准测试
+1. 按规模 (10k/100k/1m) 生成合成数据 (gen_synthetic_jobs.py)，已存在则复用
+2. 分阶段计时: 读取、岗位名称、职位描述、薪资、整行清洗、去重、保存
+3. 以子进程运行完整的 clean_nowcoder_jobs.py，记录端到端耗时与峰值内存 (RSS)
+4. 与保存的基线比较，吞吐下降或内存上涨超过阈值时以非零状态退出
+
+用法:
+    python benchmarks/bench_cleaning.py --scale 10k --save-baseline   # 记录基线
+    python benchmarks/bench_cleaning.py --scale 10k                   # 与基线比较
+    python benchmarks/bench_cleaning.py --scale 100k --workers 4      # 端到端使用多进程
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import clean_nowcoder_jobs as cleaner
+from gen_synthetic_jobs import write_jobs
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不统计峰值内存
+    resource = None
+
+SCALES = {'10k': 10000, '100k': 100000, '1m': 1000000}
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+DATA_DIR = os.path.join(tempfile.gettempdir(), 'nowcoder_bench')
+TOLERANCE = 0.2  # 吞吐下降 / 内存上涨超过 20% 视为回归
+
+
+def ensure_dataset(rows, seed):
+    """生成 (或复用) 指定规模的 NDJSON 合成数据"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f'synthetic_{rows}_{seed}.ndjson')
+    if not os.path.exists(path):
+        print(f"生成合成数据: {path} ...")
+        write_jobs(path, rows, seed)
+    return path
+
+
+def timed(results, stage, rows, func):
+    """运行一个阶段并记录耗时与吞吐"""
+    start = time.perf_counter()
+    value = func()
+    elapsed = time.perf_counter() - start
+    results[stage] = {
+        'seconds': round(elapsed, 4),
+        'rows_per_sec': round(rows / elapsed, 1) if elapsed > 0 else None,
+    }
+    print(f"  {stage:<14} {elapsed:8.3f} s  {results[stage]['rows_per_sec'] or 0:>12,.0f} rows/s")
+    return value
+
+
+def bench_stages(path, rows):
+    """在进程内逐阶段计时，每个阶段前重建缓存，避免前一阶段的缓存影响结果"""
+    results = {}
+    print("分阶段计时:")
+    records = timed(results, 'load', rows, lambda: list(cleaner.iter_records(path)))
+
+    titles = [cleaner.clean_text(r.get('岗位名称', '')) for r in records]
+    descs = [cleaner.clean_text(r.get('职位描述', '')) for r in records]
+    salaries = [cleaner.clean_text(r.get('薪资', '')) for r in records]
+
+    cleaner.configure_memo()
+    timed(results, 'title', rows, lambda: [cleaner.normalize_job_title(t) for t in titles])
+    timed(results, 'description', rows, lambda: [cleaner.extract_from_description(d) for d in descs])
+    cleaner.configure_memo()
+    timed(results, 'salary', rows, lambda: [cleaner.extract_salary(s) for s in salaries])
+
+    cleaner.configure_memo()
+    stats = Counter()
+    cleaned = timed(results, 'clean_row', rows, lambda: [cleaner.clean_row(r, stats) for r in records])
+
+    def dedup():
+        state = cleaner.DedupState()
+        kept = []
+        dedup_stats = Counter()
+        for new_row in cleaned:
+            if state.check(new_row, cleaner.row_job_id(new_row)) is None:
+                state.add(new_row, dedup_stats)
+                kept.append(new_row)
+        return kept
+    kept = timed(results, 'dedup', rows, dedup)
+
+    def save():
+        with tempfile.TemporaryDirectory() as tmp:
+            with cleaner.JsonArrayWriter(os.path.join(tmp, 'out.json')) as out:
+                for row in kept:
+                    out.write(row)
+    timed(results, 'save', len(kept), save)
+    return results
+
+
+def bench_end_to_end(path, rows, extra_args):
+    """子进程运行完整清洗脚本，返回耗时、吞吐和峰值 RSS (MB)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cmd = [sys.executable, os.path.join(ROOT_DIR, 'clean_nowcoder_jobs.py'),
+               '--input', path,
+               '--output', os.path.join(tmp, 'out.json'),
+               '--high-value', os.path.join(tmp, 'high_value.json'),
+               '--report', os.path.join(tmp, 'report.json')] + extra_args
+        start = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+    peak_rss_mb = None
+    if resource is not None:
+        # Linux 上 ru_maxrss 单位为 KB，macOS 为字节
+        maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        peak_rss_mb = round(maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    result = {
+        'seconds': round(elapsed, 4),
+        'rows_per_sec': round(rows / elapsed, 1),
+        'peak_rss_mb': peak_rss_mb,
+    }
+    print(f"端到端: {elapsed:.3f} s  {result['rows_per_sec']:,.0f} rows/s  峰值内存: {peak_rss_mb} MB")
+    return result
+
+
+def compare(current, baseline, tolerance):
+    """返回回归项列表: 吞吐低于基线 (1 - tolerance) 或峰值内存高于基线 (1 + tolerance)"""
+    regressions = []
+    for stage, result in current['stages'].items():
+        base = baseline['stages'].get(stage)
+        if base and base.get('rows_per_sec') and result['rows_per_sec'] < base['rows_per_sec'] * (1 - tolerance):
+            regressions.append(f"{stage}: {result['rows_per_sec']:,.0f} rows/s < 基线 {base['rows_per_sec']:,.0f}")
+    e2e, base_e2e = current['end_to_end'], baseline.get('end_to_end', {})
+    if base_e2e.get('rows_per_sec') and e2e['rows_per_sec'] < base_e2e['rows_per_sec'] * (1 - tolerance):
+        regressions.append(f"end_to_end: {e2e['rows_per_sec']:,.0f} rows/s < 基线 {base_e2e['rows_per_sec']:,.0f}")
+    if base_e2e.get('peak_rss_mb') and e2e['peak_rss_mb'] and e2e['peak_rss_mb'] > base_e2e['peak_rss_mb'] * (1 + tolerance):
+        regressions.append(f"peak_rss: {e2e['peak_rss_mb']} MB > 基线 {base_e2e['peak_rss_mb']} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="清洗管道基准测试")
+    parser.add_argument('--scale', choices=sorted(SCALES), default='10k', help="数据规模")
+    parser.add_argument('--seed', type=int, default=42, help="合成数据随机种子")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="基线文件")
+    parser.add_argument('--save-baseline', action='store_true', help="把本次结果保存为该规模的基线")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="回归判定阈值")
+    parser.add_argument('--skip-stages', action='store_true', help="只跑端到端 (大规模时节省内存)")
+    parser.add_argument('--workers', type=int, default=1, help="端到端运行的清洗进程数")
+    args = parser.parse_args()
+
+    rows = SCALES[args.scale]
+    path = ensure_dataset(rows, args.seed)
+    print(f"\n{'='*60}")
+    print(f"清洗基准测试: {args.scale} ({rows:,} 条)  workers={args.workers}")
+    print(f"{'='*60}")
+
+    current = {'rows': rows, 'stages': {}}
+    if not args.skip_stages:
+        current['stages'] = bench_stages(path, rows)
+    current['end_to_end'] = bench_end_to_end(
+        path, rows, ['--workers', str(args.workers)])
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baselines = json.load(f)
+
+    if args.save_baseline:
+        baselines[args.scale] = current
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存: {args.baseline} [{args.scale}]")
+        return 0
+
+    if args.scale not in baselines:
+        print(f"\n没有 {args.scale} 的基线，使用 --save-baseline 记录")
+        return 0
+
+    regressions = compare(current, baselines[args.scale], args.tolerance)
+    if regressions:
+        print("\n✗ 发现性能回归:")
+        for item in regressions:
+            print(f"  - {item}")
+        return 1
+    print("\n✓ 与基线相比无回归")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Kafka 管道基准测试 (不需要集群)
+1. 按规模生成 (或复用) 合成数据，与 bench_cleaning.py 共用数据目录
+2. 通过本地模拟传输 (kafka_transport: memory 或 file[:DIR]) 运行完整的 producer 发送路径
+   (编码、分区、信封打包、回调统计) 并计时
+3. 用同一传输的 consumer 从头消费并解码，计时并核对条数；--decode 选择解码程度:
+   full 完整解析 (清洗时)，summary 只取岗位名称/公司名称/薪资 (--detail 时)，none 只计数
+
+本地模拟没有网络和 broker 开销，结果反映的是客户端侧的编码/分区/解码成本，
+用于比较不同选项 (信封、分区策略、并行) 和检查回归，不代表真实集群的吞吐
+
+用法:
+    python benchmarks/bench_kafka_pipeline.py --scale 10k
+    python benchmarks/bench_kafka_pipeline.py --scale 100k --envelope 100
+    python benchmarks/bench_kafka_pipeline.py --scale 100k --transport file --parallel
+    python benchmarks/bench_kafka_pipeline.py --scale 100k --decode none
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import kafka_jobs_consumer as consumer_app
+import kafka_jobs_producer as producer_app
+import kafka_transport
+from bench_cleaning import SCALES, ensure_dataset
+from clean_nowcoder_jobs import iter_records
+
+
+def bench_produce(path, rows, partitioner, envelope, parallel):
+    """发送整个数据集，返回耗时、吞吐和确认条数"""
+    producer_app.stats = producer_app.ProducerStats()
+    chunks = producer_app.iter_chunks(iter_records(path), producer_app.CHUNK_SIZE)
+    start = time.perf_counter()
+    # 发送函数会打印进度，基准测试只保留最终结果
+    with contextlib.redirect_stdout(io.StringIO()):
+        producer_app.create_topic_if_not_exists()
+        if parallel:
+            producer_app.send_parallel(chunks, time.time(), partitioner, producer_app.NUM_THREADS,
+                                       producer_app.NUM_PRODUCERS, producer_app.NUM_ENCODERS,
+                                       envelope=envelope)
+        else:
+            producer_app.send_serial(chunks, time.time(), partitioner, envelope=envelope)
+    elapsed = time.perf_counter() - start
+    summary = producer_app.stats.snapshot()
+    result = {
+        'seconds': round(elapsed, 4),
+        'rows_per_sec': round(rows / elapsed, 1),
+        'acked': summary['success'],
+        'failed': summary['failed'],
+        'partitions': summary['partitions'],
+    }
+    print(f"  发送  {elapsed:8.3f} s  {result['rows_per_sec']:>12,.0f} rows/s  "
+          f"确认 {result['acked']:,} | 失败 {result['failed']}")
+    return result
+
+
+def decode_full(message):
+    return len(consumer_app.decode_message(message))
+
+
+def decode_summary(message):
+    jobs = consumer_app.decode_message(message, lazy=True)
+    for job in jobs:
+        job.get('岗位名称'), job.get('公司名称'), job.get('薪资')
+    return len(jobs)
+
+
+DECODERS = {'full': decode_full, 'summary': decode_summary, 'none': consumer_app.message_count}
+
+
+def bench_consume(transport, topic, rows, decode):
+    """从头消费到没有新消息为止，返回耗时、吞吐、记录数和消息数"""
+    consumer = transport.consumer(topic, group_id=f'{topic}_bench', auto_offset_reset='earliest',
+                                  consumer_timeout_ms=200)
+    count = messages = 0
+    start = time.perf_counter()
+    try:
+        for message in consumer:
+            count += decode(message)
+            messages += 1
+            if count >= rows:
+                break
+    finally:
+        consumer.close()
+    elapsed = time.perf_counter() - start
+    result = {
+        'seconds': round(elapsed, 4),
+        'rows_per_sec': round(count / elapsed, 1) if elapsed > 0 else None,
+        'records': count,
+        'messages': messages,
+    }
+    print(f"  消费  {elapsed:8.3f} s  {result['rows_per_sec'] or 0:>12,.0f} rows/s  "
+          f"记录 {count:,} | 消息 {messages:,}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kafka 管道基准测试 (本地模拟传输)")
+    parser.add_argument('--scale', choices=sorted(SCALES), default='10k', help="数据规模")
+    parser.add_argument('--seed', type=int, default=42, help="合成数据随机种子")
+    parser.add_argument('--transport', default='memory', help="memory、file 或 file:DIR (file 默认使用临时目录)")
+    parser.add_argument('--envelope', type=int, default=0, help="信封模式每条消息的记录数，0 为逐条发送")
+    parser.add_argument('--partitioner', choices=sorted(producer_app.PARTITIONERS), default=None,
+                        help="分区策略 (默认与 producer 相同: 信封 round-robin，否则 hash)")
+    parser.add_argument('--parallel', action='store_true', help="使用并行发送路径")
+    parser.add_argument('--decode', choices=sorted(DECODERS), default='full',
+                        help="消费端解码程度: full 完整解析，summary 只取三个显示字段，none 只计数")
+    parser.add_argument('--output', help="结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    if args.transport == 'kafka':
+        parser.error("基准测试只支持本地模拟传输 (memory / file[:DIR])")
+    tmp_dir = None
+    spec = args.transport
+    if spec == 'file':
+        tmp_dir = tempfile.mkdtemp(prefix='kafka_bench_')
+        spec = f'file:{tmp_dir}'
+    transport = kafka_transport.from_spec(spec, producer_app.KAFKA_SERVERS)
+
+    rows = SCALES[args.scale]
+    path = ensure_dataset(rows, args.seed)
+    envelope = min(args.envelope, producer_app.CHUNK_SIZE)
+    partitioner_name = args.partitioner or ('round-robin' if envelope > 0 else 'hash')
+    partitioner = producer_app.PARTITIONERS[partitioner_name](producer_app.NUM_PARTITIONS)
+    # 每次运行使用新的 topic，memory 与 file 传输都从空日志开始
+    topic = f'{producer_app.TOPIC_NAME}_bench_{int(time.time() * 1000)}'
+    producer_app.TRANSPORT = transport
+    producer_app.TOPIC_NAME = topic
+
+    print(f"\n{'='*60}")
+    print(f"Kafka 管道基准测试: {args.scale} ({rows:,} 条)  传输={transport.describe()}")
+    print(f"信封={envelope or '否'}  分区策略={partitioner_name}  并行={'是' if args.parallel else '否'}  "
+          f"解码={args.decode}  JSON={producer_app.job_codec.BACKEND}")
+    print(f"{'='*60}")
+
+    try:
+        result = {
+            'scale': args.scale,
+            'rows': rows,
+            'transport': transport.name,
+            'envelope': envelope,
+            'partitioner': partitioner_name,
+            'parallel': args.parallel,
+            'decode': args.decode,
+            'produce': bench_produce(path, rows, partitioner, envelope, args.parallel),
+            'consume': bench_consume(transport, topic, rows, DECODERS[args.decode]),
+        }
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存: {args.output}")
+
+    if result['consume']['records'] != result['produce']['acked'] or result['produce']['failed']:
+        print(f"\n✗ 条数不一致: 确认 {result['produce']['acked']:,} 条，消费 {result['consume']['records']:,} 条")
+        return 1
+    print("\n✓ 发送与消费条数一致")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
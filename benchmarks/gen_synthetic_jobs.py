@@ -0,0 +1,150 @@
+"""
+合成岗位数据生成器 - 用于清洗管道的基准测试
+生成与 nowcoder_jobs_edge.json 相同结构的记录，覆盖清洗脚本需要处理的各种情况：
+1. 岗位名称带城市/批次/编号、"为你推荐"
+2. 公司名称为标签或过短，真实公司名混在职位描述里
+3. 薪资的 K/薪、面议、日薪等格式
+4. 描述中的收藏数、活跃状态、城市、学历、技能关键词
+5. 相同 job_id 的重复记录
+
+用法: python benchmarks/gen_synthetic_jobs.py --rows 100000 --output synthetic_jobs.ndjson
+"""
+
+import argparse
+import json
+import random
+
+CITIES = ["北京", "上海", "广州", "深圳", "杭州", "成都", "武汉", "南京", "西安", "郑州",
+          "合肥", "苏州", "长沙", "东莞", "重庆", "天津"]
+COMPANIES = ["字节跳动", "腾讯", "阿里巴巴", "百度", "美团", "京东", "快手", "网易", "华为HUAWEI",
+             "小米", "数字马力", "海能达通信", "精智达", "bilibili", "米哈游", "中国移动",
+             "招商银行", "深信服", "浙江一木智能科技有限", "广东叶子科技发展有限​"]
+COMPANY_TAGS = ["体验很好", "独角兽企业", "股权激励", "待遇好", "工资高", "互联网综合",
+                "电商", "游戏", "高新技术", "上市公司"]
+ROLES = ["Java后端开发工程师", "C++开发工程师", "前端开发工程师", "算法工程师", "测试开发工程师",
+         "运维工程师", "大数据开发工程师", "嵌入式软件工程师", "产品经理", "Golang开发工程师",
+         "数据分析师", "机器学习工程师", "Python开发实习生", "FPGA工程师"]
+DEGREES = ["本科", "硕士", "博士", "专科", "不限", ""]
+JOB_TYPES = ["后端开发", "前端开发", "AI", "测试", "运维", "数据", "硬件", ""]
+SKILLS = ["java多线程", "SSM", "操作系统", "Redis", "MySQL", "Spring Boot", "深度学习", "Vue",
+          "React", "Linux", "TCP/IP", "Kafka", "Hadoop", "SLAM", "大模型"]
+ACTIVE = ["刚刚有人投递过", "HR近期来过", "HR刚刚处理简历"]
+EXTRA = ["薪资超87%同类职位", "还有1天截止", "HC充足榜", "学历友好榜", "牛客指数榜",
+         "简历直投官网", "牛客专属内推通道"]
+
+
+def random_title(rng):
+    role = rng.choice(ROLES)
+    form = rng.random()
+    if form < 0.03:
+        return "为你推荐"
+    if form < 0.25:
+        return f"【{rng.choice(['25', '26'])}届校招】{role}（{rng.choice(CITIES)}）"
+    if form < 0.40:
+        return f"{role}（{rng.choice(['2025', '2026'])}届校招）-{rng.choice(CITIES)}"
+    if form < 0.50:
+        return f"{rng.choice(['2025', '2026'])}届秋招-{role}"
+    if form < 0.58:
+        return f"{role}-26届校招-J{rng.randint(10000, 99999)}"
+    if form < 0.62:
+        return f"  {role}  "
+    return role
+
+
+def random_salary(rng):
+    form = rng.random()
+    low = rng.randint(5, 40)
+    high = low + rng.randint(2, 20)
+    if form < 0.45:
+        return f"{low}-{high}K·{rng.choice([12, 13, 14, 15, 16, 17])}薪"
+    if form < 0.65:
+        return f"{low}-{high}K"
+    if form < 0.72:
+        return f"{low}-{high}k · {rng.choice([13, 14, 15])}薪"
+    if form < 0.82:
+        return rng.choice(["面议", "薪资面议"])
+    if form < 0.95:
+        day = rng.choice([100, 120, 150, 200, 250, 300])
+        return f"{day}-{day + rng.choice([50, 100, 200])}元/天"
+    return ""
+
+
+def random_description(rng, company):
+    lines = []
+    if rng.random() < 0.3:
+        lines.append(f"{rng.randint(10, 40)}-{rng.randint(41, 80)}K·{rng.randint(12, 17)}薪")
+    if rng.random() < 0.6:
+        lines.append(f"{int(rng.paretovariate(1.2))}位牛友收藏")
+    if rng.random() < 0.3:
+        lines.append(rng.choice(EXTRA))
+    if rng.random() < 0.35:
+        lines.append(rng.choice(ACTIVE))
+    if rng.random() < 0.4:
+        lines.append(rng.choice(CITIES))
+    if rng.random() < 0.7:
+        lines.append(rng.choice(DEGREES[:4]))
+    lines.extend(rng.sample(SKILLS, rng.randint(0, 3)))
+    if rng.random() < 0.7:
+        lines.append(company)
+    if rng.random() < 0.3:
+        lines.append(rng.choice(COMPANY_TAGS))
+    return "\n".join(lines)
+
+
+def generate_jobs(rows, seed=42, duplicate_rate=0.15):
+    """逐条生成合成岗位记录，内存占用与 rows 无关"""
+    rng = random.Random(seed)
+    next_id = 100000
+    for _ in range(rows):
+        if next_id > 100000 and rng.random() < duplicate_rate:
+            # 相同 job_id 不同链接参数的重复记录
+            job_id = str(rng.randint(100000, next_id - 1))
+        else:
+            job_id = str(next_id)
+            next_id += 1
+        company = rng.choice(COMPANIES)
+        yield {
+            '岗位名称': random_title(rng),
+            '公司名称': company if rng.random() < 0.6 else rng.choice(COMPANY_TAGS + ["", "阿"]),
+            '薪资': random_salary(rng),
+            '学历要求': rng.choice(DEGREES),
+            '城市': rng.choice(CITIES) if rng.random() < 0.7 else "",
+            '职位类型': rng.choice(JOB_TYPES),
+            '招聘人数': rng.choice(["", "若干", str(rng.randint(1, 50))]),
+            '公司类型': rng.choice(["", "互联网", "通信电子", "计算机软件"]),
+            '公司性质': rng.choice(["", "民营", "国企", "外企"]),
+            '毕业年份': rng.choice(["", "2025", "2026"]),
+            '每周工作天数': rng.choice(["", "4天/周", "5天/周"]),
+            '实习时长': rng.choice(["", "3个月", "6个月"]),
+            '是否有转正': rng.choice(["", "有转正"]),
+            '职位描述': random_description(rng, company),
+            '职位链接': f"https://www.nowcoder.com/jobs/detail/{job_id}?jobIds={rng.randint(1, 9999)}",
+            'job_id': job_id,
+        }
+
+
+def write_jobs(filepath, rows, seed=42, duplicate_rate=0.15, fmt='ndjson'):
+    """写出合成数据，fmt 为 ndjson 或 json (与爬虫输出相同的 indent=2 数组)"""
+    with open(filepath, 'w', encoding='utf-8') as f:
+        if fmt == 'ndjson':
+            for job in generate_jobs(rows, seed, duplicate_rate):
+                f.write(json.dumps(job, ensure_ascii=False))
+                f.write('\n')
+        else:
+            f.write('[')
+            for i, job in enumerate(generate_jobs(rows, seed, duplicate_rate)):
+                text = json.dumps(job, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+                f.write((',\n  ' if i else '\n  ') + text)
+            f.write('\n]' if rows else ']')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="生成合成岗位数据")
+    parser.add_argument('--rows', type=int, default=10000, help="记录数")
+    parser.add_argument('--output', default='synthetic_jobs.ndjson', help="输出文件")
+    parser.add_argument('--format', choices=['ndjson', 'json'], default='ndjson', help="输出格式")
+    parser.add_argument('--seed', type=int, default=42, help="随机种子")
+    parser.add_argument('--duplicate-rate', type=float, default=0.15, help="重复 job_id 的比例")
+    args = parser.parse_args()
+    write_jobs(args.output, args.rows, args.seed, args.duplicate_rate, args.format)
+    print(f"已生成 {args.rows:,} 条合成数据: {args.output}")
@@ -1,7 +1,25 @@
+import argparse
+import asyncio
+import cProfile
+import hashlib
+import itertools
 import json
 import re
 import os
-from collections import Counter
+import pstats
+import sqlite3
+import sys
+import time
+import zlib
+from array import array
+from collections import Counter, deque, namedtuple
+from functools import lru_cache, partial
+
+# 列式输出为可选功能，pyarrow 导入开销较大 (生产者/消费者也导入本模块)，在 ColumnarWriter 中按需导入
+pa = pq = None
+from multiprocessing import Pool
+
+import job_codec
 
 # ==========================================
 # 配置常量
@@ -10,6 +28,25 @@ INPUT_FILE = 'nowcoder_jobs_edge.json'
 OUTPUT_FILE = 'nowcoder_jobs_cleaned.json'
 HIGH_VALUE_FILE = 'nowcoder_jobs_high_value.json'
 REPORT_FILE = 'cleaning_report.json'
+STATE_FILE = 'cleaning_state.db'  # 增量模式的状态库
+PROFILE_FILE = 'cleaning_profile.pstats'  # --profile 的默认输出
+
+# 流式处理参数
+READ_CHUNK_SIZE = 1 << 20  # 增量解析 JSON 数组时每次读取的字符数
+PARTIAL_TOKEN_SIZE = 16  # 被读取边界截断的记号 (字面量、数字、\uXXXX 转义对) 的最大长度
+REPORT_INTERVAL = 10000  # 每处理多少条刷新一次输出文件和报告
+
+# 多进程参数
+PARALLEL_CHUNK_SIZE = 2000  # 每个分片的记录数
+PARALLEL_MAX_PENDING = 2  # 每个进程最多排队的分片数，限制内存占用
+
+# 近似去重参数 (MinHash + LSH)
+NEAR_DUP_MODES = ['off', 'flag', 'drop']
+NEAR_DUP_CLUSTERS_FILE = 'nowcoder_jobs_clusters.json'  # --clusters 不带文件名时的簇输出文件
+NEAR_DUP_THRESHOLD = 0.8  # 估计 Jaccard 相似度达到该值视为近似重复
+SHINGLE_SIZE = 3  # 字符 shingle 长度
+MINHASH_SIZE = 64  # 签名长度 (须为 2 的幂)
+LSH_BANDS = 16  # 签名分段数，任一段完全相同即为候选
 
 # 公司名称中常见的非真实名称标签
 COMPANY_TAGS = {
@@ -25,7 +62,7 @@ COMPANY_TAGS = {
     "年底双薪", "股票期权", "带薪年假", "绩效奖金", "定期体检"
 }
 
-# 启发式规则：已知的真实大厂名称（用于从描述中匹配）
+# 启发式规则：已知的真实大厂名称（用于从描述中匹配），--company-dict 可追加别名词典
 KNOWN_COMPANIES = [
     "字节跳动", "腾讯", "阿里", "百度", "美团", "京东", "快手", "网易", 
     "华为", "小米", "滴滴", "拼多多", "携程", "小红书", "bilibili", "哔哩哔哩",
@@ -38,6 +75,233 @@ KNOWN_COMPANIES = [
     "金蝶", "亚信", "中兴", "中科院", "研究所"
 ]
 
+# 活跃状态标签
+ACTIVE_TAGS = ["刚刚有人投递过", "HR近期来过", "HR刚刚处理简历"]
+
+# 描述中的城市 (扩展城市列表，列表靠前者优先)
+COMMON_CITIES = [
+    "北京", "上海", "广州", "深圳", "杭州", "成都", "武汉", "南京", "西安", "郑州",
+    "长沙", "苏州", "天津", "重庆", "合肥", "厦门", "珠海", "大连", "青岛", "石家庄",
+    "宁波", "无锡", "福州", "济南", "沈阳", "哈尔滨", "长春", "昆明", "南宁", "贵阳",
+    "南昌", "扬州", "东莞", "佛山"
+]
+
+# 学历 (按优先级)
+DEGREES = ["博士", "硕士", "本科", "专科"]
+
+# 职位类型关键词 (类型按顺序优先，关键词不区分大小写)
+JOB_TYPE_KEYWORDS = {
+    "AI": ["AI", "人工智能", "算法", "深度学习", "机器学习", "NLP", "CV", "机器视觉", "大模型", "SLAM", "机载"],
+    "后端开发": ["Java", "C++", "Python", "Go", "Golang", "PHP", "Node", "后端", "服务器", "高性能计算"],
+    "前端开发": ["前端", "JavaScript", "TypeScript", "Vue", "React", "Web"],
+    "测试": ["测试", "QA"],
+    "运维": ["运维", "SRE", "DevOps"],
+    "数据": ["数据分析", "数据挖掘", "数据开发", "大数据", "ETL"],
+    "硬件": ["硬件", "嵌入式", "芯片", "集成电路", "FPGA"]
+}
+
+# 自动机词组 -> extract_from_description 输出字段
+DESC_CANDIDATE_KEYS = {
+    'city': 'city_candidate',
+    'degree': 'degree_candidate',
+    'job_type': 'job_type_candidate',
+}
+
+# ==========================================
+# 正则注册表
+# ==========================================
+
+# 所有正则在导入时编译一次，清洗时直接复用
+PATTERNS = {
+    # 薪资组合语法，一次匹配区分三种形式 (m.lastgroup 即命中的形式):
+    #   negotiable: 任意位置出现"面议"（优先于其它形式）
+    #   monthly:    15-25K·14薪 / 15-25K· / 15-25K
+    #   daily:      200-300元/天
+    'salary': re.compile(
+        r'(?P<negotiable>\A(?=.*面议))'
+        r'|(?P<monthly>(?P<min>\d+)-(?P<max>\d+)K(?:[·.](?:(?P<months>\d+)薪)?)?)'
+        r'|(?P<daily>(?P<day_min>\d+)-(?P<day_max>\d+)元/天)',
+        re.S
+    ),
+    'collection_count': re.compile(r'(\d+)位牛友收藏'),
+    'title_city': re.compile(r'[（\(](.+?)[）\)]'),
+    'alnum_prefix': re.compile(r'[a-zA-Z0-9]+'),
+    'batch': re.compile(r'(?:\[|【)?(20\d\d|[23]\d)届(?:\]|】|校招|秋招)?'),
+}
+
+# ==========================================
+# 阶段计时
+# ==========================================
+
+class StageTimer:
+    """各清洗阶段的累计耗时与调用次数，写入清洗报告的 timings 部分"""
+
+    def __init__(self):
+        self.seconds = Counter()
+        self.calls = Counter()
+
+    def add(self, stage, seconds, calls=1):
+        self.seconds[stage] += seconds
+        self.calls[stage] += calls
+
+    def clear(self):
+        self.seconds.clear()
+        self.calls.clear()
+
+    def snapshot(self):
+        """{阶段: (秒, 次数)}，用于子进程回传"""
+        return {stage: (self.seconds[stage], self.calls[stage]) for stage in self.calls}
+
+    def merge(self, snapshot):
+        for stage, (seconds, calls) in snapshot.items():
+            self.add(stage, seconds, calls)
+
+    def report(self):
+        return {
+            stage: {
+                "calls": calls,
+                "seconds": round(self.seconds[stage], 4),
+                "avg_us": round(self.seconds[stage] / calls * 1e6, 2) if calls else 0.0,
+            }
+            for stage, calls in self.calls.items()
+        }
+
+# ==========================================
+# 多模式匹配
+# ==========================================
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick 多模式匹配自动机
+    构建一次，之后每段文本只需扫描一遍即可找出全部命中的关键词（含重叠命中）
+    """
+
+    def __init__(self, patterns):
+        """patterns: 可迭代的 (关键词, 附带数据)"""
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        for key, payload in patterns:
+            self._insert(key, payload)
+        self._build_fail_links()
+
+    def _insert(self, key, payload):
+        state = 0
+        for ch in key:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            state = nxt
+        self.out[state].append(payload)
+
+    def _build_fail_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                if state:
+                    f = self.fail[state]
+                    while f and ch not in self.goto[f]:
+                        f = self.fail[f]
+                    self.fail[nxt] = self.goto[f].get(ch, 0)
+                # 合并后缀状态的输出，扫描时无需再沿失败链回溯
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def search(self, text):
+        """返回文本中命中的全部附带数据（去重）"""
+        goto, fail, out = self.goto, self.fail, self.out
+        hits = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                hits.update(out[state])
+        return hits
+
+    def finditer(self, text):
+        """逐个产出 (命中结束位置, 附带数据)，按结束位置递增"""
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for payload in out[state]:
+                yield i + 1, payload
+
+def _desc_patterns(aliases):
+    """
+    描述自动机的全部关键词: (大写关键词, (词组, 优先级, 原关键词, 取值))
+    公司别名的优先级为负的别名长度，与其它词组一样取值越小越优先
+    """
+    for rank, tag in enumerate(ACTIVE_TAGS):
+        yield tag.upper(), ('active', rank, tag, tag)
+    for rank, city in enumerate(COMMON_CITIES):
+        yield city.upper(), ('city', rank, city, city)
+    for rank, deg in enumerate(DEGREES):
+        yield deg.upper(), ('degree', rank, deg, deg)
+    for rank, (type_name, keywords) in enumerate(JOB_TYPE_KEYWORDS.items()):
+        for kw in keywords:
+            yield kw.upper(), ('job_type', rank, kw, type_name)
+    for alias, name in aliases.items():
+        yield alias.upper(), ('company', -len(alias), alias, name)
+
+class CompanyResolver:
+    """
+    公司名称解析器: 持有别名词典 {别名: 规范名}，并把别名与其它描述关键词一起构建为描述自动机，
+    scan_description_keywords 一次扫描即可同时得到城市/学历/职位类型和公司别名；
+    公司取最长的命中别名（同长取最靠前）对应的规范名，避免 "阿里"、"银行" 这类短别名抢先命中；别名区分大小写
+    构建后只读，可在多个清洗上下文 (含不同线程中的) 之间共享
+    """
+
+    def __init__(self, aliases=None):
+        # 规范名驻留以便各记录共享
+        self.aliases = {alias: sys.intern(name) for alias, name in (aliases or {}).items() if alias}
+        self.desc_automaton = KeywordAutomaton(_desc_patterns(self.aliases))
+
+    def canonical(self, name):
+        """name 恰好是某个别名时返回其规范名，否则返回 None"""
+        return self.aliases.get(name)
+
+def load_company_dict(filepath):
+    """
+    读取公司别名词典，返回 {别名: 规范名}，规范名本身也作为别名
+    - .json: {"规范名": ["别名", ...]}
+    - 其它: 每行 "规范名,别名1,别名2"（逗号或制表符分隔），# 开头为注释
+    """
+    if filepath.endswith('.json'):
+        with open(filepath, 'r', encoding='utf-8') as f:
+            entries = json.load(f).items()
+    else:
+        entries = []
+        with open(filepath, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    name, *aliases = [part.strip() for part in re.split(r'[,\t]', line)]
+                    entries.append((name, aliases))
+    aliases = {}
+    for name, names in entries:
+        for alias in [name, *names]:
+            aliases[alias] = name
+    return aliases
+
+def company_aliases(filepath=None):
+    """KNOWN_COMPANIES (各自为规范名) 加上别名词典 (可选，同名别名以词典为准)"""
+    aliases = {company: company for company in KNOWN_COMPANIES}
+    if filepath:
+        aliases.update(load_company_dict(filepath))
+    return aliases
+
+COMPANY_RESOLVER = CompanyResolver(company_aliases())  # 默认别名词典 (未指定 --company-dict 时共用)
+
 # ==========================================
 # 工具函数
 # ==========================================
@@ -45,130 +309,463 @@ KNOWN_COMPANIES = [
 def load_data(filepath):
     print(f"正在读取文件: {filepath} ...")
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with open(filepath, 'rb') as f:
+            return job_codec.loads(f.read())
     except FileNotFoundError:
         print(f"错误: 找不到文件 {filepath}")
         return []
-    except json.JSONDecodeError as e:
+    except job_codec.DecodeError as e:
         print(f"错误: JSON解析失败 - {e}")
         return []
 
 def save_data(data, filepath):
+    """写出 JSON 数组，data 可以是 dict 或 CleanedJob (逐条还原为 dict 后写出)"""
     print(f"正在保存文件 (共 {len(data)} 条): {filepath} ...")
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with JsonArrayWriter(filepath) as out:
+        for row in data:
+            out.write(row)
+
+class InputFormatError(ValueError):
+    """输入文件中有无法解析的 JSON"""
+
+    def __init__(self, filepath, lineno, error):
+        super().__init__(f"{filepath} 第 {lineno} 行 JSON 解析失败: {error}")
+        self.filepath = filepath
+        self.lineno = lineno
+
+def iter_records(filepath):
+    """
+    流式读取岗位记录，逐条产出，内存占用与文件大小无关
+    支持两种格式:
+      - NDJSON: 每行一个 JSON 对象
+      - JSON 数组: 旧格式 [{...}, {...}]，增量解析而不整体加载
+    遇到无法解析的内容时抛出 InputFormatError (含文件名和行号)，不会静默截断输入
+    """
+    print(f"正在流式读取文件: {filepath} ...")
+    try:
+        f = open(filepath, 'r', encoding='utf-8')
+    except FileNotFoundError:
+        print(f"错误: 找不到文件 {filepath}")
+        return
+    with f:
+        head = f.read(1)
+        lineno = 1  # 开头空白中的换行也计入行号
+        while head and head.isspace():
+            lineno += head == '\n'
+            head = f.read(1)
+        if head == '[':
+            yield from _iter_json_array(f, filepath, lineno)
+        elif head:
+            first_line = head + f.readline()
+            for lineno, line in enumerate(itertools.chain([first_line], f), lineno):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = job_codec.loads(line)
+                except job_codec.DecodeError as e:
+                    raise InputFormatError(filepath, lineno, e) from e
+                yield record
+
+def _iter_json_array(f, filepath, lineno=1):
+    """增量解析 JSON 数组（左括号已被读取，位于第 lineno 行）"""
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    
+    def error(message, at):
+        # 行号 = 已丢弃部分的行数 + 当前缓冲区中出错位置之前的换行数
+        return InputFormatError(filepath, lineno + buf.count('\n', 0, at), message)
+    
+    while True:
+        # 跳过空白和分隔符
+        while True:
+            while pos < len(buf) and (buf[pos].isspace() or buf[pos] == ','):
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            lineno += buf.count('\n')
+            buf = f.read(READ_CHUNK_SIZE)
+            pos = 0
+            eof = not buf
+        if pos >= len(buf):
+            raise error("JSON 数组未闭合", pos)
+        if buf[pos] == ']':
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as e:
+            # 只有出错位置在缓冲区末尾 (或字符串一直延续到末尾) 时才是对象跨越了读取边界，
+            # 继续读取后重试；其它位置的错误是内容损坏，立即报错，不再把文件剩余部分读进缓冲区
+            truncated = (e.pos >= len(buf) - PARTIAL_TOKEN_SIZE
+                         or e.msg.startswith('Unterminated string'))
+            if eof or not truncated:
+                raise error(e.msg, e.pos) from e
+            chunk = f.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            lineno += buf.count('\n', 0, pos)
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        yield obj
+        pos = end
+        if pos > READ_CHUNK_SIZE:
+            lineno += buf.count('\n', 0, pos)
+            buf = buf[pos:]
+            pos = 0
+
+class JsonArrayWriter:
+    """增量写出 JSON 数组，输出与 json.dump(data, indent=2) 完全一致"""
+
+    def __init__(self, filepath, append=False):
+        self.filepath = filepath
+        self.count = 0  # 本次写出的记录数
+        self.empty = True  # 数组中是否还没有元素
+        self.append = append
+        # 追加前文件的 (截断位置, 末尾内容)，异常退出时据此撤销本次追加；None 表示文件原本不存在
+        self.origin = None
+        if append and os.path.exists(filepath) and os.path.getsize(filepath) > 0:
+            self._reopen_array(filepath)
+            self.f = open(filepath, 'a', encoding='utf-8')
+        else:
+            if append and os.path.exists(filepath):
+                self.origin = (0, b'')
+            self.f = open(filepath, 'w', encoding='utf-8')
+
+    def _reopen_array(self, filepath):
+        """去掉已有数组末尾的 ']'，以便继续追加元素"""
+        with open(filepath, 'rb+') as f:
+            offset = f.seek(-2, os.SEEK_END)
+            tail = f.read(2)
+            if tail == b'[]':
+                f.truncate(offset)
+            elif tail == b'\n]':
+                f.truncate(offset)
+                self.empty = False
+            else:
+                raise ValueError(f"无法追加: {filepath} 不是由本脚本写出的 JSON 数组")
+            self.origin = (offset, tail)
+
+    def write(self, row):
+        text = job_codec.dumps_pretty(as_dict(row)).replace('\n', '\n  ')
+        self.f.write(('[\n  ' if self.empty else ',\n  ') + text)
+        self.empty = False
+        self.count += 1
+
+    def flush(self):
+        self.f.flush()
+
+    def close(self):
+        self.f.write('[]' if self.empty else '\n]')
+        self.f.close()
+
+    def rollback(self):
+        """撤销本次追加的全部内容，把文件恢复为追加前的样子"""
+        self.f.close()
+        if self.origin is None:
+            os.remove(self.filepath)
+            return
+        offset, tail = self.origin
+        with open(self.filepath, 'rb+') as f:
+            f.truncate(offset)
+            f.seek(offset)
+            f.write(tail)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        # 追加模式 (增量清洗) 异常退出时撤销追加，与回滚的状态库保持一致
+        if exc_type is not None and self.append:
+            self.rollback()
+        else:
+            self.close()
+
+class NdjsonWriter(JsonArrayWriter):
+    """逐行写出紧凑的 NDJSON (job_codec.dumps)，下游可以边清洗边读取"""
+
+    def __init__(self, filepath, append=False):
+        self.filepath = filepath
+        self.count = 0
+        self.append = append
+        self.origin = (os.path.getsize(filepath), b'') if append and os.path.exists(filepath) else None
+        self.f = open(filepath, 'ab' if append else 'wb')
+
+    def write(self, row):
+        self.f.write(job_codec.dumps(as_dict(row)))
+        self.f.write(b'\n')
+        self.count += 1
+
+    def close(self):
+        self.f.close()
+
+# 列式输出的固定 schema: 原始字段均为字符串列，其中 DICT_COLUMNS 做字典编码
+RAW_COLUMNS = [
+    '岗位名称', '公司名称', '薪资', '学历要求', '城市', '职位类型', '招聘人数',
+    '公司类型', '公司性质', '毕业年份', '每周工作天数', '实习时长', '是否有转正',
+    '职位描述', '职位链接', 'job_id', '技能要求标签', '招聘类型'
+]
+DICT_COLUMNS = {'公司名称', '学历要求', '城市', '职位类型', '公司类型', '公司性质', 'salary_unit'}
+COLUMNAR_BATCH_SIZE = 10000  # 每个 RecordBatch / Parquet row group 的行数
+
+def import_pyarrow():
+    """按需导入 pyarrow，未安装时抛出 RuntimeError"""
+    global pa, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("列式输出需要安装 pyarrow: pip install pyarrow") from None
+        pa, pq = pyarrow, pyarrow.parquet
+    return pa
+
+def columnar_schema():
+    """清洗结果的列式 schema: parsed_salary 展开为独立的类型化列，value_tags 为列表列"""
+    import_pyarrow()
+    def string_type(name):
+        return pa.dictionary(pa.int32(), pa.string()) if name in DICT_COLUMNS else pa.string()
+    fields = [pa.field(name, string_type(name)) for name in RAW_COLUMNS]
+    fields += [
+        pa.field('is_valid_job', pa.bool_()),
+        pa.field('salary_min', pa.int32()),
+        pa.field('salary_max', pa.int32()),
+        pa.field('salary_months', pa.int32()),
+        pa.field('salary_negotiable', pa.bool_()),
+        pa.field('salary_unit', string_type('salary_unit')),
+        pa.field('salary_raw', pa.string()),
+        pa.field('collection_count', pa.int32()),
+        pa.field('active_status', pa.string()),
+        pa.field('batch', pa.string()),
+        pa.field('value_tags', pa.list_(pa.string())),
+        pa.field('near_dup_of', pa.string()),
+    ]
+    return pa.schema(fields)
+
+def flatten_row(row):
+    """把清洗后的记录展开为列式 schema 对应的 {列名: 值}，schema 之外的字段被忽略"""
+    flat = {}
+    for name in RAW_COLUMNS:
+        value = row.get(name)
+        flat[name] = value if value is None or isinstance(value, str) else str(value)
+    salary = row.get('parsed_salary') or {}
+    flat['is_valid_job'] = row.get('is_valid_job')
+    flat['salary_min'] = salary.get('min')
+    flat['salary_max'] = salary.get('max')
+    flat['salary_months'] = salary.get('months')
+    flat['salary_negotiable'] = salary.get('negotiable')
+    flat['salary_unit'] = salary.get('unit')
+    flat['salary_raw'] = salary.get('raw')
+    flat['collection_count'] = row.get('collection_count')
+    flat['active_status'] = row.get('active_status')
+    flat['batch'] = row.get('batch')
+    flat['value_tags'] = row.get('value_tags')
+    flat['near_dup_of'] = row.get('near_dup_of')
+    return flat
+
+class ColumnarWriter:
+    """
+    列式写出的基类 (需要 pyarrow): 按 COLUMNAR_BATCH_SIZE 攒批后写出 RecordBatch
+    字典编码列在整个文件内共用一个持续增长的字典，后续批次只写增量
+    """
+
+    def __init__(self, filepath, append=False):
+        import_pyarrow()
+        if append:
+            raise ValueError("列式输出不支持追加，增量模式请使用 json/ndjson 格式")
+        self.filepath = filepath
+        self.schema = columnar_schema()
+        self.count = 0
+        self.columns = {name: [] for name in self.schema.names}
+        self.dictionaries = {name: {} for name in self.schema.names if name in DICT_COLUMNS}
+        self.sink = self._open_sink()
+
+    def _open_sink(self):
+        raise NotImplementedError
+
+    def write(self, row):
+        for name, value in flatten_row(row).items():
+            self.columns[name].append(value)
+        self.count += 1
+        if len(self.columns['job_id']) >= COLUMNAR_BATCH_SIZE:
+            self._write_batch()
+
+    def _column_array(self, field):
+        values = self.columns[field.name]
+        if field.name not in self.dictionaries:
+            return pa.array(values, type=field.type)
+        index = self.dictionaries[field.name]
+        indices = [None if v is None else index.setdefault(v, len(index)) for v in values]
+        return pa.DictionaryArray.from_arrays(pa.array(indices, type=pa.int32()),
+                                              pa.array(list(index), type=pa.string()))
+
+    def _write_batch(self):
+        if not self.columns['job_id']:
+            return
+        arrays = [self._column_array(field) for field in self.schema]
+        self.sink.write_batch(pa.record_batch(arrays, schema=self.schema))
+        for values in self.columns.values():
+            values.clear()
+
+    def flush(self):
+        """列式文件只能整批写出，这里把已缓冲的行写成一个批次"""
+        self._write_batch()
+
+    def close(self):
+        self._write_batch()
+        self.sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ParquetWriter(ColumnarWriter):
+    """写出 Parquet 文件，每批为一个 row group"""
+
+    def _open_sink(self):
+        return pq.ParquetWriter(self.filepath, self.schema, compression='zstd')
+
+class ArrowWriter(ColumnarWriter):
+    """写出 Arrow IPC 文件 (Feather v2)"""
+
+    def _open_sink(self):
+        options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        return pa.ipc.new_file(self.filepath, self.schema, options=options)
+
+WRITERS = {
+    'json': JsonArrayWriter,
+    'ndjson': NdjsonWriter,
+    'parquet': ParquetWriter,
+    'arrow': ArrowWriter,
+}
+
+FORMAT_EXTENSIONS = {
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+}
+
+def guess_format(filepath):
+    """根据扩展名推断输出格式，未知扩展名按 JSON 数组处理"""
+    ext = os.path.splitext(filepath)[1].lower()
+    return FORMAT_EXTENSIONS.get(ext, 'json')
+
+def open_writer(filepath, fmt=None, append=False):
+    fmt = fmt or guess_format(filepath)
+    print(f"正在{'追加' if append else '写出'}文件 ({fmt}): {filepath} ...")
+    return WRITERS[fmt](filepath, append=append)
 
 def clean_text(text):
     if not text:
         return ""
     return text.strip()
 
-def extract_salary(salary_str):
+def extract_salary(salary_str, ctx=None):
     """
     解析薪资字符串，返回结构化数据
-    格式示例: "15-25K·14薪", "20-30K", "面议"
+    格式示例: "15-25K·14薪", "20-30K", "面议", "200-300元/天"
+    结果经 LRU 缓存，重复出现的薪资字符串只解析一次
     """
+    struct = parse_salary(salary_str, ctx)
+    return struct._asdict() if struct else struct
+
+def parse_salary(salary_str, ctx=None):
+    """同 extract_salary，但直接返回缓存中共享的 ParsedSalary (不可变)，供清洗内部使用"""
+    ctx = ctx or DEFAULT_CONTEXT
+    struct, kind = ctx.memo['extract_salary'](salary_str)
+    if kind:
+        ctx.pattern_hits['salary_' + kind] += 1
+    return struct
+
+def _parse_salary(salary_str):
+    """由 PATTERNS['salary'] 组合语法一次匹配完成，返回 (ParsedSalary, 命中形式)"""
     if not salary_str:
-        return None
+        return None, None
     
     salary_str = salary_str.replace("k", "K").replace(" ", "")
     
-    if "面议" in salary_str:
-        return {"min": None, "max": None, "months": None, "negotiable": True, "raw": salary_str}
+    m = PATTERNS['salary'].search(salary_str)
+    if m is None:
+        return ParsedSalary(None, None, None, False, None, salary_str), None
     
-    # 匹配 15-25K·14薪
-    match_full = re.search(r'(\d+)-(\d+)K[·.](?:(\d+)薪)?', salary_str)
-    if match_full:
-        return {
-            "min": int(match_full.group(1)), 
-            "max": int(match_full.group(2)), 
-            "months": int(match_full.group(3)) if match_full.group(3) else 12,
-            "negotiable": False,
-            "raw": salary_str
-        }
-        
-    # 匹配简单格式 15-25K without month
-    match_simple = re.search(r'(\d+)-(\d+)K', salary_str)
-    if match_simple:
-        return {
-            "min": int(match_simple.group(1)), 
-            "max": int(match_simple.group(2)), 
-            "months": 12, # default
-            "negotiable": False,
-            "raw": salary_str
-        }
-
-    return {"min": None, "max": None, "months": None, "negotiable": False, "raw": salary_str}
+    kind = m.lastgroup
+    if kind == 'negotiable':
+        return ParsedSalary(None, None, None, True, None, salary_str), kind
+    if kind == 'daily':
+        # 日薪 (实习岗位常见): 单位 元/天，无年薪月数
+        return ParsedSalary(int(m.group('day_min')), int(m.group('day_max')), None, False, "元/天",
+                            salary_str), kind
+    # 月薪 15-25K·14薪 / 15-25K，未写明月数时默认 12 薪
+    return ParsedSalary(int(m.group('min')), int(m.group('max')),
+                        int(m.group('months')) if m.group('months') else 12, False, "K/月",
+                        salary_str), kind
 
-def extract_from_description(desc):
-    """从职位描述中提取信息"""
+def extract_from_description(desc, ctx=None):
+    """从职位描述中提取信息（关键词与公司别名由描述自动机一次扫描完成）"""
     if not desc:
         return {}
+    ctx = ctx or DEFAULT_CONTEXT
     
     extracted = {}
     
     # 提取收藏数
-    match_coll = re.search(r'(\d+)位牛友收藏', desc)
+    match_coll = PATTERNS['collection_count'].search(desc)
     if match_coll:
+        ctx.pattern_hits['collection_count'] += 1
         extracted['collection_count'] = int(match_coll.group(1))
     else:
         extracted['collection_count'] = 0
-        
-    # 提取活跃状态
-    active_tags = []
-    if "刚刚有人投递过" in desc:
-        active_tags.append("刚刚有人投递过")
-    if "HR近期来过" in desc:
-        active_tags.append("HR近期来过")
-    if "HR刚刚处理简历" in desc:
-        active_tags.append("HR刚刚处理简历")
-    if active_tags:
-        extracted['active_status'] = "|".join(active_tags)
-        
-    # 提取城市 (扩展城市列表)
-    common_cities = ["北京", "上海", "广州", "深圳", "杭州", "成都", "武汉", "南京", "西安", "郑州", "长沙", "苏州", "天津", "重庆", "合肥", "厦门", "珠海", "大连", "青岛", "石家庄", "宁波", "无锡", "福州", "济南", "沈阳", "哈尔滨", "长春", "昆明", "南宁", "贵阳", "南昌", "扬州", "东莞", "佛山"]
-    for city in common_cities:
-        if city in desc:
-            extracted['city_candidate'] = city
-            break
-            
-    # 提取学历 (按优先级)
-    degrees = ["博士", "硕士", "本科", "专科"]
-    for deg in degrees:
-        if deg in desc:
-            extracted['degree_candidate'] = deg
-            break
-            
-    # 提取职位类型 (关键词匹配)
-    job_type_keywords = {
-        "AI": ["AI", "人工智能", "算法", "深度学习", "机器学习", "NLP", "CV", "机器视觉", "大模型", "SLAM", "机载"],
-        "后端开发": ["Java", "C++", "Python", "Go", "Golang", "PHP", "Node", "后端", "服务器", "高性能计算"],
-        "前端开发": ["前端", "JavaScript", "TypeScript", "Vue", "React", "Web"],
-        "测试": ["测试", "QA"],
-        "运维": ["运维", "SRE", "DevOps"],
-        "数据": ["数据分析", "数据挖掘", "数据开发", "大数据", "ETL"],
-        "硬件": ["硬件", "嵌入式", "芯片", "集成电路", "FPGA"]
-    }
-    for type_name, keywords in job_type_keywords.items():
-        for kw in keywords:
-            if kw.upper() in desc.upper():
-                extracted['job_type_candidate'] = type_name
-                # 找到一个高优先级的关键词就停止，这里简单取第一个匹配到的类型
-                break
-        if 'job_type_candidate' in extracted:
-            break
-            
-    # 尝试提取真实公司名
-    for company in KNOWN_COMPANIES:
-        if company in desc:
-            extracted['company_candidate'] = company
-            break
     
+    extracted.update(scan_description_keywords(desc, ctx.companies))
     return extracted
 
-def normalize_job_title(title):
-    """清洗岗位名称"""
+def scan_description_keywords(desc, companies=COMPANY_RESOLVER):
+    """一次扫描命中所有关键词，再按各组优先级（列表顺序，公司为别名长度）取最优"""
+    extracted = {}
+    best = {}
+    active_ranks = []
+    company = None  # (优先级, 原文位置, 规范名)
+    for group, rank, pattern, value in companies.desc_automaton.search(desc.upper()):
+        # 大小写敏感的词组需要在原文中复核
+        if group != 'job_type' and pattern.upper() != pattern.lower() and pattern not in desc:
+            continue
+        if group == 'active':
+            active_ranks.append(rank)
+        elif group == 'company':
+            # 同长的别名取原文中最靠前者
+            if company is None or rank < company[0] or (rank == company[0] and desc.find(pattern) < company[1]):
+                company = (rank, desc.find(pattern), value)
+        elif group not in best or rank < best[group][0]:
+            best[group] = (rank, value)
+    
+    # 活跃状态
+    if active_ranks:
+        extracted['active_status'] = "|".join(ACTIVE_TAGS[r] for r in sorted(active_ranks))
+    # 城市 / 学历 / 职位类型
+    for group, key in DESC_CANDIDATE_KEYS.items():
+        if group in best:
+            extracted[key] = best[group][1]
+    # 真实公司名 (别名词典最长匹配)
+    if company:
+        extracted['company_candidate'] = company[2]
+    
+    return extracted
+
+def normalize_job_title(title, ctx=None):
+    """清洗岗位名称（结果经 LRU 缓存）"""
+    ctx = ctx or DEFAULT_CONTEXT
+    title, extracted, hits = ctx.memo['normalize_job_title'](title)
+    for name in hits:
+        ctx.pattern_hits[name] += 1
+    return title, dict(extracted)
+
+def _parse_job_title(title):
+    """返回 (清洗后岗位名称, 提取结果, 命中的正则名)"""
     if not title:
         title = "未知"
         
@@ -176,129 +773,850 @@ def normalize_job_title(title):
     
     # 处理 "为你推荐" -> "未知"
     if "为你推荐" in title:
-        return "未知", {}
+        return "未知", {}, ()
         
     extracted = {}
+    hits = []
     
     # 提取城市 (合肥)
-    match_city = re.search(r'[（\(](.+?)[）\)]', title)
+    match_city = PATTERNS['title_city'].search(title)
     if match_city:
         potential_city = match_city.group(1)
-        if len(potential_city) >= 2 and len(potential_city) <= 5 and not re.match(r'[a-zA-Z0-9]+', potential_city):
+        if len(potential_city) >= 2 and len(potential_city) <= 5 and not PATTERNS['alnum_prefix'].match(potential_city):
+             hits.append('title_city')
              extracted['city_from_title'] = potential_city
     
     # 提取批次
-    match_batch = re.search(r'(?:\[|【)?(20\d\d|[23]\d)届(?:\]|】|校招|秋招)?', title)
+    match_batch = PATTERNS['batch'].search(title)
     if match_batch:
+        hits.append('batch')
         extracted['batch'] = match_batch.group(1) + "届"
         
-    return title, extracted
+    return title, extracted, tuple(hits)
+
+def repair_company(raw_company, company_candidate, ctx=None):
+    """
+    修复公司名称: 原值是标签或过短时，用描述中提取的真实公司名替换，否则标记为"未知"；
+    原值恰好是别名词典中的别名时统一为规范名
+    返回 (最终公司名, 统计项或 None)，结果经 LRU 缓存
+    """
+    return (ctx or DEFAULT_CONTEXT).memo['repair_company'](raw_company, company_candidate)
+
+def _repair_company(companies, raw_company, company_candidate):
+    if raw_company in COMPANY_TAGS or len(raw_company) < 2:
+        if company_candidate:
+            return company_candidate, 'company_restored_from_desc'
+        return "未知", 'company_unknown'
+    canonical = companies.canonical(raw_company)
+    if canonical and canonical != raw_company:
+        return canonical, 'company_canonicalized'
+    return raw_company, None
+
+# ==========================================
+# 清洗上下文 (缓存与统计)
+# ==========================================
+
+MEMO_SIZE = 65536  # 每个缓存的最大条目数
+
+class CleaningContext:
+    """
+    一个清洗器的可变状态: 解析缓存、正则命中计数、阶段计时，以及所用的公司别名解析器
+    每个 JobCleaner 各持一份，同一进程中的多个清洗器 (含不同线程中的) 互不影响；
+    模块级清洗函数不传 ctx 时使用 DEFAULT_CONTEXT
+    """
+
+    def __init__(self, companies=None, memo_size=MEMO_SIZE):
+        self.companies = companies or COMPANY_RESOLVER
+        self.pattern_hits = Counter()  # 各正则（薪资按形式区分）的命中次数，写入清洗报告
+        self.timings = StageTimer()
+        self.memo = {}  # 缓存名 -> lru_cache 包装后的解析函数
+        self.worker_memo = Counter()  # 多进程模式下子进程回传的 (缓存名, hits/misses) 计数
+        self.configure_memo(memo_size)
+
+    def configure_memo(self, maxsize=MEMO_SIZE):
+        """(重新)创建薪资/岗位名称/公司修复缓存并清零计数，maxsize=0 表示关闭缓存"""
+        self.memo['extract_salary'] = lru_cache(maxsize=maxsize)(_parse_salary)
+        self.memo['normalize_job_title'] = lru_cache(maxsize=maxsize)(_parse_job_title)
+        self.memo['repair_company'] = lru_cache(maxsize=maxsize)(partial(_repair_company, self.companies))
+        self.worker_memo.clear()
+
+    def memo_counts(self):
+        """当前进程各缓存的 {缓存名: (hits, misses)}"""
+        return {name: tuple(fn.cache_info()[:2]) for name, fn in self.memo.items()}
+
+    def memo_report(self):
+        """写入清洗报告的缓存统计（含子进程回传的计数）"""
+        report = {}
+        for name, fn in self.memo.items():
+            info = fn.cache_info()
+            hits = info.hits + self.worker_memo[(name, 'hits')]
+            misses = info.misses + self.worker_memo[(name, 'misses')]
+            total = hits + misses
+            report[name] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "maxsize": info.maxsize,
+            }
+        return report
+
+DEFAULT_CONTEXT = CleaningContext()
+
+def configure_memo(maxsize=MEMO_SIZE):
+    """重建 DEFAULT_CONTEXT 的缓存 (直接调用模块级清洗函数时，例如基准测试)"""
+    DEFAULT_CONTEXT.configure_memo(maxsize)
+
+# ==========================================
+# 紧凑记录
+# ==========================================
+
+# 结构化薪资: 不可变，缓存中的同一对象可被所有薪资字符串相同的记录共享
+ParsedSalary = namedtuple('ParsedSalary', ['min', 'max', 'months', 'negotiable', 'unit', 'raw'])
+
+# 清洗时改写的原始字段 -> CleanedJob 属性
+CLEANED_FIELDS = {
+    '岗位名称': 'title',
+    '公司名称': 'company',
+    '城市': 'city',
+    '学历要求': 'degree',
+    '职位类型': 'job_type',
+}
+# 清洗时新增的字段 (按输出顺序) -> CleanedJob 属性
+DERIVED_FIELDS = {
+    'is_valid_job': 'is_valid_job',
+    'parsed_salary': 'salary',
+    'collection_count': 'collection_count',
+    'active_status': 'active_status',
+    'batch': 'batch',
+    'value_tags': 'value_tags',
+}
+# 取值集合很小的原始字段，驻留后各记录共享同一个字符串对象
+CATEGORICAL_FIELDS = {'薪资', '招聘人数', '公司类型', '公司性质', '毕业年份', '每周工作天数',
+                      '实习时长', '是否有转正', '招聘类型'}
+# 价值标签组合只有几种，共享同一个元组
+VALUE_TAGS = {
+    (False, False): (),
+    (True, False): ("高收藏",),
+    (False, True): ("活跃",),
+    (True, True): ("高收藏", "活跃"),
+}
+
+_SCHEMAS = {}  # 原始字段名元组 -> (共享的字段名元组, {字段名: 下标})
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+class CleanedJob:
+    """
+    清洗后的岗位记录: 固定槽位，不为每条记录建 dict
+    - 原始字段按共享的字段名元组存为值元组，被清洗改写的字段在元组中置空
+    - 城市、学历、类型、公司等分类字段驻留，parsed_salary 为缓存共享的 ParsedSalary
+    - 只在写出时由 to_dict() 还原为与原先 row.copy() + 赋值完全一致的 dict
+    """
+    __slots__ = ('keys', 'index', 'values', 'title', 'company', 'city', 'degree', 'job_type',
+                 'is_valid_job', 'salary', 'collection_count', 'active_status', 'batch', 'value_tags',
+                 'near_dup_of')
+
+    def __init__(self, row, title, company, city, degree, job_type, salary,
+                 collection_count, active_status, batch):
+        keys = tuple(row)
+        self.keys, self.index = _SCHEMAS.get(keys) or _SCHEMAS.setdefault(
+            keys, (keys, {key: i for i, key in enumerate(keys)}))
+        self.values = tuple(None if key in CLEANED_FIELDS else
+                            _intern(value) if key in CATEGORICAL_FIELDS else value
+                            for key, value in row.items())
+        self.title = title
+        self.company = _intern(company)
+        self.city = _intern(city)
+        self.degree = _intern(degree)
+        self.job_type = _intern(job_type)
+        self.is_valid_job = title != "未知"
+        self.salary = salary
+        self.collection_count = collection_count
+        self.active_status = _intern(active_status)
+        self.batch = _intern(batch)
+        self.value_tags = VALUE_TAGS[collection_count >= 10, bool(active_status)]
+        self.near_dup_of = None  # 近似去重 flag 模式下所属簇代表的标识
+
+    def get(self, key, default=None):
+        """按输出字段名取值，与 to_dict().get(key, default) 相同"""
+        if key in CLEANED_FIELDS or key in DERIVED_FIELDS:
+            return self[key]
+        if key == 'near_dup_of':
+            return default if self.near_dup_of is None else self.near_dup_of
+        i = self.index.get(key)
+        return default if i is None else self.values[i]
+
+    def __getitem__(self, key):
+        if key == 'parsed_salary':
+            return self.salary._asdict() if self.salary else None
+        if key == 'value_tags':
+            return list(self.value_tags)
+        attr = CLEANED_FIELDS.get(key) or DERIVED_FIELDS.get(key)
+        if attr is not None:
+            return getattr(self, attr)
+        if key == 'near_dup_of' and self.near_dup_of is not None:
+            return self.near_dup_of
+        return self.values[self.index[key]]
+
+    def __contains__(self, key):
+        return (key in self.index or key in CLEANED_FIELDS or key in DERIVED_FIELDS
+                or key == 'near_dup_of' and self.near_dup_of is not None)
+
+    def to_dict(self):
+        """
+        还原为输出用的 dict: 原始字段保持原顺序，清洗改写与新增的字段按原先的赋值顺序写入
+        每条记录写出时都要调用，这里逐个字段直接赋值 (顺序与 CLEANED_FIELDS / DERIVED_FIELDS 相同)
+        """
+        row = dict(zip(self.keys, self.values))
+        row['岗位名称'] = self.title
+        row['公司名称'] = self.company
+        row['城市'] = self.city
+        row['学历要求'] = self.degree
+        row['职位类型'] = self.job_type
+        row['is_valid_job'] = self.is_valid_job
+        salary = self.salary
+        row['parsed_salary'] = dict(zip(ParsedSalary._fields, salary)) if salary else None
+        row['collection_count'] = self.collection_count
+        row['active_status'] = self.active_status
+        row['batch'] = self.batch
+        row['value_tags'] = list(self.value_tags)
+        if self.near_dup_of is not None:
+            row['near_dup_of'] = self.near_dup_of
+        return row
+
+def as_dict(row):
+    """写出前把 CleanedJob 还原为 dict，普通 dict 原样返回"""
+    return row.to_dict() if isinstance(row, CleanedJob) else row
 
 # ==========================================
 # 主清洗逻辑
 # ==========================================
 
-def process_data(data):
-    cleaned_rows = []
-    stats = Counter()
-    seen_ids = set()
-    seen_content = set()
+def clean_row(row, stats, ctx=None):
+    """清洗单条记录（不含去重），返回新记录；ctx 为所属清洗器的上下文，默认 DEFAULT_CONTEXT"""
+    return CleanedJob(row, *clean_fields(row, stats, ctx))
+
+def clean_fields(row, stats, ctx=None):
+    """
+    清洗单条记录，只返回清洗得到的字段元组 (CleanedJob 除原始记录外的构造参数)
+    多进程清洗时子进程只回传这个元组，由持有原始记录的主进程构造 CleanedJob
+    """
+    ctx = ctx or DEFAULT_CONTEXT
+    # 1. 字段提取
+    raw_company = clean_text(row.get('公司名称', ''))
+    raw_title = clean_text(row.get('岗位名称', ''))
+    raw_desc = clean_text(row.get('职位描述', ''))
+    raw_city = clean_text(row.get('城市', ''))
+    raw_salary = clean_text(row.get('薪资', ''))
+    raw_degree = clean_text(row.get('学历要求', ''))
+    raw_type = clean_text(row.get('职位类型', ''))
     
-    print("开始清洗数据...")
+    t0 = time.perf_counter()
+    clean_title, title_extracted = normalize_job_title(raw_title, ctx)
+    t1 = time.perf_counter()
+    desc_extracted = extract_from_description(raw_desc, ctx)
+    t2 = time.perf_counter()
+    ctx.timings.add('normalize_job_title', t1 - t0)
+    ctx.timings.add('extract_from_description', t2 - t1)
     
-    for row in data:
-        stats['total_processed'] += 1
+    # 2. 字段修复逻辑
+    
+    # 修复公司名称
+    final_company, company_stat = repair_company(raw_company, desc_extracted.get('company_candidate'), ctx)
+    if company_stat:
+        stats[company_stat] += 1
+    
+    # 修复城市 (优先级: 原城市 > 标题提取 > 描述提取)
+    # 但如果原城市字段实际上是无效的（空或显然错误），则覆盖
+    # 此处简化策略：如果为空，尝试填充
+    final_city = raw_city
+    if not final_city:
+        if 'city_from_title' in title_extracted:
+            final_city = title_extracted['city_from_title']
+            stats['city_restored_from_title'] += 1
+        elif 'city_candidate' in desc_extracted:
+            final_city = desc_extracted['city_candidate']
+            stats['city_restored_from_desc'] += 1
         
-        job_id = str(row.get('job_id', '')).strip()
+    # 修复学历 (策略: 如果原值为"不限"或为空，且描述里有明确学历，则覆盖)
+    final_degree = raw_degree
+    if (not final_degree or final_degree == "不限") and 'degree_candidate' in desc_extracted:
+        final_degree = desc_extracted['degree_candidate']
+        stats['degree_restored_from_desc'] += 1
         
-        # 去重
-        if job_id and job_id in seen_ids:
-            stats['duplicate_id'] += 1
+    # 修复职位类型
+    final_type = raw_type
+    if not final_type and 'job_type_candidate' in desc_extracted:
+        final_type = desc_extracted['job_type_candidate']
+        stats['type_restored_from_desc'] += 1
+         
+    t0 = time.perf_counter()
+    final_salary_struct = parse_salary(raw_salary, ctx)
+    ctx.timings.add('extract_salary', time.perf_counter() - t0)
+         
+    # 3. 构建 (价值标签: 收藏 >= 10 为高收藏，有活跃状态为活跃，见 CleanedJob)
+    return (
+        clean_title, final_company, final_city, final_degree, final_type,
+        final_salary_struct,
+        desc_extracted.get('collection_count', 0),
+        desc_extracted.get('active_status', ''),
+        title_extracted.get('batch', row.get('毕业年份', '')),
+    )
+
+def content_key(row):
+    """内容去重键: 公司 + 岗位 + 城市"""
+    return f"{row['公司名称']}_{row['岗位名称']}_{row['城市']}"
+
+def row_job_id(row):
+    return str(row.get('job_id', '')).strip()
+
+class DedupState:
+    """去重状态: 已见过的 job_id 与内容键"""
+
+    def __init__(self):
+        self.seen_ids = set()
+        self.seen_content = set()
+
+    def check(self, row, job_id):
+        """
+        清洗前检查一条记录，返回跳过原因（统计项名）或 None
+        未被跳过的 job_id 立即记为已见，因此检查必须按输入顺序进行
+        """
+        if job_id:
+            if job_id in self.seen_ids:
+                return 'duplicate_id'
+            self.seen_ids.add(job_id)
+        return None
+
+    def add(self, new_row, stats):
+        """登记一条清洗后的记录，内容键重复时只计数不丢弃"""
+        content_hash = content_key(new_row)
+        if content_hash in self.seen_content:
+            stats['duplicate_content_warning'] += 1
+        else:
+            self.seen_content.add(content_hash)
+
+    def commit(self):
+        """持久化状态（内存状态无需处理）"""
+
+    def rollback(self):
+        """丢弃上次 commit 之后的状态变更"""
+
+    def close(self):
+        pass
+
+def row_fingerprint(row):
+    """原始记录的内容指纹，用于判断同一 job_id 的记录是否发生变化"""
+    # 固定使用标准库编码: 换用其它后端会改变已有状态库中的指纹
+    data = json.dumps(row, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+class StateStore(DedupState):
+    """
+    增量清洗的持久化状态 (SQLite)
+    记录每个已清洗 job_id（无 job_id 时用内容指纹）的指纹和全部内容键 (及其所属记录)，
+    之后的运行只清洗新增或内容发生变化的记录；发生变化的 job_id 记在 changed 中，
+    由 run_pipeline 在运行结束时从输出文件中去掉它们的旧版本
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.pending = deque()  # 已通过检查、等待清洗完成的 (key, 指纹, 统计项)
+        self.changed = set()  # 本次运行中内容发生变化的 job_id
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS jobs (key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS content (hash TEXT PRIMARY KEY, key TEXT)")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(content)")]
+        if 'key' not in columns:
+            # 旧版状态库的内容键没有记录所属记录，这些内容键对所有记录都视为他人的
+            self.conn.execute("ALTER TABLE content ADD COLUMN key TEXT")
+
+    def check(self, row, job_id):
+        reason = super().check(row, job_id)
+        if reason:
+            return reason
+        fingerprint = row_fingerprint(row)
+        key = job_id or 'fp:' + fingerprint
+        found = self.conn.execute("SELECT fingerprint FROM jobs WHERE key = ?", (key,)).fetchone()
+        if found and found[0] == fingerprint:
+            return 'incremental_unchanged'
+        # 清洗完成（add）后才写入状态库，保证状态库只记录已写出的记录
+        self.pending.append((key, fingerprint, 'incremental_changed' if found else 'incremental_new'))
+        return None
+
+    def add(self, new_row, stats):
+        key, fingerprint, status = self.pending.popleft()
+        stats[status] += 1
+        self.conn.execute("INSERT OR REPLACE INTO jobs (key, fingerprint) VALUES (?, ?)", (key, fingerprint))
+        if status == 'incremental_changed':
+            self.changed.add(key)
+            # 旧版本的内容键随旧版本一起作废，新版本与旧版本内容键相同时不算重复
+            self.conn.execute("DELETE FROM content WHERE key = ?", (key,))
+        content_hash = content_key(new_row)
+        if content_hash in self.seen_content or self.conn.execute(
+                "SELECT 1 FROM content WHERE hash = ?", (content_hash,)).fetchone():
+            stats['duplicate_content_warning'] += 1
+        else:
+            self.seen_content.add(content_hash)
+            self.conn.execute("INSERT INTO content (hash, key) VALUES (?, ?)", (content_hash, key))
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        self.conn.close()
+
+def drop_previous_versions(filepath, fmt, appended, job_ids):
+    """
+    增量模式下变化的记录以新版本追加在输出文件末尾 (最后 appended 条为本次运行写出)，
+    这里去掉此前运行写出的、job_id 在 job_ids 中的旧版本: 先数出总条数，再流式重写到临时文件后替换原文件
+    返回去掉的条数
+    """
+    total = sum(1 for _ in iter_records(filepath))
+    previous = total - appended
+    removed = 0
+    tmp_path = filepath + '.tmp'
+    with WRITERS[fmt or guess_format(filepath)](tmp_path) as out:
+        for i, row in enumerate(iter_records(filepath)):
+            if i < previous and row_job_id(row) in job_ids:
+                removed += 1
+                continue
+            out.write(row)
+    os.replace(tmp_path, filepath)
+    return removed
+
+# ==========================================
+# 近似去重 (MinHash + LSH)
+# ==========================================
+
+_MINHASH_EMPTY = 1 << 32  # 空桶标记，大于任何 32 位哈希值
+
+def minhash_signature(text, size=MINHASH_SIZE, k=SHINGLE_SIZE):
+    """
+    文本字符 k-shingle 集合的 MinHash 签名 (array('I')，长度 size)
+    采用单次哈希 (one permutation hashing): 每个 shingle 只算一次哈希，高位选桶、桶内取低位最小值；
+    空桶从右侧最近的非空桶借值并按距离加偏移 (densification)，签名逐位相等的比例即 Jaccard 相似度的估计
+    """
+    data = text.encode('utf-32-le')  # 每个字符 4 字节，便于按字符切 shingle
+    width = 4 * k
+    bucket_bits = size.bit_length() - 1
+    value_bits = 32 - bucket_bits
+    value_mask = (1 << value_bits) - 1
+    sig = [_MINHASH_EMPTY] * size
+    for start in range(0, max(len(data) - width, 0) + 1, 4):
+        h = (zlib.crc32(data[start:start + width]) * 0x9E3779B1) & 0xFFFFFFFF
+        bucket = h >> value_bits
+        value = h & value_mask
+        if value < sig[bucket]:
+            sig[bucket] = value
+    if _MINHASH_EMPTY in sig:
+        filled = list(sig)
+        nearest = None  # (位置, 值): 右侧 (循环) 最近的非空桶
+        for i in range(2 * size - 1, -1, -1):
+            value = sig[i % size]
+            if value != _MINHASH_EMPTY:
+                nearest = (i, value)
+            elif i < size:
+                filled[i] = nearest[1] + ((nearest[0] - i) << value_bits)
+        sig = filled
+    return array('I', sig)
+
+def minhash_similarity(sig_a, sig_b):
+    """两个签名的估计 Jaccard 相似度"""
+    return sum(a == b for a, b in zip(sig_a, sig_b)) / len(sig_a)
+
+def record_id(row):
+    """近似去重簇中标识一条记录: job_id，没有时用内容键"""
+    return row_job_id(row) or content_key(row)
+
+class NearDupIndex:
+    """
+    近似去重索引: 同一公司、同一城市下，岗位名称 + 职位描述的估计 Jaccard 相似度
+    达到 threshold 的记录归为一簇，簇内第一条记录为代表
+    签名分为 bands 段，按 (公司, 城市, 段号, 段内容) 分桶，同桶的代表才作为候选逐一比较，
+    已归簇的记录不再入桶，总耗时与记录数近似线性
+    """
+
+    def __init__(self, threshold=NEAR_DUP_THRESHOLD, bands=LSH_BANDS):
+        if MINHASH_SIZE % bands:
+            raise ValueError(f"LSH 分段数须整除签名长度 {MINHASH_SIZE}")
+        self.threshold = threshold
+        self.bands = bands
+        self.band_bytes = MINHASH_SIZE // bands * 4
+        self.buckets = {}  # (公司, 城市, 段号, 段内容) -> [代表编号]
+        self.representatives = []  # 代表编号 -> (签名, 代表记录标识)
+        self.members = {}  # 代表编号 -> [归入该簇的记录标识]
+
+    def add(self, row):
+        """登记一条记录: 近似重复时返回所属簇代表的标识，否则记为新的代表并返回 None"""
+        sig = minhash_signature(f"{row['岗位名称']}\n{clean_text(row.get('职位描述', ''))}")
+        raw = sig.tobytes()
+        keys = [(row['公司名称'], row['城市'], band, raw[band * self.band_bytes:(band + 1) * self.band_bytes])
+                for band in range(self.bands)]
+        compared = set()
+        for key in keys:
+            for rep in self.buckets.get(key, ()):
+                if rep in compared:
+                    continue
+                compared.add(rep)
+                rep_sig, rep_id = self.representatives[rep]
+                if minhash_similarity(sig, rep_sig) >= self.threshold:
+                    self.members.setdefault(rep, []).append(record_id(row))
+                    return rep_id
+        rep = len(self.representatives)
+        self.representatives.append((sig, record_id(row)))
+        for key in keys:
+            self.buckets.setdefault(key, []).append(rep)
+        return None
+
+    def clusters(self):
+        """含近似重复的簇: [{representative, members, size}]，按代表出现顺序"""
+        return [{"representative": self.representatives[rep][1], "members": members, "size": len(members) + 1}
+                for rep, members in sorted(self.members.items())]
+
+def iter_near_dup(rows, stats, index, mode, ctx=None):
+    """
+    近似去重: flag 为近似重复记录加 near_dup_of 字段 (簇代表的标识) 后照常输出；
+    drop 丢弃近似重复记录；两种模式下调用方都可以把 index.clusters() 写成簇文件
+    """
+    timings = (ctx or DEFAULT_CONTEXT).timings
+    for row in rows:
+        t0 = time.perf_counter()
+        rep_id = index.add(row)
+        timings.add('near_dup', time.perf_counter() - t0)
+        if rep_id is None:
+            yield row
             continue
+        stats['near_duplicate'] += 1
+        if mode == 'flag':
+            row.near_dup_of = rep_id
+            yield row
+
+def iter_clean(records, stats, workers=1, dedup=None, ctx=None):
+    """
+    逐条清洗并去重的生成器管道
+    records 可以是任意可迭代对象（例如 iter_records 的输出），清洗结果边处理边产出
+    workers > 1 时使用多进程清洗，输出与单进程逐条清洗一致
+    dedup 传入 StateStore 时为增量模式，跳过此前已清洗且未变化的记录
+    缓存、正则命中和阶段计时记在 ctx (默认 DEFAULT_CONTEXT)
+    """
+    dedup = dedup or DedupState()
+    ctx = ctx or DEFAULT_CONTEXT
+    if workers > 1 and (os.cpu_count() or 1) < workers:
+        # 进程数多于 CPU 核数时多进程只会更慢 (分片要在进程间来回序列化)
+        print(f"CPU 核数 ({os.cpu_count()}) 少于清洗进程数 ({workers})，改为单进程清洗")
+        workers = 1
+    if workers > 1:
+        yield from _iter_clean_parallel(records, stats, workers, dedup, ctx)
+        return
+    
+    timings = ctx.timings
+    for row in records:
+        stats['total_processed'] += 1
         
-        # 1. 字段提取
-        raw_company = clean_text(row.get('公司名称', ''))
-        raw_title = clean_text(row.get('岗位名称', ''))
-        raw_desc = clean_text(row.get('职位描述', ''))
-        raw_city = clean_text(row.get('城市', ''))
-        raw_salary = clean_text(row.get('薪资', ''))
-        raw_degree = clean_text(row.get('学历要求', ''))
-        raw_type = clean_text(row.get('职位类型', ''))
-        
-        clean_title, title_extracted = normalize_job_title(raw_title)
-        desc_extracted = extract_from_description(raw_desc)
-        
-        # 2. 字段修复逻辑
-        
-        # 修复公司名称
-        final_company = raw_company
-        if raw_company in COMPANY_TAGS or len(raw_company) < 2:
-            if 'company_candidate' in desc_extracted:
-                final_company = desc_extracted['company_candidate']
-                stats['company_restored_from_desc'] += 1
-            else:
-                final_company = "未知"
-                stats['company_unknown'] += 1
-        
-        # 修复城市 (优先级: 原城市 > 标题提取 > 描述提取)
-        # 但如果原城市字段实际上是无效的（空或显然错误），则覆盖
-        # 此处简化策略：如果为空，尝试填充
-        final_city = raw_city
-        if not final_city:
-            if 'city_from_title' in title_extracted:
-                final_city = title_extracted['city_from_title']
-                stats['city_restored_from_title'] += 1
-            elif 'city_candidate' in desc_extracted:
-                final_city = desc_extracted['city_candidate']
-                stats['city_restored_from_desc'] += 1
-            
-        # 修复学历 (策略: 如果原值为"不限"或为空，且描述里有明确学历，则覆盖)
-        final_degree = raw_degree
-        if (not final_degree or final_degree == "不限") and 'degree_candidate' in desc_extracted:
-            final_degree = desc_extracted['degree_candidate']
-            stats['degree_restored_from_desc'] += 1
-            
-        # 修复职位类型
-        final_type = raw_type
-        if not final_type and 'job_type_candidate' in desc_extracted:
-            final_type = desc_extracted['job_type_candidate']
-            stats['type_restored_from_desc'] += 1
-             
-        final_salary_struct = extract_salary(raw_salary)
-             
-        # 3. 构建
-        new_row = row.copy()
-        new_row['岗位名称'] = clean_title
-        new_row['公司名称'] = final_company
-        new_row['城市'] = final_city
-        new_row['学历要求'] = final_degree
-        new_row['职位类型'] = final_type
-        
-        new_row['is_valid_job'] = clean_title != "未知"
-        new_row['parsed_salary'] = final_salary_struct
-        new_row['collection_count'] = desc_extracted.get('collection_count', 0)
-        new_row['active_status'] = desc_extracted.get('active_status', '')
-        new_row['batch'] = title_extracted.get('batch', row.get('毕业年份', ''))
-        
-        # 价值标签 (调整阈值 >= 10)
-        value_tags = []
-        if new_row['collection_count'] >= 10:
-            value_tags.append("高收藏")
-        if new_row['active_status']:
-            value_tags.append("活跃")
-        new_row['value_tags'] = value_tags
-        
-        content_hash = f"{final_company}_{clean_title}_{final_city}"
-        if content_hash in seen_content:
-             stats['duplicate_content_warning'] += 1
-        
-        cleaned_rows.append(new_row)
-        if job_id:
-            seen_ids.add(job_id)
-        seen_content.add(content_hash)
+        # 去重
+        t0 = time.perf_counter()
+        skip = dedup.check(row, row_job_id(row))
+        timings.add('dedup', time.perf_counter() - t0)
+        if skip:
+            stats[skip] += 1
+            continue
         
+        new_row = clean_row(row, stats, ctx)
+        t0 = time.perf_counter()
+        dedup.add(new_row, stats)
+        timings.add('dedup', time.perf_counter() - t0, calls=0)
+        yield new_row
+
+_worker_context = None  # 多进程清洗时子进程的上下文，由 _init_worker 创建
+
+def _clean_chunk(rows):
+    """
+    子进程: 清洗一个分片，每条记录只回传清洗字段元组 (见 clean_fields)，
+    统计、正则命中、缓存命中增量和阶段计时每个分片各回传一份汇总
+    """
+    ctx = _worker_context
+    memo_before = ctx.memo_counts()
+    ctx.timings.clear()
+    ctx.pattern_hits.clear()
+    stats = Counter()
+    results = [clean_fields(row, stats, ctx) for row in rows]
+    memo_delta = {name: (hits - memo_before[name][0], misses - memo_before[name][1])
+                  for name, (hits, misses) in ctx.memo_counts().items()}
+    return results, stats, ctx.pattern_hits, memo_delta, ctx.timings.snapshot()
+
+def _init_worker(maxsize, aliases):
+    """子进程初始化: 与主进程相同的缓存大小和公司别名词典 (spawn 启动时不会继承主进程状态)"""
+    global _worker_context
+    _worker_context = CleaningContext(CompanyResolver(aliases), maxsize)
+
+def _chunked(records, size):
+    it = iter(records)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _iter_clean_parallel(records, stats, workers, dedup, ctx):
+    """
+    多进程清洗: 主进程按输入顺序做清洗前检查（job_id 去重/增量跳过），
+    只把需要清洗的记录分片交给子进程，再按输入顺序合并统计、登记内容键
+    """
+    timings = ctx.timings
+    maxsize = ctx.memo['extract_salary'].cache_info().maxsize
+    with Pool(workers, initializer=_init_worker, initargs=(maxsize, ctx.companies.aliases)) as pool:
+        pending = deque()
+        chunks = _chunked(records, PARALLEL_CHUNK_SIZE)
+        while True:
+            # 保持有限数量的分片在途，避免一次性读入整个输入
+            while len(pending) < workers * PARALLEL_MAX_PENDING:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                t0 = time.perf_counter()
+                skips = [dedup.check(row, row_job_id(row)) for row in chunk]
+                timings.add('dedup', time.perf_counter() - t0, calls=len(chunk))
+                todo = [row for row, skip in zip(chunk, skips) if not skip]
+                pending.append((chunk, skips, pool.apply_async(_clean_chunk, (todo,))))
+            if not pending:
+                return
+            chunk, skips, async_result = pending.popleft()
+            results, chunk_stats, chunk_hits, memo_delta, chunk_timings = async_result.get()
+            stats.update(chunk_stats)
+            ctx.pattern_hits.update(chunk_hits)
+            timings.merge(chunk_timings)
+            for name, (hits, misses) in memo_delta.items():
+                ctx.worker_memo[(name, 'hits')] += hits
+                ctx.worker_memo[(name, 'misses')] += misses
+            results = iter(results)
+            for row, skip in zip(chunk, skips):
+                stats['total_processed'] += 1
+                if skip:
+                    stats[skip] += 1
+                    continue
+                new_row = CleanedJob(row, *next(results))
+                t0 = time.perf_counter()
+                dedup.add(new_row, stats)
+                timings.add('dedup', time.perf_counter() - t0, calls=0)
+                yield new_row
+
+# ==========================================
+# 库接口
+# ==========================================
+
+class JobCleaner:
+    """
+    可复用的清洗器，供生产者、消费者等组件在内存中直接调用，无需先落盘再读回
+    多次调用 clean_batch / clean_iter / aclean 之间保持去重状态、近似去重索引和统计，
+    因此跨批次的重复 job_id 同样会被去掉；compact=True 时产出 CleanedJob，否则产出 dict
+    缓存、正则命中、阶段计时和公司别名词典都在自己的 CleaningContext 中，多个清洗器互不影响；
+    但同一个清洗器不能被多个线程同时使用
+    """
+
+    def __init__(self, workers=1, memo_size=MEMO_SIZE, state_file=None, near_dup='off',
+                 near_dup_threshold=NEAR_DUP_THRESHOLD, company_dict=None, compact=False):
+        self.workers = workers  # 大于 1 时每次调用各自启动进程池，适合大批量
+        self.compact = compact
+        self.stats = Counter()
+        self.output_count = 0
+        self.high_value_count = 0
+        self.dedup = StateStore(state_file) if state_file else DedupState()
+        self.near_dup = near_dup
+        self.near_dup_index = NearDupIndex(near_dup_threshold) if near_dup != 'off' else None
+        companies = CompanyResolver(company_aliases(company_dict)) if company_dict else COMPANY_RESOLVER
+        self.context = CleaningContext(companies, memo_size)
+
+    def clean_iter(self, records):
+        """逐条清洗并去重 records (任意可迭代对象)，边处理边产出"""
+        rows = iter_clean(records, self.stats, self.workers, self.dedup, self.context)
+        if self.near_dup_index:
+            rows = iter_near_dup(rows, self.stats, self.near_dup_index, self.near_dup, self.context)
+        for row in rows:
+            self.output_count += 1
+            if row.value_tags:
+                self.high_value_count += 1
+            yield row if self.compact else row.to_dict()
+
+    def clean_batch(self, records):
+        """清洗一批记录，返回清洗结果列表"""
+        return list(self.clean_iter(records))
+
+    def dedup_cleaned(self, rows):
+        """
+        对在别处 (其它线程/进程中用 clean_row) 清洗好的记录按顺序去重并计数，返回保留的记录
+        供并行的调用方使用: 清洗分散进行，去重状态只有这一份；增量模式的指纹需要原始记录，不支持
+        """
+        if isinstance(self.dedup, StateStore):
+            raise ValueError("增量模式不支持对已清洗的记录去重")
+        kept = []
+        for row in rows:
+            self.stats['total_processed'] += 1
+            skip = self.dedup.check(row, row_job_id(row))
+            if skip:
+                self.stats[skip] += 1
+                continue
+            self.dedup.add(row, self.stats)
+            self.output_count += 1
+            if row.value_tags:
+                self.high_value_count += 1
+            kept.append(row if self.compact else row.to_dict())
+        return kept
+
+    async def aclean(self, records, batch_size=PARALLEL_CHUNK_SIZE):
+        """
+        异步版本: records 为异步可迭代对象 (例如 aiokafka 消费者)
+        按 batch_size 攒批后放到线程池清洗，清洗期间不阻塞事件循环
+        """
+        loop = asyncio.get_running_loop()
+        batch = []
+        async for row in records:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                for new_row in await loop.run_in_executor(None, self.clean_batch, batch):
+                    yield new_row
+                batch = []
+        if batch:
+            for new_row in await loop.run_in_executor(None, self.clean_batch, batch):
+                yield new_row
+
+    def report(self, finished=True, started=None):
+        """当前的清洗报告 (与 cleaning_report.json 结构相同)"""
+        if self.near_dup_index:
+            self.stats['near_dup_clusters'] = len(self.near_dup_index.members)
+        return build_report(self.stats, self.output_count, self.high_value_count, finished, started, self.context)
+
+    def commit(self):
+        """增量模式下持久化去重状态"""
+        self.dedup.commit()
+
+    def close(self):
+        """关闭状态库，未 commit 的状态变更随之丢弃"""
+        self.dedup.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        # 正常结束时提交状态；异常 (含 KeyboardInterrupt) 时回滚，已处理但未写完的记录下次重新清洗
+        if exc_type is None:
+            self.commit()
+        else:
+            self.dedup.rollback()
+        self.close()
+
+def process_data(data, memo_size=MEMO_SIZE):
+    cleaner = JobCleaner(memo_size=memo_size, compact=True)
+    print("开始清洗数据...")
+    cleaned_rows = cleaner.clean_batch(data)
+    print("清洗完成。")
+    return cleaned_rows, cleaner.stats
+
+def build_report(stats, output_count, high_value_count, finished=True, started=None, ctx=None):
+    ctx = ctx or DEFAULT_CONTEXT
+    return {
+        "input_count": stats['total_processed'],
+        "output_count": output_count,
+        "high_value_count": high_value_count,
+        "finished": finished,
+        "wall_seconds": round(time.perf_counter() - started, 4) if started else None,
+        "stats": dict(stats),
+        "pattern_hits": dict(ctx.pattern_hits),
+        "memo": ctx.memo_report(),
+        "timings": ctx.timings.report()
+    }
+
+def write_report(report, filepath):
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+def run_pipeline(input_file, output_file, high_value_file, report_file, fmt=None, workers=1,
+                 memo_size=MEMO_SIZE, state_file=None, near_dup='off',
+                 near_dup_threshold=NEAR_DUP_THRESHOLD, clusters_file=None,
+                 company_dict=None):
+    """
+    流式清洗: 读取 -> 清洗 -> 写出 全程逐条进行
+    state_file 不为空时为增量模式: 只清洗新增/变化的记录并追加到输出文件；
+    有记录变化时，运行结束后重写输出文件，去掉这些记录此前写出的旧版本 (每个 job_id 只保留最新一条)；
+    中途出错时状态库回滚、输出文件恢复原样，修正输入后重新运行即可
+    near_dup 不为 off 时做近似去重 (仅在本次运行的记录之间)，clusters_file 不为空时把簇写入该文件
+    company_dict 为公司别名词典文件，追加到 KNOWN_COMPANIES 之上
+    返回 (report, stats)；输入为空时返回 (None, stats)
+    """
+    started = time.perf_counter()
+    records = iter_records(input_file)
+    first = next(records, None)
+    if first is None:
+        return None, Counter()
+    records = itertools.chain([first], records)
+    
+    incremental = state_file is not None
+    cleaner = JobCleaner(workers, memo_size, state_file, near_dup, near_dup_threshold,
+                         company_dict, compact=True)
+    stats = cleaner.stats
+    print("开始清洗数据..." + (f" (增量模式，状态库: {state_file})" if incremental else ""))
+    with cleaner:
+        with open_writer(output_file, fmt, append=incremental) as out, \
+                open_writer(high_value_file, fmt, append=incremental) as high_value:
+            for row in cleaner.clean_iter(records):
+                t0 = time.perf_counter()
+                # 每条记录只还原一次 dict，高价值记录两个文件共用
+                data = row.to_dict()
+                out.write(data)
+                if row.value_tags:
+                    high_value.write(data)
+                cleaner.context.timings.add('save', time.perf_counter() - t0)
+                if stats['total_processed'] % REPORT_INTERVAL == 0:
+                    out.flush()
+                    high_value.flush()
+                    write_report(cleaner.report(finished=False, started=started), report_file)
+        if incremental and cleaner.dedup.changed:
+            stats['incremental_superseded'] = drop_previous_versions(
+                output_file, fmt, out.count, cleaner.dedup.changed)
+            drop_previous_versions(high_value_file, fmt, high_value.count, cleaner.dedup.changed)
+        # 状态库只在输出写完、旧版本去掉之后提交；此前任何异常都会回滚状态并撤销本次追加
+        cleaner.commit()
     print("清洗完成。")
-    return cleaned_rows, stats
+    
+    if near_dup != 'off' and clusters_file:
+        with open(clusters_file, 'w', encoding='utf-8') as f:
+            json.dump(cleaner.near_dup_index.clusters(), f, ensure_ascii=False, indent=2)
+        print(f"近似重复簇已保存: {clusters_file}")
+    
+    report = cleaner.report(started=started)
+    write_report(report, report_file)
+    return report, stats
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="牛客网岗位数据清洗")
+    parser.add_argument('--input', default=INPUT_FILE, help="输入文件 (JSON 数组或 NDJSON)")
+    parser.add_argument('--output', default=OUTPUT_FILE, help="清洗结果输出文件")
+    parser.add_argument('--high-value', default=HIGH_VALUE_FILE, help="高价值岗位输出文件")
+    parser.add_argument('--report', default=REPORT_FILE, help="清洗报告文件")
+    parser.add_argument('--format', choices=sorted(WRITERS), default=None,
+                        help="输出格式，默认按扩展名推断 (.ndjson/.jsonl/.parquet/.arrow)")
+    parser.add_argument('--workers', type=int, default=1, help="清洗进程数，大于 1 时启用多进程")
+    parser.add_argument('--memo-size', type=int, default=MEMO_SIZE,
+                        help="薪资/岗位名称/公司修复缓存的最大条目数，0 表示关闭")
+    parser.add_argument('--incremental', action='store_true',
+                        help="增量模式: 只清洗新增或变化的记录，并追加到已有输出文件")
+    parser.add_argument('--state-file', default=STATE_FILE, help="增量模式的状态库 (SQLite)")
+    parser.add_argument('--near-dup', choices=NEAR_DUP_MODES, default='off',
+                        help="近似去重 (MinHash + LSH，同公司同城市): flag 标记 near_dup_of; drop 丢弃")
+    parser.add_argument('--near-dup-threshold', type=float, default=NEAR_DUP_THRESHOLD,
+                        help="近似重复的估计 Jaccard 相似度阈值")
+    parser.add_argument('--clusters', nargs='?', const=NEAR_DUP_CLUSTERS_FILE, default=None,
+                        help=f"把近似重复簇写入文件 (配合 --near-dup，默认 {NEAR_DUP_CLUSTERS_FILE})")
+    parser.add_argument('--company-dict', default=None,
+                        help="公司别名词典: .json 为 {规范名: [别名]}，其它为每行 \"规范名,别名,...\"")
+    parser.add_argument('--profile', nargs='?', const=PROFILE_FILE, default=None,
+                        help=f"用 cProfile 剖析本次运行并保存 pstats 文件 (默认 {PROFILE_FILE})")
+    return parser.parse_args(argv)
 
 # ==========================================
 # 执行入口
@@ -306,47 +1624,58 @@ def process_data(data):
 
 if __name__ == "__main__":
     try:
-        if not os.path.exists(INPUT_FILE):
-            print(f"找不到输入文件: {INPUT_FILE}")
+        args = parse_args()
+        if not os.path.exists(args.input):
+            print(f"找不到输入文件: {args.input}")
+            exit(1)
+        if args.incremental and issubclass(WRITERS[args.format or guess_format(args.output)], ColumnarWriter):
+            print("增量模式需要可追加的输出格式 (json/ndjson)")
+            exit(1)
+        if args.clusters and args.near_dup == 'off':
+            print("--clusters 需要配合 --near-dup flag/drop 使用")
             exit(1)
             
-        raw_data = load_data(INPUT_FILE)
-        if not raw_data:
+        profiler = cProfile.Profile() if args.profile else None
+        if profiler:
+            profiler.enable()
+        report, stats = run_pipeline(args.input, args.output, args.high_value, args.report,
+                                     args.format, args.workers, args.memo_size,
+                                     args.state_file if args.incremental else None,
+                                     args.near_dup, args.near_dup_threshold, args.clusters,
+                                     args.company_dict)
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"剖析结果已保存: {args.profile}")
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+        if report is None:
             print("数据为空，退出。")
             exit(1)
             
-        cleaned_data, stats = process_data(raw_data)
-        
-        # 筛选高价值岗位
-        high_value_jobs = [row for row in cleaned_data if row.get('value_tags')]
-        
-        # 保存结果
-        save_data(cleaned_data, OUTPUT_FILE)
-        save_data(high_value_jobs, HIGH_VALUE_FILE)
-        
-        # 保存报告
-        report = {
-            "input_count": len(raw_data),
-            "output_count": len(cleaned_data),
-            "high_value_count": len(high_value_jobs),
-            "stats": dict(stats)
-        }
-        with open(REPORT_FILE, 'w', encoding='utf-8') as f:
-            json.dump(report, f, ensure_ascii=False, indent=2)
-            
         print("="*30)
         print("清洗报告 Summary:")
-        print(f"原数据: {len(raw_data)}")
-        print(f"处理后: {len(cleaned_data)}")
-        print(f"高价值: {len(high_value_jobs)}")
+        print(f"原数据: {report['input_count']}")
+        print(f"处理后: {report['output_count']}")
+        print(f"高价值: {report['high_value_count']}")
         print(f"公司名修复: {stats['company_restored_from_desc']}")
         print(f"公司名未知: {stats['company_unknown']}")
+        if args.company_dict:
+            print(f"公司名规范化: {stats['company_canonicalized']}")
         print(f"城市修复: {stats['city_restored_from_desc'] + stats['city_restored_from_title']}")
         print(f"ID去重: {stats['duplicate_id']}")
+        if args.near_dup != 'off':
+            print(f"近似重复: {stats['near_duplicate']} 条 / {stats['near_dup_clusters']} 簇")
+        print(f"总耗时: {report['wall_seconds']:.2f} 秒")
+        for stage, timing in report['timings'].items():
+            print(f"  {stage}: {timing['seconds']:.3f} 秒 / {timing['calls']} 次")
+        if args.incremental:
+            print(f"增量新增: {stats['incremental_new']} | 变化: {stats['incremental_changed']} | 跳过未变化: {stats['incremental_unchanged']}"
+                  f" | 替换旧版本: {stats['incremental_superseded']}")
         print("="*30)
     except Exception as e:
         import traceback
         with open('error.log', 'w', encoding='utf-8') as f:
             f.write(traceback.format_exc())
-        print("程序发生错误，详情请查看 error.log")
+        print(f"程序发生错误: {e}")
+        print("详情请查看 error.log")
         exit(1)
@@ -0,0 +1,200 @@
+"""
+岗位记录 JSON 编解码
+清洗脚本、Kafka 生产者/消费者和爬虫共用，按可用性选择后端: orjson > msgspec > 标准库 json
+1. dumps: 紧凑 UTF-8 字节 (无多余空格，中文不转义)，各后端输出一致
+2. dumps_pretty: 缩进 2 格的字符串，不含浮点数的记录与 json.dumps(obj, ensure_ascii=False, indent=2) 一致
+3. loads: 接受 bytes 或 str，超出 64 位的整数保持为 int
+4. pack_envelope / unpack_envelope: 把多条记录打包为一条 Kafka 消息 (NDJSON，每行一条记录)
+5. LazyJob: 保留原始字节，访问字段时才解码；只读 SUMMARY_FIELDS 时 (安装 msgspec) 只解码这几个键
+
+用法:
+    import job_codec
+    data = job_codec.dumps(job)
+    job = job_codec.loads(data)
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # 可选的加速后端
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # 可选的加速后端，同时提供类型化解码
+    msgspec = None
+
+if orjson is not None:
+    BACKEND = 'orjson'
+elif msgspec is not None:
+    BACKEND = 'msgspec'
+else:
+    BACKEND = 'json'
+
+# 各后端解析失败时抛出的异常
+DecodeError = (ValueError, msgspec.DecodeError) if msgspec is not None else ValueError
+
+if msgspec is not None:
+    _encoder = msgspec.json.Encoder()
+    _decoder = msgspec.json.Decoder()
+
+
+# 加速后端不支持的值 (超出 64 位的整数、非字符串键、孤立代理字符等) 回退到标准库
+_ENCODE_ERRORS = tuple(e for e in (TypeError, UnicodeEncodeError, msgspec and msgspec.EncodeError) if e)
+
+
+def dumps(obj):
+    """编码为紧凑的 UTF-8 JSON 字节"""
+    try:
+        if BACKEND == 'orjson':
+            return orjson.dumps(obj)
+        if BACKEND == 'msgspec':
+            return _encoder.encode(obj)
+    except _ENCODE_ERRORS:
+        pass
+    text = json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+    try:
+        return text.encode('utf-8')
+    except UnicodeEncodeError:
+        # 孤立代理字符无法编码为合法的 UTF-8，转义为 \uXXXX (解码后还原为同样的字符串)
+        return json.dumps(obj, ensure_ascii=True, separators=(',', ':')).encode('ascii')
+
+
+def dumps_pretty(obj):
+    """
+    编码为缩进 2 格的字符串；由字符串、整数、布尔和 None 组成的记录与
+    json.dumps(obj, ensure_ascii=False, indent=2) 一致
+    浮点数的写法随后端而异 (orjson 写 1e16，标准库写 1e+16)，NaN/Infinity 在 orjson 下写为 null
+    """
+    if BACKEND == 'orjson':
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode('utf-8')
+        except TypeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False, indent=2)
+
+
+def loads(data):
+    """解析 JSON (bytes 或 str)"""
+    try:
+        if BACKEND == 'orjson':
+            obj = orjson.loads(data)
+            # orjson 把超出 64 位的整数解析为 float，结果中有 float 时由标准库重新解析 (岗位记录中很少有浮点数)
+            return json.loads(data) if _has_float(obj) else obj
+        if BACKEND == 'msgspec':
+            return _decoder.decode(data)
+    except DecodeError:
+        # 加速后端不接受孤立代理字符的转义 (dumps 回退时写出的 \ud800 等)，由标准库解析；
+        # 确实损坏的输入在标准库中同样抛出 ValueError
+        pass
+    return json.loads(data)
+
+
+def _has_float(obj):
+    t = type(obj)
+    if t is dict:
+        obj = obj.values()
+    elif t is not list:
+        return t is float
+    for value in obj:
+        t = type(value)
+        if t is float or ((t is dict or t is list) and _has_float(value)):
+            return True
+    return False
+
+
+# ==================== 信封 ====================
+# 信封消息的 Kafka header: 值为 ENVELOPE_FORMAT，另有 ENVELOPE_COUNT_HEADER 记录条数
+# 紧凑编码的记录中不会出现换行 (字符串内的换行被转义为 \n)，因此可以直接按行拼接
+ENVELOPE_HEADER = 'envelope'
+ENVELOPE_FORMAT = b'ndjson'
+ENVELOPE_COUNT_HEADER = 'count'
+
+
+def pack_envelope(values):
+    """把多条 dumps 编码好的记录拼成一条 NDJSON 消息体"""
+    return b'\n'.join(values)
+
+
+def is_envelope(headers):
+    """根据 Kafka 消息的 headers ([(key, bytes), ...]) 判断是否为信封"""
+    return (ENVELOPE_HEADER, ENVELOPE_FORMAT) in (headers or ())
+
+
+def unpack_envelope(data):
+    """拆开信封，返回记录列表"""
+    return [loads(line) for line in data.split(b'\n') if line]
+
+
+def envelope_count(headers, data):
+    """信封中的记录数: 优先读 count header，没有时按行数计，都不需要解析 JSON"""
+    for key, value in headers or ():
+        if key == ENVELOPE_COUNT_HEADER:
+            return int(value)
+    return sum(1 for line in data.split(b'\n') if line)
+
+
+def unpack_envelope_lazy(data):
+    """拆开信封但不解析，返回 LazyJob 列表"""
+    return [LazyJob(line) for line in data.split(b'\n') if line]
+
+
+# ==================== 延迟解码 ====================
+# 消费端显示和路由常用的字段，LazyJob 只读这些键时不做完整解析
+SUMMARY_FIELDS = ('岗位名称', '公司名称', '薪资')
+
+if msgspec is not None:
+    class JobSummary(msgspec.Struct):
+        """只声明 SUMMARY_FIELDS 的结构体，解码时跳过其余字段 (不为职位描述等长字符串构造对象)"""
+        title: Any = msgspec.field(default=msgspec.UNSET, name='岗位名称')
+        company: Any = msgspec.field(default=msgspec.UNSET, name='公司名称')
+        salary: Any = msgspec.field(default=msgspec.UNSET, name='薪资')
+
+    _summary_decoder = msgspec.json.Decoder(JobSummary)
+    _SUMMARY_ATTRS = dict(zip(SUMMARY_FIELDS, ('title', 'company', 'salary')))
+else:
+    JobSummary = None
+    _SUMMARY_ATTRS = {}
+
+_MISSING = object()
+
+
+class LazyJob:
+    """
+    延迟解码的岗位记录: 创建时只保存原始字节，第一次访问字段时才解码
+    安装 msgspec 时只访问 SUMMARY_FIELDS 只解码为 JobSummary，访问其他键或调用 to_dict 时完整解析并缓存
+    """
+    __slots__ = ('raw', '_job', '_summary')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._job = None
+        self._summary = None
+
+    def to_dict(self):
+        if self._job is None:
+            self._job = loads(self.raw)
+        return self._job
+
+    def get(self, key, default=None):
+        if self._job is None and key in _SUMMARY_ATTRS:
+            if self._summary is None:
+                self._summary = _summary_decoder.decode(self.raw)
+            value = getattr(self._summary, _SUMMARY_ATTRS[key])
+            return default if value is msgspec.UNSET else value
+        return self.to_dict().get(key, default)
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __repr__(self):
+        state = 'decoded' if self._job is not None else f'{len(self.raw)} bytes'
+        return f'LazyJob({state})'
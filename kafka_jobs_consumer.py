@@ -4,52 +4,237 @@ Kafka Consumer - 用于验证 nowcoder_jobs 数据导入
 1. 消费并显示消息
 2. 统计消息数量
 3. 支持从头开始消费或从最新开始
+4. 可选消费后清洗 (--clean)，并把清洗结果写入 NDJSON 文件 (--output=FILE)
+5. 自动拆开 producer 信封模式 (--envelope) 打包的多记录消息，统计按记录计
+6. 传输 (--transport=kafka|memory|file[:DIR])，--timeout=SECONDS 空闲超时后退出
+7. 分区并行 (--workers[=N]): poll() 按批拉取，每个分区的批次交给固定的工作线程 (--processes 时为进程) 解码并清洗，
+   主线程用同一份去重状态按批次顺序去重，整批处理完后手动提交 offset，结束时按工作者输出吞吐
+8. 延迟解码: 只统计时不解析 JSON (信封按 count header 计数)；--detail 只解码显示的三个字段，
+   只有 --clean 才完整解析
 """
 
-import json
 import sys
 import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
-from kafka import KafkaConsumer
-from kafka.errors import KafkaError
+from clean_nowcoder_jobs import CleaningContext, JobCleaner, NdjsonWriter, clean_row
+import job_codec
+import kafka_transport
 
 # ==================== 配置参数 ====================
 KAFKA_SERVERS = ['192.168.120.101:9092', '192.168.120.102:9092', '192.168.120.103:9092']
 TOPIC_NAME = 'nowcoder_jobs'
 GROUP_ID = 'nowcoder_jobs_consumer_group'
+# 传输层 (--transport=kafka|memory|file[:DIR])
+TRANSPORT = kafka_transport.KafkaTransport(KAFKA_SERVERS)
+POLL_TIMEOUT_MS = 1000  # --workers 模式每次 poll 的等待时间
 
 # ==================== 创建 Consumer ====================
-def create_consumer(from_beginning=True):
-    """创建 Kafka Consumer"""
+def create_consumer(from_beginning=True, timeout=None, auto_commit=True):
+    """创建 Kafka Consumer，timeout (秒) 内没有新消息时结束迭代；auto_commit=False 时由调用方提交 offset"""
     auto_offset_reset = 'earliest' if from_beginning else 'latest'
+    options = {}
+    if timeout is not None:
+        options['consumer_timeout_ms'] = int(timeout * 1000)
     
-    return KafkaConsumer(
+    return TRANSPORT.consumer(
         TOPIC_NAME,
-        bootstrap_servers=KAFKA_SERVERS,
+        **options,
         group_id=GROUP_ID,
-        value_deserializer=lambda m: json.loads(m.decode('utf-8')),
+        # value 保留原始字节，由 decode_message 根据 header 决定按单条还是按信封解码
         key_deserializer=lambda k: k.decode('utf-8') if k else None,
         auto_offset_reset=auto_offset_reset,
-        enable_auto_commit=True,
+        enable_auto_commit=auto_commit,
         auto_commit_interval_ms=1000,
         max_poll_records=500,
     )
 
+# ==================== 解码消息 ====================
+def message_count(message):
+    """消息中的记录数，不解析 JSON"""
+    if job_codec.is_envelope(message.headers):
+        return job_codec.envelope_count(message.headers, message.value)
+    return 1
+
+def decode_message(message, lazy=False):
+    """
+    返回消息中的记录列表: 信封拆成多条，普通消息为一条
+    lazy=True 时返回 job_codec.LazyJob，访问字段时才解码 (只读岗位名称/公司名称/薪资时只做部分解码)
+    """
+    if job_codec.is_envelope(message.headers):
+        if lazy:
+            return job_codec.unpack_envelope_lazy(message.value)
+        return job_codec.unpack_envelope(message.value)
+    if lazy:
+        return [job_codec.LazyJob(message.value)]
+    return [job_codec.loads(message.value)]
+
+def message_jobs(message, clean, show_detail):
+    """按需要的程度解码: 清洗需要完整记录，显示详情只需要部分字段，只统计时不解码"""
+    if clean:
+        return decode_message(message)
+    if show_detail:
+        return decode_message(message, lazy=True)
+    return ()
+
+# ==================== 分区并行消费 ====================
+def process_batch(ctx, worker_id, partition, messages, show_detail):
+    """
+    解码 (并清洗) 一个分区的一批消息，返回 (记录数, 信封数, 清洗结果, 耗时)
+    ctx 不为 None 时用该清洗上下文逐条清洗但不去重，清洗结果交给主线程统一去重；否则清洗结果为 None
+    """
+    start = time.perf_counter()
+    count = envelopes = 0
+    cleaned = [] if ctx is not None else None
+    stats = Counter()  # 字段修复统计，工作者中不汇报
+    for message in messages:
+        jobs = message_jobs(message, ctx is not None, show_detail)
+        if job_codec.is_envelope(message.headers):
+            envelopes += 1
+        count += message_count(message)
+        if ctx is not None:
+            cleaned.extend(clean_row(job, stats, ctx) for job in jobs)
+        elif show_detail:
+            for job in jobs:
+                print(f"[W{worker_id}|P{partition}|O{message.offset}] {job.get('岗位名称', 'N/A')} - {job.get('公司名称', 'N/A')} - {job.get('薪资', 'N/A')}")
+    return count, envelopes, cleaned, time.perf_counter() - start
+
+# 工作进程中的清洗上下文 (--processes)，由 init_worker_process 创建
+_process_context = None
+
+def init_worker_process(clean):
+    global _process_context
+    _process_context = CleaningContext() if clean else None
+
+def process_batch_in_process(*args):
+    return process_batch(_process_context, *args)
+
+def cleaner_summary(cleaner):
+    return {
+        'output': cleaner.output_count,
+        'duplicate_id': cleaner.stats['duplicate_id'],
+        'high_value': cleaner.high_value_count,
+    }
+
+class PartitionWorker:
+    """
+    处理分配给它的分区的批次: 单个线程 (或 processes=True 时单个进程) 执行，同一分区的批次按 poll 顺序处理
+    每个工作者有自己的清洗上下文 (缓存与计数)，只清洗不去重；去重状态只有主线程的一份，
+    因此同一 job_id 落在不同分区 (例如信封模式的 round-robin) 时同样只保留一条；
+    清洗是 CPU 密集的纯 Python 代码，多线程受 GIL 限制，需要并行清洗时使用进程
+    """
+    def __init__(self, worker_id, clean, show_detail, processes=False):
+        self.worker_id = worker_id
+        self.show_detail = show_detail
+        self.processes = processes
+        if processes:
+            self.executor = ProcessPoolExecutor(max_workers=1, initializer=init_worker_process, initargs=(clean,))
+            self.context = None
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'consumer-worker-{worker_id}')
+            self.context = CleaningContext() if clean else None
+        self.partitions = set()
+        self.records = 0
+        self.envelopes = 0
+        self.busy = 0.0  # 处理批次累计耗时 (秒)
+    
+    def submit(self, partition, messages):
+        self.partitions.add(partition)
+        args = (self.worker_id, partition, messages, self.show_detail)
+        if self.processes:
+            return self.executor.submit(process_batch_in_process, *args)
+        return self.executor.submit(process_batch, self.context, *args)
+    
+    def collect(self, future):
+        """等待批次处理完成并累计统计 (在主线程调用)，返回 (记录数, 清洗结果)"""
+        count, envelopes, cleaned, elapsed = future.result()
+        self.records += count
+        self.envelopes += envelopes
+        self.busy += elapsed
+        return count, cleaned
+    
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+def consume_parallel(consumer, workers, partition_counts, cleaner=None, writer=None, max_messages=None,
+                     timeout=None, show_detail=False):
+    """
+    poll() 按批拉取，每个分区的记录交给 partition % len(workers) 号工作线程
+    工作者清洗好的记录由 cleaner 在主线程按批次顺序去重后写出
+    一批中所有分区都处理完 (清洗结果已写出) 后才提交 offset；某个分区处理出错时不提交该批，重启后从上次提交处重新消费
+    各分区的记录数累加到 partition_counts (中断时也保留已处理的部分)，返回记录数
+    """
+    count = 0
+    start_time = time.time()
+    idle_since = time.time()
+    while True:
+        batch = consumer.poll(timeout_ms=POLL_TIMEOUT_MS)
+        if not batch:
+            if timeout is not None and time.time() - idle_since >= timeout:
+                print(f"\n{timeout:g} 秒内没有新消息，停止消费")
+                break
+            continue
+        idle_since = time.time()
+        futures = {tp.partition: workers[tp.partition % len(workers)].submit(tp.partition, messages)
+                   for tp, messages in batch.items()}
+        previous = count
+        for partition, future in futures.items():
+            worker = workers[partition % len(workers)]
+            records, cleaned = worker.collect(future)
+            partition_counts[partition] = partition_counts.get(partition, 0) + records
+            count += records
+            if cleaner:
+                kept = cleaner.dedup_cleaned(cleaned)  # 被去重的记录不再输出
+                if writer:
+                    for job in kept:
+                        writer.write(job)
+                if show_detail:
+                    for job in kept:
+                        print(f"[W{worker.worker_id}|P{partition}] {job.get('岗位名称', 'N/A')} - {job.get('公司名称', 'N/A')} - {job.get('薪资', 'N/A')}")
+        consumer.commit()
+        if count // 1000 > previous // 1000:
+            elapsed = time.time() - start_time
+            rate = count / elapsed if elapsed > 0 else 0
+            print(f"已消费: {count:,} 条 | 本批: {count - previous:,} 条 / {len(futures)} 个分区 | 速率: {rate:.0f} msg/s")
+        if max_messages and count >= max_messages:
+            print(f"\n已达到最大消息数 {max_messages}，停止消费")
+            break
+    return count
+
 # ==================== 主函数 ====================
 def main():
     """主函数"""
+    global TRANSPORT
     print("\n" + "="*60)
     print("  Kafka Jobs Data Consumer")
     print("  牛客网招聘数据消费验证工具")
     print("="*60)
-    print(f"Kafka 集群: {', '.join(KAFKA_SERVERS)}")
+    transport = next((arg.split('=', 1)[1] for arg in sys.argv[1:] if arg.startswith('--transport=')), 'kafka')
+    try:
+        TRANSPORT = kafka_transport.from_spec(transport, KAFKA_SERVERS)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return
+    if TRANSPORT.name == 'kafka':
+        print(f"Kafka 集群: {', '.join(KAFKA_SERVERS)}")
+    else:
+        print(f"传输: {TRANSPORT.describe()} (本地模拟，不连接集群)")
     print(f"Topic: {TOPIC_NAME}")
     print(f"Consumer Group: {GROUP_ID}")
+    print(f"JSON 解码: {job_codec.BACKEND}")
     
     # 解析命令行参数
     from_beginning = '--from-beginning' in sys.argv or '-b' in sys.argv
     show_detail = '--detail' in sys.argv or '-d' in sys.argv
+    clean = '--clean' in sys.argv
     max_messages = None
+    output_file = None
+    timeout = None
+    # --workers 每个分区一个工作线程，--workers=N 最多 N 个 (分区按 partition % N 分配)
+    parallel = '--workers' in sys.argv
+    processes = '--processes' in sys.argv
+    num_workers = None
     
     for arg in sys.argv[1:]:
         if arg.startswith('--max='):
@@ -57,49 +242,94 @@ def main():
                 max_messages = int(arg.split('=')[1])
             except ValueError:
                 pass
+        elif arg.startswith('--output='):
+            output_file = arg.split('=', 1)[1]
+        elif arg.startswith('--workers='):
+            parallel = True
+            try:
+                num_workers = max(1, int(arg.split('=', 1)[1]))
+            except ValueError:
+                pass
+        elif arg.startswith('--timeout='):
+            try:
+                timeout = float(arg.split('=', 1)[1])
+            except ValueError:
+                pass
     
     print(f"从头消费: {'是' if from_beginning else '否'}")
     print(f"显示详情: {'是' if show_detail else '否'}")
     print(f"最大消息数: {max_messages if max_messages else '无限制'}")
+    print(f"消费后清洗: {'是' if clean else '否'}" + (f" (输出: {output_file})" if clean and output_file else ""))
+    print(f"分区并行: {('是 (工作进程' if processes else '是 (工作线程') + '，批量 poll，整批处理完后手动提交)' if parallel else '否'}")
     print(f"\n{'='*60}")
     print("开始消费消息 (Ctrl+C 退出)...")
     print(f"{'='*60}\n")
     
-    consumer = create_consumer(from_beginning)
+    consumer = create_consumer(from_beginning, timeout, auto_commit=not parallel)
+    # 清洗器在整个消费过程中保持去重状态，重复投递的 job_id 只保留第一条 (--workers 时只用于去重)
+    cleaner = JobCleaner() if clean else None
+    writer = NdjsonWriter(output_file) if clean and output_file else None
+    workers = []
+    if parallel:
+        num_workers = num_workers or len(consumer.partitions_for_topic(TOPIC_NAME) or ()) or 1
+        workers = [PartitionWorker(i, clean, show_detail, processes) for i in range(num_workers)]
+        print(f"工作{'进程' if processes else '线程'}: {num_workers} 个\n")
     
     count = 0
+    envelopes = 0
     start_time = time.time()
     partition_counts = {}
     
     try:
-        for message in consumer:
-            count += 1
+        if parallel:
+            count = consume_parallel(consumer, workers, partition_counts, cleaner, writer, max_messages, timeout,
+                                     show_detail)
+        else:
+            for message in consumer:
+                jobs = message_jobs(message, cleaner is not None, show_detail)
+                records = message_count(message)
+                if job_codec.is_envelope(message.headers):
+                    envelopes += 1
+                previous = count
+                count += records
             
-            # 统计每个分区的消息数
-            partition = message.partition
-            partition_counts[partition] = partition_counts.get(partition, 0) + 1
+                # 统计每个分区的记录数
+                partition = message.partition
+                partition_counts[partition] = partition_counts.get(partition, 0) + records
             
-            if show_detail:
-                job = message.value
-                print(f"[P{partition}|O{message.offset}] {job.get('岗位名称', 'N/A')} - {job.get('公司名称', 'N/A')} - {job.get('薪资', 'N/A')}")
-            else:
-                # 每100条消息打印一次进度
-                if count % 100 == 0:
-                    elapsed = time.time() - start_time
-                    rate = count / elapsed if elapsed > 0 else 0
-                    print(f"已消费: {count:,} 条 | 速率: {rate:.0f} msg/s")
+                if cleaner:
+                    jobs = cleaner.clean_batch(jobs)  # 被去重的记录不再输出
+                    if writer:
+                        for job in jobs:
+                            writer.write(job)
             
-            # 检查是否达到最大消息数
-            if max_messages and count >= max_messages:
-                print(f"\n已达到最大消息数 {max_messages}，停止消费")
-                break
+                if show_detail:
+                    for job in jobs:
+                        print(f"[P{partition}|O{message.offset}] {job.get('岗位名称', 'N/A')} - {job.get('公司名称', 'N/A')} - {job.get('薪资', 'N/A')}")
+                else:
+                    # 每100条记录打印一次进度
+                    if count // 100 > previous // 100:
+                        elapsed = time.time() - start_time
+                        rate = count / elapsed if elapsed > 0 else 0
+                        print(f"已消费: {count:,} 条 | 速率: {rate:.0f} msg/s")
+            
+                # 检查是否达到最大消息数 (按记录计，信封整条处理完再停止)
+                if max_messages and count >= max_messages:
+                    print(f"\n已达到最大消息数 {max_messages}，停止消费")
+                    break
                 
     except KeyboardInterrupt:
         print("\n\n用户中断，正在退出...")
     except Exception as e:
         print(f"\n✗ 消费过程中发生错误: {e}")
     finally:
+        for worker in workers:
+            worker.close()
         consumer.close()
+        if cleaner:
+            cleaner.close()
+        if writer:
+            writer.close()
     
     # 打印统计信息
     end_time = time.time()
@@ -108,9 +338,25 @@ def main():
     print(f"\n{'='*60}")
     print("  消费完成统计")
     print(f"{'='*60}")
+    if workers:
+        # 以工作者的累计为准: consume_parallel 中途出错时没有返回值
+        count = sum(w.records for w in workers)
+        envelopes = sum(w.envelopes for w in workers)
     print(f"总耗时: {total_time:.2f} 秒")
     print(f"消费消息数: {count:,} 条")
+    if envelopes:
+        print(f"信封消息: {envelopes:,} 条 (每条打包多条记录)")
     print(f"消费速率: {count / total_time:.0f} 消息/秒" if total_time > 0 else "")
+    if cleaner:
+        summary = cleaner_summary(cleaner)
+        print(f"清洗后保留: {summary['output']:,} 条 | ID去重: {summary['duplicate_id']} | "
+              f"高价值: {summary['high_value']:,} 条")
+    if workers:
+        print(f"\n工作{'进程' if processes else '线程'}吞吐:")
+        for w in workers:
+            rate = w.records / w.busy if w.busy > 0 else 0
+            partitions = ', '.join(f"P{p}" for p in sorted(w.partitions)) or '-'
+            print(f"  Worker {w.worker_id} [{partitions}]: {w.records:,} 条 | 处理 {w.busy:.2f} 秒 | {rate:.0f} 条/秒")
     print(f"\n分区消息分布:")
     for p, c in sorted(partition_counts.items()):
         print(f"  Partition {p}: {c:,} 条")
@@ -122,5 +368,11 @@ if __name__ == '__main__':
     print("  -b, --from-beginning  从头开始消费")
     print("  -d, --detail          显示消息详情")
     print("  --max=N               最多消费N条消息")
+    print("  --clean               消费后清洗去重")
+    print("  --output=FILE         清洗结果写入 NDJSON 文件 (配合 --clean)")
+    print("  --transport=NAME      kafka (默认)、memory、file 或 file:DIR")
+    print("  --timeout=SECONDS     空闲超过该时间后退出")
+    print("  --workers[=N]         按分区并行处理 (批量 poll，整批处理完后手动提交 offset)")
+    print("  --processes           配合 --workers，工作者使用进程 (并行清洗)")
     print("")
     main()
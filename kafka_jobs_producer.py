@@ -1,23 +1,41 @@
 """
 优化的 Kafka Producer - 用于导入 nowcoder_jobs_edge.json 数据到 Kafka
 特性：
-1. 批量处理数据
-2. 多线程发送
+1. 流式读取 (JSON 数组或 NDJSON，--input=FILE)，边读边分块发送，内存占用与文件大小无关
+2. 并行发送 (--parallel): 多进程编码 JSON，编码好的字节由多个发送线程交给一个或多个 producer
 3. 异步回调处理
 4. 进度显示
 5. 错误处理和重试机制
+6. 可选发送前清洗 (--clean)，直接发送清洗去重后的记录
+7. 检查点 (--checkpoint=FILE): 按输入顺序记录连续确认到的位置，中断后 --resume 从该位置继续，
+   可选 --idempotent 开启幂等 producer，避免 broker 重试产生重复消息
+8. 信封模式 (--envelope[=N]): 每条 Kafka 消息打包 N 条记录 (NDJSON)，并改用 zstd/lz4 压缩，
+   大批量导入时消息数和请求数减少一个数量级；消费端见 kafka_jobs_consumer.py
+9. 发送统计 (--stats 或 --stats=FILE): 按线程分片计数，定期输出一行 JSON，
+   包含各分区记录数、发送延迟分布 (入队到确认)、字节数和压缩率
+10. 分区策略 (--partitioner=hash|round-robin|consistent|city)，--dry-run 不连接 Kafka，只预测各分区负载
+11. 自动调优 (--autotune): 用样本数据向校准 topic 试发送，逐项搜索 batch_size、linger_ms、buffer_memory、
+    压缩算法和分块大小，把吞吐最高的配置保存到 --profile=FILE；之后的运行自动加载 (--no-profile 忽略)；
+    本地传输 (memory/file) 的 producer 忽略 batch_size 等 producer 参数，在本地传输上只搜索分块大小
+12. 传输 (--transport=kafka|memory|file[:DIR]): 见 kafka_transport.py，本地日志可离线测试和基准测试
 """
 
-import json
 import time
 import os
 import sys
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from kafka import KafkaProducer, KafkaAdminClient
-from kafka.admin import NewTopic
-from kafka.errors import TopicAlreadyExistsError, KafkaError
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from queue import Queue
+from kafka.codec import has_lz4, has_snappy, has_zstd
+from kafka.partitioner.default import murmur2
+import bisect
+import itertools
+import hashlib
 import threading
+from clean_nowcoder_jobs import JobCleaner, iter_records
+import job_codec
+import kafka_transport
 
 # ==================== 配置参数 ====================
 # 使用 IP 地址确保连接稳定
@@ -25,6 +43,8 @@ KAFKA_SERVERS = ['192.168.120.101:9092', '192.168.120.102:9092', '192.168.120.10
 TOPIC_NAME = 'nowcoder_jobs'
 NUM_PARTITIONS = 3  # 分区数
 REPLICATION_FACTOR = 2  # 副本数
+# 传输层 (--transport=kafka|memory|file[:DIR])，memory/file 为本地模拟，不需要集群
+TRANSPORT = kafka_transport.KafkaTransport(KAFKA_SERVERS)
 
 # 数据文件路径
 DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nowcoder_jobs_edge.json')
@@ -38,26 +58,304 @@ COMPRESSION_TYPE = 'gzip'  # 压缩类型
 NUM_THREADS = 4  # 发送线程数
 CHUNK_SIZE = 500  # 每个chunk的记录数
 
-# ==================== 统计计数器 ====================
-class Counter:
+# 信封模式参数 (--envelope)
+ENVELOPE_SIZE = 100  # 每条消息打包的记录数，最多 CHUNK_SIZE
+ENVELOPE_MAX_BYTES = MAX_REQUEST_SIZE // 2  # 超过该大小的信封对半拆开，给 header 和批次开销留余量
+ENVELOPE_BATCH_SIZE = 262144  # 信封模式的批次大小（256KB），一个批次容纳多个信封
+# 优先 zstd (需要 broker >= 2.1)，其次 lz4，都没有安装时退回 gzip
+ENVELOPE_COMPRESSION = 'zstd' if has_zstd() else 'lz4' if has_lz4() else 'gzip'
+
+# 自动调优参数 (--autotune)
+PROFILE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'producer_profile.json')
+AUTOTUNE_TOPIC = TOPIC_NAME + '_autotune'  # 校准发送使用单独的 topic，不污染正式数据
+AUTOTUNE_SAMPLE = 20000  # 每次试发送的记录数 (取输入的前 N 条)
+AUTOTUNE_MIN_GAIN = 0.05  # 吞吐至少提高 5% 才替换当前配置，避免追逐测量噪声
+# 逐项搜索的取值范围: 每次只改变一项，其余保持当前最优值
+AUTOTUNE_GRID = {
+    'compression_type': [None, 'gzip'] + [name for name, available in
+                                          (('snappy', has_snappy()), ('lz4', has_lz4()), ('zstd', has_zstd()))
+                                          if available],
+    'batch_size': [16384, 32768, 131072, 262144],
+    'linger_ms': [0, 5, 20, 50],
+    'buffer_memory': [33554432, 67108864, 134217728],
+    'chunk_size': [200, 500, 2000],
+}
+# 本地传输 (memory/file) 上有意义的参数: LocalProducer 不实现批次、linger、缓冲区和压缩，其余参数的差别只是噪声
+LOCAL_AUTOTUNE_PARAMS = ['chunk_size']
+
+# 检查点参数
+CHECKPOINT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'producer_checkpoint.json')
+CHECKPOINT_INTERVAL = 2.0  # 发送过程中写检查点的最小间隔（秒）
+
+# 并行发送参数 (--parallel)
+NUM_PRODUCERS = 2  # producer 实例数，发送线程轮流使用
+# JSON 编码进程数，0 表示在主线程编码: orjson/msgspec 编码一条记录比把它传给子进程还便宜，
+# 只有标准库后端时才值得用多进程
+NUM_ENCODERS = 0 if job_codec.BACKEND != 'json' else min(4, (os.cpu_count() or 1) - 1)
+ENCODE_MAX_PENDING = 2  # 每个编码进程最多排队的数据块数
+SEND_QUEUE_SIZE = 2  # 每个发送线程队列中最多等待的数据块数，队列满时主线程阻塞 (背压)
+
+# 统计参数 (--stats)
+STATS_INTERVAL = 5.0  # 输出统计 JSON 行的间隔（秒）
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)  # 延迟分布的桶上界，最后一桶为超出部分
+
+# ==================== 发送统计 ====================
+class StatsShard:
+    """一个线程的计数分片，只由该线程写入"""
+    __slots__ = ('success', 'failed', 'bytes', 'partitions', 'latency')
+    
     def __init__(self):
         self.success = 0
         self.failed = 0
+        self.bytes = 0
+        self.partitions = {}
+        self.latency = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+class ProducerStats:
+    """
+    发送统计: 回调所在线程各自写 threading.local 中的分片，不加锁；读取时汇总所有分片
+    每个分片只有一个线程写，汇总值可能比实际稍旧，但不会丢失计数
+    """
+    def __init__(self):
+        self.local = threading.local()
+        self.shards = []
+        self.lock = threading.Lock()  # 只在线程第一次写入、注册分片时使用
+        self.producers = []
+        self.compression_ratio = None
+        self.records_per_request = None
+        self.start_time = time.time()
+        self.output = None
+        self.last_emit = 0.0
+    
+    def shard(self):
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = StatsShard()
+            with self.lock:
+                self.shards.append(shard)
+            self.local.shard = shard
+            return shard
+    
+    def record_success(self, metadata, sent_at, count=1):
+        """记录一条成功发送的消息 (信封为 count 条记录)，sent_at 为交给 producer 时的 perf_counter"""
+        shard = self.shard()
+        shard.success += count
+        if metadata is not None:
+            shard.bytes += metadata.serialized_value_size + max(metadata.serialized_key_size, 0)
+            shard.partitions[metadata.partition] = shard.partitions.get(metadata.partition, 0) + count
+        latency_ms = (time.perf_counter() - sent_at) * 1000
+        shard.latency[bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+    
+    def record_failure(self, count=1):
+        self.shard().failed += count
+    
+    def get_counts(self):
+        shards = list(self.shards)
+        return sum(s.success for s in shards), sum(s.failed for s in shards)
+    
+    def watch(self, producer):
+        """登记 producer，从它的 metrics() 读取压缩率"""
+        self.producers.append(producer)
+    
+    def refresh_metrics(self):
+        """读取 producer 自带的压缩率 (压缩后/压缩前) 和每请求记录数，须在 producer 关闭前调用"""
+        compression, per_request = [], []
+        for producer in self.producers:
+            try:
+                metrics = producer.metrics().get('producer-metrics', {})
+            except Exception:
+                continue
+            if metrics.get('compression-rate-avg'):
+                compression.append(metrics['compression-rate-avg'])
+            if metrics.get('records-per-request-avg'):
+                per_request.append(metrics['records-per-request-avg'])
+        if compression:
+            self.compression_ratio = sum(compression) / len(compression)
+        if per_request:
+            self.records_per_request = sum(per_request) / len(per_request)
+    
+    def snapshot(self):
+        """汇总所有分片"""
+        shards = list(self.shards)
+        partitions = {}
+        latency = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        for s in shards:
+            for partition, n in dict(s.partitions).items():
+                partitions[partition] = partitions.get(partition, 0) + n
+            for i, n in enumerate(list(s.latency)):
+                latency[i] += n
+        elapsed = time.time() - self.start_time
+        success = sum(s.success for s in shards)
+        sent_bytes = sum(s.bytes for s in shards)
+        return {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'elapsed_s': round(elapsed, 3),
+            'success': success,
+            'failed': sum(s.failed for s in shards),
+            'records_per_s': round(success / elapsed, 1) if elapsed > 0 else 0,
+            'bytes': sent_bytes,
+            'mb_per_s': round(sent_bytes / elapsed / 1024 / 1024, 3) if elapsed > 0 else 0,
+            'partitions': {str(p): n for p, n in sorted(partitions.items())},
+            'latency_ms': {
+                'p50': latency_percentile(latency, 0.5),
+                'p99': latency_percentile(latency, 0.99),
+                'buckets': {label: n for label, n in zip(latency_labels(), latency)},
+            },
+            'compression_ratio': round(self.compression_ratio, 4) if self.compression_ratio else None,
+            'records_per_request': round(self.records_per_request, 1) if self.records_per_request else None,
+        }
+    
+    def configure(self, target):
+        """target 为 '-' 时输出到标准输出，否则追加到文件"""
+        self.output = sys.stdout if target == '-' else open(target, 'a', encoding='utf-8')
+        self.last_emit = time.time()
+    
+    def emit(self):
+        if self.output is None:
+            return
+        self.refresh_metrics()
+        self.output.write(job_codec.dumps(self.snapshot()).decode('utf-8') + '\n')
+        self.output.flush()
+        self.last_emit = time.time()
+    
+    def maybe_emit(self):
+        if self.output is not None and time.time() - self.last_emit >= STATS_INTERVAL:
+            self.emit()
+    
+    def close(self):
+        if self.output is not None and self.output is not sys.stdout:
+            self.output.close()
+        self.output = None
+
+def latency_labels():
+    return [f"<={b}" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+
+def latency_percentile(latency, q):
+    """按分布估算分位数，返回所在桶的标签 (如 '<=20')；没有样本时返回 None"""
+    total = sum(latency)
+    if not total:
+        return None
+    seen = 0
+    for label, n in zip(latency_labels(), latency):
+        seen += n
+        if seen >= q * total:
+            return label
+    return latency_labels()[-1]
+
+stats = ProducerStats()
+
+# ==================== 检查点 ====================
+class Checkpoint:
+    """
+    记录输入中连续确认到的位置 (水位): 水位之前的记录都已被 broker 确认
+    不同分区的确认可能乱序到达，先到的记录 (起始位置 -> 条数) 暂存在 pending 中，等前面的记录确认后水位再前移；
+    某条记录发送失败后，水位仍随其之前的确认前移，但停在第一条失败的记录处，--resume 时从这条记录重新发送
+    """
+    def __init__(self):
+        self.path = None
+        self.source = None
+        self.watermark = 0
+        self.pending = {}
+        self.failed_offset = None  # 第一条 (输入位置最小的) 发送失败的记录
+        self.last_save = 0.0
         self.lock = threading.Lock()
     
-    def increment_success(self):
+    def start(self, path, source, offset):
+        """从输入位置 offset 开始发送"""
+        self.path = path
+        self.source = source
+        self.watermark = offset
+        self.pending = {}
+        self.failed_offset = None
+        self.last_save = time.time()
+    
+    @property
+    def failed(self):
+        return self.failed_offset is not None
+    
+    def ack(self, offset, count=1):
+        """确认从 offset 开始的 count 条记录"""
         with self.lock:
-            self.success += 1
+            if self.failed_offset is not None and offset >= self.failed_offset:
+                return  # 水位不会越过失败的记录，之后的确认无需暂存
+            if offset != self.watermark:
+                self.pending[offset] = count
+                return
+            self.watermark += count
+            while self.watermark in self.pending:
+                self.watermark += self.pending.pop(self.watermark)
+            if self.failed_offset is not None:
+                self.watermark = min(self.watermark, self.failed_offset)
+    
+    def ack_indices(self, offset, indices):
+        """确认数据块 (输入位置 offset) 中序号为 indices 的记录，按连续段确认"""
+        run_start = run_end = None
+        for i in indices:
+            if i == run_end:
+                run_end += 1
+                continue
+            if run_start is not None:
+                self.ack(offset + run_start, run_end - run_start)
+            run_start, run_end = i, i + 1
+        if run_start is not None:
+            self.ack(offset + run_start, run_end - run_start)
     
-    def increment_failed(self):
+    def fail(self, offset):
+        """记录 offset 处的记录发送失败，丢弃暂存的、位于其后的确认"""
         with self.lock:
-            self.failed += 1
+            if self.failed_offset is not None and self.failed_offset <= offset:
+                return
+            self.failed_offset = offset
+            self.pending = {start: count for start, count in self.pending.items() if start < offset}
     
-    def get_counts(self):
+    def save(self):
+        """原子写入检查点文件 (先写临时文件再替换)"""
+        if self.path is None:
+            return
         with self.lock:
-            return self.success, self.failed
+            state = {
+                'source': self.source,
+                'acked': self.watermark,
+                'failed': self.failed,
+                'updated_at': datetime.now().isoformat(timespec='seconds'),
+            }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(job_codec.dumps_pretty(state))
+        os.replace(tmp_path, self.path)
+        self.last_save = time.time()
+    
+    def maybe_save(self):
+        if time.time() - self.last_save >= CHECKPOINT_INTERVAL:
+            self.save()
 
-counter = Counter()
+checkpoint = Checkpoint()
+
+def describe_source(filepath, clean):
+    """输入文件的标识: 文件变化或清洗选项不同时检查点中的位置不再有效"""
+    stat = os.stat(filepath)
+    return {
+        'input': os.path.abspath(filepath),
+        'size': stat.st_size,
+        'mtime': int(stat.st_mtime),
+        'clean': clean,
+    }
+
+def load_checkpoint(path, source):
+    """读取检查点，返回可以继续发送的输入位置；没有检查点返回 0，与当前输入不匹配返回 None"""
+    if not os.path.exists(path):
+        print(f"⚠ 检查点不存在: {path}，从头开始发送")
+        return 0
+    with open(path, 'rb') as f:
+        state = job_codec.loads(f.read())
+    if state.get('source') != source:
+        print(f"✗ 检查点与当前输入不匹配 (文件或 --clean 选项已变化): {path}")
+        print(f"  检查点: {state.get('source')}")
+        print(f"  当前:   {source}")
+        return None
+    print(f"✓ 从检查点继续: 已确认 {state['acked']:,} 条 (更新于 {state.get('updated_at')})")
+    return state['acked']
 
 # ==================== 创建 Topic ====================
 def create_topic_if_not_exists():
@@ -67,37 +365,14 @@ def create_topic_if_not_exists():
     print(f"{'='*60}")
     
     try:
-        admin_client = KafkaAdminClient(
-            bootstrap_servers=KAFKA_SERVERS,
-            client_id='admin_client',
-            request_timeout_ms=10000,
-        )
-        
-        # 获取现有topic列表
-        existing_topics = admin_client.list_topics()
-        
-        if TOPIC_NAME in existing_topics:
+        if not TRANSPORT.create_topic(TOPIC_NAME, NUM_PARTITIONS, REPLICATION_FACTOR):
             print(f"✓ Topic '{TOPIC_NAME}' 已存在")
-            admin_client.close()
             return True
-        
-        # 创建新topic
-        topic = NewTopic(
-            name=TOPIC_NAME,
-            num_partitions=NUM_PARTITIONS,
-            replication_factor=REPLICATION_FACTOR
-        )
-        
-        admin_client.create_topics([topic], validate_only=False)
         print(f"✓ Topic '{TOPIC_NAME}' 创建成功")
         print(f"  - 分区数: {NUM_PARTITIONS}")
         print(f"  - 副本数: {REPLICATION_FACTOR}")
-        admin_client.close()
         return True
         
-    except TopicAlreadyExistsError:
-        print(f"✓ Topic '{TOPIC_NAME}' 已存在")
-        return True
     except Exception as e:
         # 如果 AdminClient 出错，尝试直接发送（topic可能已存在）
         print(f"⚠ Topic 检查出错: {e}")
@@ -105,136 +380,720 @@ def create_topic_if_not_exists():
         return True  # 继续执行，让 producer 尝试发送
 
 # ==================== 创建 Producer ====================
-def create_producer():
-    """创建优化的 Kafka Producer"""
-    return KafkaProducer(
-        bootstrap_servers=KAFKA_SERVERS,
-        value_serializer=lambda m: json.dumps(m, ensure_ascii=False).encode('utf-8'),
-        key_serializer=lambda k: k.encode('utf-8') if k else None,
+def create_producer(serialize=True, idempotent=False, envelope=False, producer_stats=None):
+    """
+    创建优化的 Kafka Producer；serialize=False 时 key/value 须为已编码的字节
+    idempotent=True 时显式开启幂等，broker 不支持或配置冲突时直接报错而不是静默关闭
+    envelope=True 时使用信封模式的批次大小和压缩算法
+    producer_stats 为登记该 producer 的发送统计，默认为全局 stats (下同)
+    """
+    options = {}
+    if serialize:
+        options = {
+            'value_serializer': job_codec.dumps,
+            'key_serializer': lambda k: k.encode('utf-8') if k else None,
+        }
+    if idempotent:
+        options['enable_idempotence'] = True
+    producer = TRANSPORT.producer(
+        **options,
         acks='all',  # 确保所有副本确认
         retries=5,  # 重试次数
         retry_backoff_ms=100,  # 重试间隔
-        batch_size=BATCH_SIZE,
+        batch_size=ENVELOPE_BATCH_SIZE if envelope else BATCH_SIZE,
         linger_ms=LINGER_MS,
         buffer_memory=BUFFER_MEMORY,
         max_request_size=MAX_REQUEST_SIZE,
-        compression_type=COMPRESSION_TYPE,
+        compression_type=ENVELOPE_COMPRESSION if envelope else COMPRESSION_TYPE,
         max_in_flight_requests_per_connection=5,
     )
+    (producer_stats or stats).watch(producer)
+    return producer
 
 # ==================== 回调函数 ====================
-def on_success(record_metadata):
-    """成功发送回调"""
-    counter.increment_success()
+def on_success(producer_stats, offset, sent_at, record_metadata):
+    """成功发送回调，offset 为记录在输入中的位置，sent_at 为交给 producer 的时间"""
+    producer_stats.record_success(record_metadata, sent_at)
+    checkpoint.ack(offset)
 
-def on_error(excp):
+def on_error(producer_stats, offset, excp):
     """发送失败回调"""
-    counter.increment_failed()
-    print(f"✗ 发送失败: {excp}")
+    producer_stats.record_failure()
+    checkpoint.fail(offset)
+    print(f"✗ 发送失败 (输入位置 {offset}): {excp}")
+
+def on_envelope_success(producer_stats, offset, indices, sent_at, record_metadata):
+    """信封发送成功回调，indices 为信封中各记录在数据块内的序号，offset 为数据块的输入位置"""
+    producer_stats.record_success(record_metadata, sent_at, len(indices))
+    checkpoint.ack_indices(offset, indices)
+
+def on_envelope_error(producer_stats, offset, indices, excp):
+    """信封发送失败回调"""
+    producer_stats.record_failure(len(indices))
+    checkpoint.fail(offset + indices[0])
+    print(f"✗ 信封发送失败 (输入位置 {offset + indices[0]}, {len(indices)} 条): {excp}")
+
+# ==================== 分区策略 ====================
+class Partitioner:
+    """
+    分区策略基类: partition(job) 返回记录的目标分区，发送时显式指定分区，不再依赖 Kafka 的默认分区器
+    per_record=False 的策略在信封模式下按信封整体分配分区，否则先按分区把块内记录分组再打包
+    """
+    name = None
+    per_record = True
+    
+    def __init__(self, num_partitions):
+        self.num_partitions = num_partitions
+        self.next = 0
+    
+    def resize(self, num_partitions):
+        """拿到 topic 元数据后按实际分区数调整"""
+        self.num_partitions = num_partitions
+    
+    def round_robin(self):
+        partition = self.next % self.num_partitions
+        self.next += 1
+        return partition
+    
+    def partition(self, job):
+        raise NotImplementedError
+    
+    def uses_round_robin(self, job):
+        """partition(job) 是否轮询分配 (默认: 没有 job_id 的记录)"""
+        return not job_key(job)
+    
+    def round_robin_calls(self, chunk, envelope=0):
+        """encode_chunk 编码该块时调用 round_robin 的次数，并行编码时主进程据此推进轮询位置"""
+        if envelope > 0 and not self.per_record:
+            return -(-len(chunk) // envelope)
+        return sum(1 for job in chunk if self.uses_round_robin(job))
+
+class HashPartitioner(Partitioner):
+    """与 Kafka 默认分区器相同: murmur2(job_id) 取模；没有 job_id 的记录轮询，避免都落到同一分区"""
+    name = 'hash'
+    
+    def partition(self, job):
+        key = job_key(job)
+        if not key:
+            return self.round_robin()
+        return (murmur2(key.encode('utf-8')) & 0x7fffffff) % self.num_partitions
+
+class RoundRobinPartitioner(Partitioner):
+    """忽略 key 轮询分区，负载最均匀"""
+    name = 'round-robin'
+    per_record = False
+    
+    def partition(self, job):
+        return self.round_robin()
+    
+    def uses_round_robin(self, job):
+        return True
+
+class ConsistentHashPartitioner(Partitioner):
+    """
+    一致性哈希 (ketama): 每个分区在哈希环上有 VIRTUAL_NODES 个虚拟节点，按 job_id 的哈希顺时针找到分区
+    分区数变化时只有约 1/N 的 key 改变分区；没有 job_id 的记录轮询
+    环上位置用 md5，crc32 对相邻的数字 job_id 分布不均 (3 个分区时最大分区达 43%)
+    """
+    name = 'consistent'
+    VIRTUAL_NODES = 160
+    
+    def __init__(self, num_partitions):
+        super().__init__(num_partitions)
+        self.build_ring()
+    
+    def resize(self, num_partitions):
+        super().resize(num_partitions)
+        self.build_ring()
+    
+    def build_ring(self):
+        ring = sorted((ring_hash(f"{p}#{v}"), p)
+                      for p in range(self.num_partitions) for v in range(self.VIRTUAL_NODES))
+        self.ring_hashes = [h for h, _ in ring]
+        self.ring_partitions = [p for _, p in ring]
+    
+    def lookup(self, key):
+        idx = bisect.bisect(self.ring_hashes, ring_hash(key))
+        return self.ring_partitions[idx % len(self.ring_partitions)]
+    
+    def partition(self, job):
+        key = job_key(job)
+        return self.lookup(key) if key else self.round_robin()
+
+class CityPartitioner(ConsistentHashPartitioner):
+    """按城市一致性哈希，同一城市的岗位在同一分区 (下游按城市聚合时有局部性)；城市为空时轮询"""
+    name = 'city'
+    
+    def partition(self, job):
+        city = str(job.get('城市') or '').strip()
+        return self.lookup(city) if city else self.round_robin()
+    
+    def uses_round_robin(self, job):
+        return not str(job.get('城市') or '').strip()
+
+def ring_hash(key):
+    """一致性哈希环上的 32 位位置"""
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:4], 'big')
+
+PARTITIONERS = {cls.name: cls for cls in (HashPartitioner, RoundRobinPartitioner,
+                                          ConsistentHashPartitioner, CityPartitioner)}
+
+def job_key(job):
+    """记录的消息 key: job_id 字符串，缺失或为 null 时为空串"""
+    job_id = job.get('job_id')
+    return '' if job_id is None else str(job_id).strip()
+
+def sync_partitions(producer, partitioner):
+    """用 topic 的实际分区数校正分区策略 (元数据不可用时保持配置值)"""
+    try:
+        partitions = producer.partitions_for(TOPIC_NAME)
+    except Exception as e:
+        print(f"⚠ 获取分区信息失败，按 {partitioner.num_partitions} 个分区发送: {e}")
+        return
+    if partitions and len(partitions) != partitioner.num_partitions:
+        print(f"⚠ Topic 实际有 {len(partitions)} 个分区，按实际分区数分配")
+        partitioner.resize(len(partitions))
+
+def dry_run(chunks, partitioner, envelope=0):
+    """不连接 Kafka，按分区策略统计各分区的记录数 (信封模式同时统计消息数)，打印负载预测"""
+    records = [0] * partitioner.num_partitions
+    messages = [0] * partitioner.num_partitions
+    keyless = 0
+    for _, chunk in chunks:
+        keyless += sum(1 for job in chunk if not job_key(job))
+        if envelope > 0:
+            for _, partition, indices in encode_chunk(chunk, partitioner, envelope):
+                records[partition] += len(indices)
+                messages[partition] += 1
+        else:
+            for job in chunk:
+                partition = partitioner.partition(job)
+                records[partition] += 1
+                messages[partition] += 1
+    
+    total = sum(records)
+    print(f"\n{'='*60}")
+    print(f"  分区负载预测 (策略: {partitioner.name}, {partitioner.num_partitions} 个分区)")
+    print(f"{'='*60}")
+    print(f"记录数: {total:,} | 无 job_id: {keyless:,}")
+    for partition, (n, m) in enumerate(zip(records, messages)):
+        share = n / total * 100 if total else 0
+        print(f"  Partition {partition}: {n:>10,} 条 ({share:5.1f}%) | 消息 {m:,}")
+    if total:
+        mean = total / partitioner.num_partitions
+        print(f"倾斜度 (最大/平均): {max(records) / mean:.2f}")
+    print(f"{'='*60}\n")
 
 # ==================== 发送数据块 ====================
-def send_chunk(producer, chunk, chunk_id):
-    """发送一个数据块"""
+def send_chunk(producer, chunk, offset, partitioner, producer_stats=None):
+    """发送一个数据块，offset 为块中第一条记录在输入中的位置"""
+    producer_stats = producer_stats or stats
     futures = []
-    for job in chunk:
-        # 使用 job_id 作为 key 进行分区
-        key = str(job.get('job_id', ''))
-        future = producer.send(TOPIC_NAME, value=job, key=key)
-        future.add_callback(on_success)
-        future.add_errback(on_error)
+    for i, job in enumerate(chunk, offset):
+        # job_id 作为 key，分区由分区策略决定
+        key = job_key(job)
+        sent_at = time.perf_counter()
+        future = producer.send(TOPIC_NAME, value=job, key=key, partition=partitioner.partition(job))
+        future.add_callback(on_success, producer_stats, i, sent_at)
+        future.add_errback(on_error, producer_stats, i)
         futures.append(future)
     return futures
 
-# ==================== 加载数据 ====================
-def load_data():
-    """加载 JSON 数据文件"""
+# ==================== 并行发送 ====================
+def encode_chunk(chunk, partitioner, envelope=0, round_robin_start=None):
+    """
+    编码一个数据块，在编码进程中执行
+    envelope <= 0 时每条记录一项 (key, value, 分区)；
+    envelope > 0 时每 envelope 条记录打包为一个信封 (value, 分区, 块内序号)，
+    per_record 的分区策略先按分区分组再打包，同一信封中的记录都属于该分区
+    round_robin_start 不为 None 时 (编码进程中的分区策略副本) 从该位置继续轮询
+    """
+    if round_robin_start is not None:
+        partitioner.next = round_robin_start
+    if envelope <= 0:
+        encoded = []
+        for job in chunk:
+            key = job_key(job)
+            encoded.append((key.encode('utf-8') if key else None, job_codec.dumps(job), partitioner.partition(job)))
+        return encoded
+    values = [job_codec.dumps(job) for job in chunk]
+    encoded = []
+    if not partitioner.per_record:
+        for start in range(0, len(values), envelope):
+            append_envelope(encoded, values, range(start, min(start + envelope, len(values))),
+                            partitioner.round_robin())
+        return encoded
+    groups = {}
+    for i, job in enumerate(chunk):
+        groups.setdefault(partitioner.partition(job), []).append(i)
+    for partition, indices in groups.items():
+        for start in range(0, len(indices), envelope):
+            append_envelope(encoded, values, indices[start:start + envelope], partition)
+    return encoded
+
+def append_envelope(encoded, values, indices, partition):
+    """把 values 中 indices 对应的记录打包为一个信封，超过 ENVELOPE_MAX_BYTES 时对半拆成两个"""
+    value = job_codec.pack_envelope([values[i] for i in indices])
+    if len(value) > ENVELOPE_MAX_BYTES and len(indices) > 1:
+        half = len(indices) // 2
+        append_envelope(encoded, values, indices[:half], partition)
+        append_envelope(encoded, values, indices[half:], partition)
+        return
+    encoded.append((value, partition, indices))
+
+def envelope_headers(count):
+    """信封消息的 Kafka headers"""
+    return [(job_codec.ENVELOPE_HEADER, job_codec.ENVELOPE_FORMAT),
+            (job_codec.ENVELOPE_COUNT_HEADER, str(count).encode('ascii'))]
+
+def encoded_count(encoded, envelope=0):
+    """已编码数据块中的记录数"""
+    if envelope > 0:
+        return sum(len(indices) for _, _, indices in encoded)
+    return len(encoded)
+
+def iter_encoded(chunks, num_encoders, partitioner, envelope=0):
+    """
+    按顺序产出 (输入位置, 编码好的数据块)
+    num_encoders > 0 时由进程池编码，最多 num_encoders * ENCODE_MAX_PENDING 块在途，不会一次性编码全部数据；
+    编码进程拿到的是分区策略的副本，轮询位置由主进程按块推进后传入，分区分配与串行编码 (及 --dry-run) 一致
+    """
+    if num_encoders <= 0:
+        for offset, chunk in chunks:
+            yield offset, encode_chunk(chunk, partitioner, envelope)
+        return
+    with ProcessPoolExecutor(num_encoders) as pool:
+        pending = deque()
+        chunks = iter(chunks)
+        while True:
+            while len(pending) < num_encoders * ENCODE_MAX_PENDING:
+                item = next(chunks, None)
+                if item is None:
+                    break
+                offset, chunk = item
+                start = partitioner.next
+                partitioner.next += partitioner.round_robin_calls(chunk, envelope)
+                pending.append((offset, pool.submit(encode_chunk, chunk, partitioner, envelope, start)))
+            if not pending:
+                return
+            offset, future = pending.popleft()
+            yield offset, future.result()
+
+def send_encoded_chunk(producer, encoded, offset, envelope=0, producer_stats=None):
+    """发送一个已编码的数据块"""
+    producer_stats = producer_stats or stats
+    if envelope > 0:
+        for value, partition, indices in encoded:
+            sent_at = time.perf_counter()
+            future = producer.send(TOPIC_NAME, value=value, partition=partition,
+                                   headers=envelope_headers(len(indices)))
+            future.add_callback(on_envelope_success, producer_stats, offset, indices, sent_at)
+            future.add_errback(on_envelope_error, producer_stats, offset, indices)
+        return
+    for i, (key, value, partition) in enumerate(encoded, offset):
+        sent_at = time.perf_counter()
+        future = producer.send(TOPIC_NAME, value=value, key=key, partition=partition)
+        future.add_callback(on_success, producer_stats, i, sent_at)
+        future.add_errback(on_error, producer_stats, i)
+
+def sender_loop(producer, queue, envelope=0):
+    """发送线程: 从自己的队列取 (输入位置, 数据块) 交给 producer，取到 None 时结束"""
+    while True:
+        item = queue.get()
+        if item is None:
+            return
+        offset, encoded = item
+        try:
+            send_encoded_chunk(producer, encoded, offset, envelope)
+        except Exception as e:
+            # 继续消费队列，避免主线程阻塞在已满的队列上
+            stats.record_failure(encoded_count(encoded, envelope))
+            checkpoint.fail(offset)
+            print(f"✗ 发送线程出错: {e}")
+
+def send_parallel(chunks, start_time, partitioner, num_threads, num_producers, num_encoders, idempotent=False, envelope=0):
+    """
+    并行发送: 编码进程 -> 每个发送线程一个有界队列 -> producer
+    数据块按顺序轮流分给发送线程，队列满时主线程阻塞，producer 缓冲区满时 send 阻塞，
+    因此内存中等待发送的数据有上限
+    """
+    producers = [create_producer(serialize=False, idempotent=idempotent, envelope=envelope > 0)
+                 for _ in range(num_producers)]
+    sync_partitions(producers[0], partitioner)
+    queues = [Queue(maxsize=SEND_QUEUE_SIZE) for _ in range(num_threads)]
+    try:
+        with ThreadPoolExecutor(num_threads) as senders:
+            for i, queue in enumerate(queues):
+                senders.submit(sender_loop, producers[i % num_producers], queue, envelope)
+            try:
+                for idx, item in enumerate(iter_encoded(chunks, num_encoders, partitioner, envelope)):
+                    queues[idx % num_threads].put(item)
+                    report_progress(idx, start_time)
+            finally:
+                for queue in queues:
+                    queue.put(None)
+        print("\n等待所有消息发送完成...")
+        for producer in producers:
+            producer.flush()
+        stats.refresh_metrics()
+    finally:
+        for producer in producers:
+            producer.close()
+
+def send_serial(chunks, start_time, partitioner, idempotent=False, envelope=0):
+    """单线程发送: 逐块编码并发送"""
+    producer = create_producer(serialize=envelope <= 0, idempotent=idempotent, envelope=envelope > 0)
+    try:
+        sync_partitions(producer, partitioner)
+        for idx, (offset, chunk) in enumerate(chunks):
+            if envelope > 0:
+                send_encoded_chunk(producer, encode_chunk(chunk, partitioner, envelope), offset, envelope)
+            else:
+                send_chunk(producer, chunk, offset, partitioner)
+            report_progress(idx, start_time)
+        
+        # 等待所有消息发送完成
+        print("\n等待所有消息发送完成...")
+        producer.flush()
+        stats.refresh_metrics()
+    finally:
+        producer.close()
+
+def report_progress(idx, start_time):
+    """首块发出时打印耗时，之后每 10 块打印一次进度"""
+    elapsed = time.time() - start_time
+    if idx == 0:
+        print(f"  首块已交给 producer: {elapsed * 1000:.0f} ms")
+    if (idx + 1) % 10 == 0:
+        success, failed = stats.get_counts()
+        rate = success / elapsed if elapsed > 0 else 0
+        print(f"  已读取: {(idx + 1) * CHUNK_SIZE:,} 条 | 成功: {success:,} | 失败: {failed} | 速率: {rate:.0f} msg/s")
+    checkpoint.maybe_save()
+    stats.maybe_emit()
+
+def get_option(name, default, cast=str):
+    """读取 --name=VALUE 形式的参数"""
+    for arg in sys.argv[1:]:
+        if arg.startswith(f'--{name}='):
+            try:
+                return cast(arg.split('=', 1)[1])
+            except ValueError:
+                pass
+    return default
+
+# ==================== 读取数据 ====================
+def read_records(filepath):
+    """流式读取数据文件 (JSON 数组或 NDJSON)，返回逐条产出记录的迭代器；文件不存在时返回 None"""
     print(f"\n{'='*60}")
-    print(f"加载数据文件: {DATA_FILE}")
+    print(f"读取数据文件: {filepath}")
     print(f"{'='*60}")
     
-    if not os.path.exists(DATA_FILE):
-        print(f"✗ 数据文件不存在: {DATA_FILE}")
+    if not os.path.exists(filepath):
+        print(f"✗ 数据文件不存在: {filepath}")
         return None
     
-    file_size = os.path.getsize(DATA_FILE)
-    print(f"文件大小: {file_size / 1024 / 1024:.2f} MB")
-    
+    file_size = os.path.getsize(filepath)
+    print(f"文件大小: {file_size / 1024 / 1024:.2f} MB (边读边发送)")
+    return iter_records(filepath)
+
+def iter_chunks(records, size, offset=0):
+    """把记录流切成每块 size 条的列表，产出 (块中第一条记录的输入位置, 块)，只保留当前块"""
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, size))
+        if not chunk:
+            return
+        yield offset, chunk
+        offset += len(chunk)
+
+# ==================== 自动调优 ====================
+def current_settings(envelope=0):
+    """当前生效的可调参数，信封模式使用信封的批次大小和压缩算法"""
+    return {
+        'compression_type': ENVELOPE_COMPRESSION if envelope > 0 else COMPRESSION_TYPE,
+        'batch_size': ENVELOPE_BATCH_SIZE if envelope > 0 else BATCH_SIZE,
+        'linger_ms': LINGER_MS,
+        'buffer_memory': BUFFER_MEMORY,
+        'chunk_size': CHUNK_SIZE,
+    }
+
+def apply_settings(settings, envelope=0):
+    """把调优结果写回模块级配置，create_producer 和分块都读取这些值"""
+    global COMPRESSION_TYPE, ENVELOPE_COMPRESSION, BATCH_SIZE, ENVELOPE_BATCH_SIZE
+    global LINGER_MS, BUFFER_MEMORY, CHUNK_SIZE
+    if envelope > 0:
+        ENVELOPE_COMPRESSION = settings['compression_type']
+        ENVELOPE_BATCH_SIZE = settings['batch_size']
+    else:
+        COMPRESSION_TYPE = settings['compression_type']
+        BATCH_SIZE = settings['batch_size']
+    LINGER_MS = settings['linger_ms']
+    BUFFER_MEMORY = settings['buffer_memory']
+    CHUNK_SIZE = settings['chunk_size']
+
+def describe_settings(settings):
+    return (f"compression={settings['compression_type'] or 'none'} batch={settings['batch_size']} "
+            f"linger={settings['linger_ms']}ms buffer={settings['buffer_memory'] // 1048576}MB "
+            f"chunk={settings['chunk_size']}")
+
+def profile_mode(envelope):
+    return 'envelope' if envelope > 0 else 'record'
+
+def load_profile(path, envelope=0):
+    """
+    读取调优配置中当前模式 (逐条/信封) 的参数，没有时返回 None
+    配置是针对其它传输测得的 (例如 memory/file 上的结果对真实集群没有意义) 时同样返回 None
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        profile = job_codec.loads(f.read())
+    entry = profile.get(profile_mode(envelope))
+    if not entry:
+        return None
+    if profile.get('transport') != TRANSPORT.describe():
+        print(f"⚠ 调优配置 {path} 是针对 {profile.get('transport')} 测得的，与当前传输不同，已忽略；"
+              f"请在当前传输上重新 --autotune")
+        return None
+    return entry['settings']
+
+def save_profile(path, envelope, settings, measured, trials):
+    """保存当前模式的调优结果，另一模式的结果保留"""
+    profile = {}
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            profile = job_codec.loads(f.read())
+    profile.pop('servers', None)  # 旧版本按集群地址记录
+    profile['transport'] = TRANSPORT.describe()
+    profile[profile_mode(envelope)] = {
+        'settings': settings,
+        'measured': measured,
+        'trials': trials,
+        'updated_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(job_codec.dumps_pretty(profile))
+
+def latency_label_ms(label):
+    """延迟分布标签 ('<=20' / '>5000') 转为毫秒上界，超出最后一桶为无穷大"""
+    if label is None or label.startswith('>'):
+        return float('inf')
+    return int(label[2:])
+
+def run_trial(sample, settings, partitioner, trial_stats, envelope=0):
+    """按 settings 把样本发送一遍，计数记在 trial_stats (新的 ProducerStats)，返回吞吐和确认延迟"""
+    apply_settings(settings, envelope)
+    checkpoint.start(None, None, 0)
     start_time = time.time()
-    with open(DATA_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    load_time = time.time() - start_time
-    
-    print(f"✓ 加载完成，共 {len(data):,} 条记录")
-    print(f"  加载耗时: {load_time:.2f} 秒")
+    trial_stats.start_time = start_time
+    producer = create_producer(serialize=envelope <= 0, envelope=envelope > 0, producer_stats=trial_stats)
+    try:
+        sync_partitions(producer, partitioner)
+        for offset, chunk in iter_chunks(sample, CHUNK_SIZE):
+            if envelope > 0:
+                send_encoded_chunk(producer, encode_chunk(chunk, partitioner, envelope), offset, envelope,
+                                   trial_stats)
+            else:
+                send_chunk(producer, chunk, offset, partitioner, trial_stats)
+        producer.flush()
+        trial_stats.refresh_metrics()
+    finally:
+        producer.close()
+    elapsed = time.time() - start_time
+    summary = trial_stats.snapshot()
+    return {
+        'settings': dict(settings),
+        'records_per_s': round(summary['success'] / elapsed, 1) if summary['failed'] == 0 else 0.0,
+        'failed': summary['failed'],
+        'p50_ms': summary['latency_ms']['p50'],
+        'p99_ms': summary['latency_ms']['p99'],
+        'compression_ratio': summary['compression_ratio'],
+    }
+
+def autotune(sample, partitioner, envelope=0, profile_file=PROFILE_FILE, max_p99_ms=None):
+    """
+    逐项搜索 AUTOTUNE_GRID: 依次对每个参数尝试所有取值，其余参数保持当前最优，
+    吞吐比当前最优高出 AUTOTUNE_MIN_GAIN 且 p99 延迟不超过 max_p99_ms 时替换，结果写入 profile_file
+    相同配置只测一次；第一次发送包含建立连接和获取元数据的开销，先预热一次不计入结果
+    本地传输上只搜索 LOCAL_AUTOTUNE_PARAMS，其余参数保持当前值
+    """
+    global TOPIC_NAME
+    grid = AUTOTUNE_GRID
+    if TRANSPORT.name != 'kafka':
+        grid = {name: AUTOTUNE_GRID[name] for name in LOCAL_AUTOTUNE_PARAMS}
+    topic_name, TOPIC_NAME = TOPIC_NAME, AUTOTUNE_TOPIC
+    try:
+        create_topic_if_not_exists()
+        print(f"\n{'='*60}")
+        print(f"自动调优: 样本 {len(sample):,} 条 | topic {TOPIC_NAME} | 模式 {profile_mode(envelope)}")
+        if grid is not AUTOTUNE_GRID:
+            print(f"本地传输 {TRANSPORT.describe()} 不使用 producer 参数，只搜索: {', '.join(grid)}")
+        print(f"{'='*60}")
+        best = current_settings(envelope)
+        run_trial(sample, best, partitioner, ProducerStats(), envelope)
+        results = {}
+        
+        def measure(settings):
+            key = tuple(sorted(settings.items(), key=lambda kv: kv[0]))
+            if key not in results:
+                result = run_trial(sample, settings, partitioner, ProducerStats(), envelope)
+                results[key] = result
+                print(f"  {describe_settings(settings)} -> {result['records_per_s']:,.0f} msg/s | "
+                      f"p50 {result['p50_ms']} ms | p99 {result['p99_ms']} ms")
+            return results[key]
+        
+        def score(result):
+            if max_p99_ms is not None and latency_label_ms(result['p99_ms']) > max_p99_ms:
+                return 0.0
+            return result['records_per_s']
+        
+        best_result = measure(best)
+        for name, values in grid.items():
+            for value in values:
+                result = measure(dict(best, **{name: value}))
+                if score(result) > score(best_result) * (1 + AUTOTUNE_MIN_GAIN):
+                    best, best_result = dict(best, **{name: value}), result
+    finally:
+        TOPIC_NAME = topic_name
     
-    return data
+    apply_settings(best, envelope)
+    save_profile(profile_file, envelope, best, best_result, list(results.values()))
+    print(f"\n✓ 最优配置: {describe_settings(best)}")
+    print(f"  吞吐: {best_result['records_per_s']:,.0f} msg/s | p99 {best_result['p99_ms']} ms")
+    print(f"  已保存到: {profile_file}")
+    return best
 
 # ==================== 主函数 ====================
 def main():
     """主函数"""
+    global TRANSPORT
     print("\n" + "="*60)
     print("  Kafka Jobs Data Producer")
     print("  牛客网招聘数据导入工具")
     print("="*60)
-    print(f"Kafka 集群: {', '.join(KAFKA_SERVERS)}")
+    try:
+        TRANSPORT = kafka_transport.from_spec(get_option('transport', 'kafka'), KAFKA_SERVERS)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return
+    if TRANSPORT.name == 'kafka':
+        print(f"Kafka 集群: {', '.join(KAFKA_SERVERS)}")
+    else:
+        print(f"传输: {TRANSPORT.describe()} (本地模拟，不连接集群)")
     print(f"Topic: {TOPIC_NAME}")
-    print(f"配置: batch_size={BATCH_SIZE}, linger_ms={LINGER_MS}")
-    print(f"压缩: {COMPRESSION_TYPE}")
+    envelope = get_option('envelope', ENVELOPE_SIZE if '--envelope' in sys.argv else 0, int)
+    tune = '--autotune' in sys.argv
+    profile_file = get_option('profile', PROFILE_FILE)
+    profile = None if tune or '--no-profile' in sys.argv else load_profile(profile_file, envelope)
+    if profile:
+        apply_settings(profile, envelope)
+        print(f"调优配置: {profile_file} ({describe_settings(profile)})")
+    envelope = min(envelope, CHUNK_SIZE)
+    if envelope > 0:
+        print(f"信封模式: 每条消息 {envelope} 条记录 | batch_size={ENVELOPE_BATCH_SIZE}")
+    print(f"配置: batch_size={BATCH_SIZE}, linger_ms={LINGER_MS}, buffer_memory={BUFFER_MEMORY}, chunk={CHUNK_SIZE}")
+    print(f"压缩: {(ENVELOPE_COMPRESSION if envelope > 0 else COMPRESSION_TYPE) or 'none'}")
+    print(f"JSON 编码: {job_codec.BACKEND}")
+    clean = '--clean' in sys.argv
+    print(f"发送前清洗: {'是' if clean else '否'}")
+    resume = '--resume' in sys.argv
+    idempotent = '--idempotent' in sys.argv
+    checkpoint_file = get_option('checkpoint', CHECKPOINT_FILE)
+    print(f"检查点: {checkpoint_file}{' (继续上次发送)' if resume else ''}")
+    print(f"幂等 producer: {'是' if idempotent else '否'}")
+    stats_target = get_option('stats', '-' if '--stats' in sys.argv else None)
+    if stats_target:
+        stats.configure(stats_target)
+        print(f"发送统计: 每 {STATS_INTERVAL:.0f} 秒输出一行 JSON 到 {'标准输出' if stats_target == '-' else stats_target}")
+    dry = '--dry-run' in sys.argv
+    partitioner_name = get_option('partitioner', 'round-robin' if envelope > 0 else 'hash')
+    if partitioner_name not in PARTITIONERS:
+        print(f"✗ 未知的分区策略: {partitioner_name} (可选: {', '.join(PARTITIONERS)})")
+        return
+    partitioner = PARTITIONERS[partitioner_name](max(1, get_option('partitions', NUM_PARTITIONS, int)))
+    print(f"分区策略: {partitioner_name} ({partitioner.num_partitions} 个分区){' | 仅预测 (--dry-run)' if dry else ''}")
+    parallel = '--parallel' in sys.argv
+    num_threads = max(1, get_option('threads', NUM_THREADS, int))
+    num_producers = max(1, min(get_option('producers', NUM_PRODUCERS, int), num_threads))
+    num_encoders = max(0, get_option('encoders', NUM_ENCODERS, int))
+    if parallel:
+        print(f"并行发送: 发送线程 {num_threads} | producer {num_producers} | 编码进程 {num_encoders}")
+    else:
+        print("并行发送: 否 (单线程)")
+    
+    if tune:
+        records = read_records(get_option('input', DATA_FILE))
+        if records is None:
+            return
+        max_p99 = get_option('max-p99', None, int)
+        autotune(list(itertools.islice(records, AUTOTUNE_SAMPLE)), partitioner, envelope, profile_file, max_p99)
+        return
     
     # 1. 创建 Topic
-    if not create_topic_if_not_exists():
+    if not dry and not create_topic_if_not_exists():
         print("\n无法创建 Topic，退出程序")
         return
     
-    # 2. 加载数据
-    data = load_data()
-    if data is None:
+    # 2. 打开数据流 (发送前清洗时同样逐条清洗)
+    input_file = get_option('input', DATA_FILE)
+    records = read_records(input_file)
+    if records is None:
+        return
+    source = describe_source(input_file, clean)
+    offset = load_checkpoint(checkpoint_file, source) if resume else 0
+    if offset is None:
         return
+    cleaner = JobCleaner() if clean else None
+    if cleaner:
+        # 清洗结果只取决于输入和选项，跳过前重新清洗已发送部分即可得到相同的位置
+        records = cleaner.clean_iter(records)
+    if offset:
+        records = itertools.islice(records, offset, None)
+        print(f"跳过已确认的 {offset:,} 条记录")
+    if dry:
+        try:
+            dry_run(iter_chunks(records, CHUNK_SIZE, offset), partitioner, envelope)
+        finally:
+            if cleaner:
+                cleaner.close()
+        return
+    checkpoint.start(checkpoint_file, source, offset)
     
     # 3. 创建 Producer
     print(f"\n{'='*60}")
     print("开始发送数据到 Kafka...")
     print(f"{'='*60}")
+    print(f"分块大小: 每块 {CHUNK_SIZE} 条")
     
-    producer = create_producer()
-    
-    # 分割数据为 chunks
-    chunks = [data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)]
-    total_chunks = len(chunks)
-    
-    print(f"总记录数: {len(data):,}")
-    print(f"分块数: {total_chunks} (每块 {CHUNK_SIZE} 条)")
-    
+    chunks = iter_chunks(records, CHUNK_SIZE, offset)
     start_time = time.time()
+    stats.start_time = start_time
+    error = None
     
     try:
-        # 发送所有 chunks
-        for idx, chunk in enumerate(chunks):
-            send_chunk(producer, chunk, idx)
-            
-            # 打印进度
-            if (idx + 1) % 10 == 0 or idx == total_chunks - 1:
-                success, failed = counter.get_counts()
-                progress = (idx + 1) / total_chunks * 100
-                elapsed = time.time() - start_time
-                rate = success / elapsed if elapsed > 0 else 0
-                print(f"  进度: {progress:5.1f}% | 成功: {success:,} | 失败: {failed} | 速率: {rate:.0f} msg/s")
-        
-        # 等待所有消息发送完成
-        print("\n等待所有消息发送完成...")
-        producer.flush()
-        
+        if parallel:
+            send_parallel(chunks, start_time, partitioner, num_threads, num_producers, num_encoders,
+                          idempotent, envelope)
+        else:
+            send_serial(chunks, start_time, partitioner, idempotent, envelope)
     except KeyboardInterrupt:
         print("\n\n用户中断，正在清理...")
     except Exception as e:
+        error = e
         print(f"\n✗ 发送过程中发生错误: {e}")
     finally:
-        producer.close()
+        if cleaner:
+            cleaner.close()
+        # producer 关闭时已等待在途消息的回调，此时的水位就是最终确认位置
+        checkpoint.save()
+        stats.emit()
+        stats.close()
     
     # 4. 打印统计信息
     end_time = time.time()
     total_time = end_time - start_time
-    success, failed = counter.get_counts()
+    summary = stats.snapshot()
+    success, failed = summary['success'], summary['failed']
     
     print(f"\n{'='*60}")
     print("  发送完成统计")
@@ -243,7 +1102,19 @@ def main():
     print(f"成功: {success:,} 条")
     print(f"失败: {failed} 条")
     print(f"发送速率: {success / total_time:.0f} 消息/秒")
+    print(f"发送字节: {summary['bytes'] / 1024 / 1024:.2f} MB (压缩前) | 压缩率: {summary['compression_ratio'] or 'N/A'}")
+    print(f"发送延迟: p50 {summary['latency_ms']['p50'] or 'N/A'} ms | p99 {summary['latency_ms']['p99'] or 'N/A'} ms")
+    if summary['partitions']:
+        print("分区分布: " + " | ".join(f"P{p}: {n:,}" for p, n in summary['partitions'].items()))
+    print(f"检查点: 已连续确认到输入位置 {checkpoint.watermark:,}"
+          f"{' (有失败记录，--resume 将从第一条失败的记录重新发送)' if checkpoint.failed else ''}")
+    if cleaner:
+        print(f"清洗: 读取 {cleaner.stats['total_processed']:,} 条 | ID去重: {cleaner.stats['duplicate_id']} | "
+              f"公司名修复: {cleaner.stats['company_restored_from_desc']}")
     print(f"{'='*60}\n")
+    if error is not None:
+        # 输入损坏等错误: 已确认的部分记在检查点中，以非零退出码结束
+        return 1
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
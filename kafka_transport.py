@@ -0,0 +1,670 @@
+"""
+Kafka 传输层
+生产者/消费者脚本通过 Transport 创建 producer、consumer 和 topic，不再直接依赖集群:
+1. KafkaTransport: kafka-python 实现，连接真实 broker
+2. MemoryTransport: 进程内日志，每个分区一个列表，用于单进程端到端基准测试
+3. FileTransport: 追加写的分段文件日志 (每个分区一个目录，按起始 offset 命名分段)，
+   跨进程可用: 一个进程发送，另一个进程消费
+本地实现的 producer/consumer 提供脚本用到的 kafka-python 接口子集 (send/flush/close/metrics/partitions_for，
+迭代/poll/commit/close)，一个消费组只有一个消费者，分配 topic 的全部分区，不做再均衡
+
+用法:
+    import kafka_transport
+    transport = kafka_transport.from_spec('file:/tmp/kafka_log', KAFKA_SERVERS)
+    producer = transport.producer(value_serializer=job_codec.dumps)
+    consumer = transport.consumer('nowcoder_jobs', group_id='g', auto_offset_reset='earliest')
+"""
+
+import bisect
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import deque, namedtuple
+
+from kafka import KafkaAdminClient, KafkaConsumer, KafkaProducer
+from kafka.admin import NewTopic
+from kafka.errors import TopicAlreadyExistsError
+from kafka.partitioner.default import murmur2
+from kafka.producer.future import RecordMetadata
+from kafka.structs import TopicPartition
+
+import job_codec
+
+DEFAULT_PARTITIONS = 3  # 本地日志自动创建 topic 时的分区数 (与 broker 的 auto.create.topics.enable 相同)
+SEGMENT_BYTES = 64 * 1024 * 1024  # 分段文件超过该大小时滚动到新分段
+FILE_LOG_DIR = os.path.join(tempfile.gettempdir(), 'nowcoder_kafka_log')  # file 传输的默认目录
+FILE_POLL_INTERVAL = 0.05  # 文件日志等待新数据时的检查间隔（秒），其他进程写入时没有通知
+
+# 本地日志中的一条记录，字段与 kafka-python 的 ConsumerRecord 同名
+LocalRecord = namedtuple('LocalRecord', ['topic', 'partition', 'offset', 'timestamp', 'key', 'value', 'headers'])
+
+
+# ==================== 传输接口 ====================
+class Transport:
+    """传输基类: 创建 producer / consumer，创建 topic"""
+    name = None
+
+    def producer(self, **config):
+        raise NotImplementedError
+
+    def consumer(self, *topics, **config):
+        raise NotImplementedError
+
+    def create_topic(self, name, num_partitions, replication_factor=1):
+        """创建 topic，已存在时返回 False"""
+        raise NotImplementedError
+
+    def describe(self):
+        """传输的标识，用于打印和区分调优配置"""
+        return self.name
+
+
+class KafkaTransport(Transport):
+    """kafka-python 实现"""
+    name = 'kafka'
+
+    def __init__(self, servers):
+        self.servers = list(servers)
+
+    def producer(self, **config):
+        return KafkaProducer(bootstrap_servers=self.servers, **config)
+
+    def consumer(self, *topics, **config):
+        return KafkaConsumer(*topics, bootstrap_servers=self.servers, **config)
+
+    def create_topic(self, name, num_partitions, replication_factor=1):
+        admin_client = KafkaAdminClient(
+            bootstrap_servers=self.servers,
+            client_id='admin_client',
+            request_timeout_ms=10000,
+        )
+        try:
+            if name in admin_client.list_topics():
+                return False
+            admin_client.create_topics([NewTopic(
+                name=name,
+                num_partitions=num_partitions,
+                replication_factor=replication_factor,
+            )], validate_only=False)
+            return True
+        except TopicAlreadyExistsError:
+            return False
+        finally:
+            admin_client.close()
+
+    def describe(self):
+        return ','.join(self.servers)
+
+
+class LocalTransport(Transport):
+    """本地日志 (MemoryLog / SegmentLog) 上的传输"""
+
+    def __init__(self, log):
+        self.log = log
+
+    def producer(self, **config):
+        return LocalProducer(self.log, **config)
+
+    def consumer(self, *topics, **config):
+        return LocalConsumer(self.log, *topics, **config)
+
+    def create_topic(self, name, num_partitions, replication_factor=1):
+        return self.log.create_topic(name, num_partitions)
+
+
+class MemoryTransport(LocalTransport):
+    name = 'memory'
+
+    def __init__(self, log=None):
+        super().__init__(log if log is not None else MEMORY_LOG)
+
+
+class FileTransport(LocalTransport):
+    name = 'file'
+
+    def __init__(self, directory=FILE_LOG_DIR):
+        super().__init__(SegmentLog(directory))
+
+    def describe(self):
+        return f"file:{self.log.directory}"
+
+
+def from_spec(spec, servers):
+    """按 --transport 的值创建传输: kafka、memory、file 或 file:DIR"""
+    if spec in (None, '', 'kafka'):
+        return KafkaTransport(servers)
+    if spec == 'memory':
+        return MemoryTransport()
+    if spec == 'file':
+        return FileTransport()
+    if spec.startswith('file:'):
+        return FileTransport(spec[len('file:'):])
+    raise ValueError(f"未知的传输: {spec} (可选: kafka, memory, file, file:DIR)")
+
+
+# ==================== 内存日志 ====================
+class MemoryLog:
+    """进程内日志: topic -> 分区列表，每个分区是 (timestamp, key, value, headers) 的列表，offset 即下标"""
+
+    def __init__(self):
+        self.topics = {}
+        self.group_offsets = {}
+        self.lock = threading.Lock()
+        self.appended = threading.Condition(self.lock)
+
+    def create_topic(self, name, num_partitions):
+        with self.lock:
+            if name in self.topics:
+                return False
+            self.topics[name] = [[] for _ in range(num_partitions)]
+            return True
+
+    def num_partitions(self, topic):
+        with self.lock:
+            if topic not in self.topics:
+                self.topics[topic] = [[] for _ in range(DEFAULT_PARTITIONS)]
+            return len(self.topics[topic])
+
+    def append(self, topic, partition, record):
+        """追加一条记录，返回它的 offset"""
+        with self.lock:
+            log = self.topics[topic][partition]
+            log.append(record)
+            self.appended.notify_all()
+            return len(log) - 1
+
+    def read(self, topic, partition, offset, max_records):
+        with self.lock:
+            return self.topics[topic][partition][offset:offset + max_records]
+
+    def end_offset(self, topic, partition):
+        with self.lock:
+            return len(self.topics[topic][partition])
+
+    def wait(self, timeout):
+        """等待新记录写入或超时"""
+        with self.lock:
+            self.appended.wait(timeout)
+
+    def committed(self, group, topic, partition):
+        with self.lock:
+            return self.group_offsets.get((group, topic, partition))
+
+    def commit(self, group, offsets):
+        """offsets: {(topic, partition): 下一条要消费的 offset}"""
+        with self.lock:
+            for (topic, partition), offset in offsets.items():
+                self.group_offsets[(group, topic, partition)] = offset
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+MEMORY_LOG = MemoryLog()  # 同一进程中的 memory 传输共享这个日志
+
+
+# ==================== 分段文件日志 ====================
+# 每条记录: 4 字节记录体长度 + 记录体
+# 记录体: timestamp_ms (q) + key 长度 (i，-1 表示 None) + value 长度 (i) + header 数 (H)，
+#         之后依次是 key、value、每个 header 的 名称长度 (H) + 名称 + 值长度 (I) + 值
+_LENGTH = struct.Struct('>I')
+_RECORD = struct.Struct('>qiiH')
+_HEADER_NAME = struct.Struct('>H')
+_HEADER_VALUE = struct.Struct('>I')
+
+
+def encode_record(record):
+    timestamp, key, value, headers = record
+    parts = [_RECORD.pack(timestamp, -1 if key is None else len(key), len(value), len(headers or ()))]
+    if key is not None:
+        parts.append(key)
+    parts.append(value)
+    for name, header_value in headers or ():
+        name = name.encode('utf-8')
+        parts += [_HEADER_NAME.pack(len(name)), name, _HEADER_VALUE.pack(len(header_value)), header_value]
+    body = b''.join(parts)
+    return _LENGTH.pack(len(body)) + body
+
+
+def decode_record(body):
+    timestamp, key_len, value_len, num_headers = _RECORD.unpack_from(body)
+    pos = _RECORD.size
+    key = None
+    if key_len >= 0:
+        key = body[pos:pos + key_len]
+        pos += key_len
+    value = body[pos:pos + value_len]
+    pos += value_len
+    headers = []
+    for _ in range(num_headers):
+        (name_len,) = _HEADER_NAME.unpack_from(body, pos)
+        pos += _HEADER_NAME.size
+        name = body[pos:pos + name_len].decode('utf-8')
+        pos += name_len
+        (header_len,) = _HEADER_VALUE.unpack_from(body, pos)
+        pos += _HEADER_VALUE.size
+        headers.append((name, body[pos:pos + header_len]))
+        pos += header_len
+    return timestamp, key, value, headers
+
+
+class Segment:
+    """一个分段文件: 起始 offset 与各记录在文件中的位置 (扫描文件建立，只记录完整写入的记录)"""
+
+    def __init__(self, path, base_offset):
+        self.path = path
+        self.base_offset = base_offset
+        self.positions = []
+        self.size = 0  # 已扫描到的完整记录末尾
+
+    def refresh(self):
+        """扫描上次之后新写入的完整记录 (其他进程可能正在追加，末尾不完整的记录留到下次)"""
+        file_size = os.path.getsize(self.path)
+        if file_size <= self.size:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self.size)
+            data = f.read(file_size - self.size)
+        pos = 0
+        while pos + _LENGTH.size <= len(data):
+            (length,) = _LENGTH.unpack_from(data, pos)
+            if pos + _LENGTH.size + length > len(data):
+                break
+            self.positions.append(self.size + pos)
+            pos += _LENGTH.size + length
+        self.size += pos
+
+    @property
+    def end_offset(self):
+        return self.base_offset + len(self.positions)
+
+
+class PartitionLog:
+    """一个分区的分段列表，最后一个分段为活动分段"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.segments = []
+        self.writer = None
+        os.makedirs(directory, exist_ok=True)
+        self.load_segments()
+
+    def load_segments(self):
+        """加载目录中的分段 (包括其他进程新滚动出的分段)"""
+        known = {segment.base_offset for segment in self.segments}
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith('.log') and int(name[:-4]) not in known:
+                self.segments.append(Segment(os.path.join(self.directory, name), int(name[:-4])))
+        self.segments.sort(key=lambda segment: segment.base_offset)
+        for segment in self.segments:
+            segment.refresh()
+
+    def roll(self, base_offset):
+        if self.writer is not None:
+            self.writer.close()
+        path = os.path.join(self.directory, f"{base_offset:020d}.log")
+        self.writer = open(path, 'ab')
+        self.segments.append(Segment(path, base_offset))
+
+    def append(self, record):
+        data = encode_record(record)
+        with self.lock:
+            if self.writer is None:
+                self.load_segments()
+                if self.segments:
+                    self.writer = open(self.segments[-1].path, 'ab')
+                else:
+                    self.roll(0)
+            segment = self.segments[-1]
+            if segment.size and segment.size + len(data) > SEGMENT_BYTES:
+                self.writer.flush()
+                self.roll(segment.end_offset)
+                segment = self.segments[-1]
+            offset = segment.end_offset
+            segment.positions.append(segment.size)
+            segment.size += len(data)
+            self.writer.write(data)
+            return offset
+
+    def flush(self):
+        with self.lock:
+            if self.writer is not None:
+                self.writer.flush()
+
+    def refresh(self):
+        with self.lock:
+            if self.writer is not None:
+                self.writer.flush()
+            else:
+                self.load_segments()
+
+    def end_offset(self):
+        self.refresh()
+        with self.lock:
+            return self.segments[-1].end_offset if self.segments else 0
+
+    def read(self, offset, max_records):
+        self.refresh()
+        with self.lock:
+            bases = [segment.base_offset for segment in self.segments]
+            idx = bisect.bisect_right(bases, offset) - 1
+            if idx < 0:
+                return []
+            segment = self.segments[idx]
+            start = offset - segment.base_offset
+            positions = segment.positions[start:start + max_records]
+            if not positions:
+                return []
+            end = segment.positions[start + len(positions)] if start + len(positions) < len(segment.positions) \
+                else segment.size
+        with open(segment.path, 'rb') as f:
+            f.seek(positions[0])
+            data = f.read(end - positions[0])
+        records = []
+        for position in positions:
+            pos = position - positions[0]
+            (length,) = _LENGTH.unpack_from(data, pos)
+            records.append(decode_record(data[pos + _LENGTH.size:pos + _LENGTH.size + length]))
+        return records
+
+    def close(self):
+        with self.lock:
+            if self.writer is not None:
+                self.writer.close()
+                self.writer = None
+
+
+class SegmentLog:
+    """
+    分段文件日志，目录结构:
+        DIR/<topic>/partitions              分区数
+        DIR/<topic>/<partition>/<起始offset>.log
+        DIR/<topic>/offsets-<group>.json    消费组已提交的 offset
+    """
+
+    def __init__(self, directory):
+        self.directory = os.path.abspath(directory)
+        self.partitions = {}
+        self.partition_counts = {}  # topic -> 分区数，避免每次发送都读 partitions 文件
+        self.lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def topic_dir(self, topic):
+        return os.path.join(self.directory, topic)
+
+    def create_topic(self, name, num_partitions):
+        self.partition_counts.pop(name, None)
+        meta = os.path.join(self.topic_dir(name), 'partitions')
+        if os.path.exists(meta):
+            return False
+        os.makedirs(self.topic_dir(name), exist_ok=True)
+        with open(meta, 'w', encoding='utf-8') as f:
+            f.write(str(num_partitions))
+        return True
+
+    def num_partitions(self, topic):
+        count = self.partition_counts.get(topic)
+        if count is None:
+            meta = os.path.join(self.topic_dir(topic), 'partitions')
+            if not os.path.exists(meta):
+                self.create_topic(topic, DEFAULT_PARTITIONS)
+            with open(meta, 'r', encoding='utf-8') as f:
+                count = self.partition_counts[topic] = int(f.read())
+        return count
+
+    def partition_log(self, topic, partition):
+        with self.lock:
+            key = (topic, partition)
+            if key not in self.partitions:
+                self.partitions[key] = PartitionLog(os.path.join(self.topic_dir(topic), str(partition)))
+            return self.partitions[key]
+
+    def append(self, topic, partition, record):
+        return self.partition_log(topic, partition).append(record)
+
+    def read(self, topic, partition, offset, max_records):
+        return self.partition_log(topic, partition).read(offset, max_records)
+
+    def end_offset(self, topic, partition):
+        return self.partition_log(topic, partition).end_offset()
+
+    def wait(self, timeout):
+        time.sleep(min(timeout, FILE_POLL_INTERVAL))
+
+    def offsets_file(self, group, topic):
+        return os.path.join(self.topic_dir(topic), f"offsets-{group}.json")
+
+    def committed(self, group, topic, partition):
+        path = self.offsets_file(group, topic)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return job_codec.loads(f.read()).get(str(partition))
+
+    def commit(self, group, offsets):
+        by_topic = {}
+        for (topic, partition), offset in offsets.items():
+            by_topic.setdefault(topic, {})[str(partition)] = offset
+        for topic, partitions in by_topic.items():
+            path = self.offsets_file(group, topic)
+            saved = {}
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    saved = job_codec.loads(f.read())
+            saved.update(partitions)
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(job_codec.dumps_pretty(saved))
+            os.replace(path + '.tmp', path)
+
+    def flush(self):
+        with self.lock:
+            logs = list(self.partitions.values())
+        for log in logs:
+            log.flush()
+
+    def close(self):
+        with self.lock:
+            logs = list(self.partitions.values())
+        for log in logs:
+            log.close()
+
+
+# ==================== 本地 producer ====================
+class LocalFuture:
+    """已完成的发送结果，回调在注册时立即执行 (与 kafka-python 中已完成的 future 行为相同)"""
+
+    def __init__(self, metadata):
+        self.value = metadata
+
+    def add_callback(self, f, *args, **kwargs):
+        f(*args, self.value, **kwargs)
+        return self
+
+    def add_errback(self, f, *args, **kwargs):
+        return self
+
+    def get(self, timeout=None):
+        return self.value
+
+    def succeeded(self):
+        return True
+
+    def is_done(self):
+        return True
+
+
+class LocalProducer:
+    """写本地日志的 producer，接受 KafkaProducer 的配置参数，只使用序列化器"""
+
+    def __init__(self, log, value_serializer=None, key_serializer=None, **config):
+        self.log = log
+        self.value_serializer = value_serializer
+        self.key_serializer = key_serializer
+        self.next_partition = 0
+        self.sent = 0
+        self.sent_bytes = 0
+
+    def partitions_for(self, topic):
+        return set(range(self.log.num_partitions(topic)))
+
+    def send(self, topic, value=None, key=None, headers=None, partition=None, timestamp_ms=None):
+        if self.key_serializer is not None and key is not None:
+            key = self.key_serializer(key)
+        if self.value_serializer is not None:
+            value = self.value_serializer(value)
+        num_partitions = self.log.num_partitions(topic)
+        if partition is None:
+            if key is not None:
+                partition = (murmur2(key) & 0x7fffffff) % num_partitions
+            else:
+                partition = self.next_partition % num_partitions
+                self.next_partition += 1
+        timestamp = timestamp_ms if timestamp_ms is not None else int(time.time() * 1000)
+        headers = list(headers or ())
+        offset = self.log.append(topic, partition, (timestamp, key, value, headers))
+        self.sent += 1
+        self.sent_bytes += len(value) + (len(key) if key is not None else 0)
+        return LocalFuture(RecordMetadata(
+            topic=topic, partition=partition, topic_partition=TopicPartition(topic, partition),
+            offset=offset, timestamp=timestamp, checksum=None,
+            serialized_key_size=len(key) if key is not None else -1,
+            serialized_value_size=len(value),
+            serialized_header_size=sum(len(name) + len(v) for name, v in headers),
+        ))
+
+    def flush(self, timeout=None):
+        self.log.flush()
+
+    def metrics(self, raw=False):
+        """本地日志没有请求和压缩，只提供每个 producer 的发送量"""
+        return {'producer-metrics': {'record-send-total': self.sent, 'byte-total': self.sent_bytes}}
+
+    def close(self, timeout=None):
+        self.log.flush()
+
+
+# ==================== 本地 consumer ====================
+class LocalConsumer:
+    """
+    读本地日志的 consumer: 分配订阅 topic 的全部分区，按分区轮流取记录
+    支持迭代 (consumer_timeout_ms 内没有新记录时结束)、poll、commit、position、committed
+    """
+
+    def __init__(self, log, *topics, group_id=None, key_deserializer=None, value_deserializer=None,
+                 auto_offset_reset='latest', enable_auto_commit=True, auto_commit_interval_ms=5000,
+                 max_poll_records=500, consumer_timeout_ms=float('inf'), **config):
+        self.log = log
+        self.group_id = group_id
+        self.key_deserializer = key_deserializer
+        self.value_deserializer = value_deserializer
+        self.enable_auto_commit = enable_auto_commit and group_id is not None
+        self.auto_commit_interval = auto_commit_interval_ms / 1000
+        self.max_poll_records = max_poll_records
+        self.consumer_timeout = consumer_timeout_ms / 1000
+        self.positions = {}  # 下一次读取的位置
+        for topic in topics:
+            for partition in range(log.num_partitions(topic)):
+                tp = TopicPartition(topic, partition)
+                committed = log.committed(group_id, topic, partition) if group_id is not None else None
+                if committed is None:
+                    committed = 0 if auto_offset_reset == 'earliest' else log.end_offset(topic, partition)
+                self.positions[tp] = committed
+        self.consumed = dict(self.positions)  # 已交给调用方的位置，默认提交这个位置
+        self.next_index = 0
+        self.buffer = deque()
+        self.last_commit = time.time()
+        self.closed = False
+
+    def assignment(self):
+        return set(self.positions)
+
+    def partitions_for_topic(self, topic):
+        return {tp.partition for tp in self.positions if tp.topic == topic}
+
+    def position(self, tp):
+        return self.positions[tp]
+
+    def committed(self, tp):
+        return self.log.committed(self.group_id, tp.topic, tp.partition)
+
+    def to_record(self, tp, offset, record):
+        timestamp, key, value, headers = record
+        if self.key_deserializer is not None and key is not None:
+            key = self.key_deserializer(key)
+        if self.value_deserializer is not None:
+            value = self.value_deserializer(value)
+        return LocalRecord(tp.topic, tp.partition, offset, timestamp, key, value, headers)
+
+    def fetch(self, max_records):
+        """从各分区轮流读取，最多 max_records 条，返回 {TopicPartition: [记录]}"""
+        result = {}
+        tps = sorted(self.positions)
+        remaining = max_records
+        for i in range(len(tps)):
+            if remaining <= 0:
+                break
+            tp = tps[(self.next_index + i) % len(tps)]
+            offset = self.positions[tp]
+            records = self.log.read(tp.topic, tp.partition, offset, remaining)
+            if records:
+                result[tp] = [self.to_record(tp, offset + j, r) for j, r in enumerate(records)]
+                self.positions[tp] = offset + len(records)
+                remaining -= len(records)
+        self.next_index += 1
+        return result
+
+    def fetch_wait(self, timeout_ms, max_records):
+        deadline = time.time() + timeout_ms / 1000
+        while True:
+            result = self.fetch(max_records)
+            if result or time.time() >= deadline:
+                self.maybe_auto_commit()
+                return result
+            self.log.wait(deadline - time.time())
+
+    def poll(self, timeout_ms=0, max_records=None, update_offsets=True):
+        result = self.fetch_wait(timeout_ms, max_records or self.max_poll_records)
+        for tp, records in result.items():
+            self.consumed[tp] = records[-1].offset + 1
+        return result
+
+    def maybe_auto_commit(self):
+        if self.enable_auto_commit and time.time() - self.last_commit >= self.auto_commit_interval:
+            self.commit()
+
+    def commit(self, offsets=None):
+        """提交 offset (默认为当前消费位置)，offsets 的值可以是 int 或 OffsetAndMetadata"""
+        if self.group_id is None:
+            return
+        offsets = self.consumed if offsets is None else offsets
+        self.log.commit(self.group_id, {(tp.topic, tp.partition): getattr(offset, 'offset', offset)
+                                        for tp, offset in offsets.items()})
+        self.last_commit = time.time()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        idle_since = time.time()
+        while not self.buffer:
+            batch = self.fetch_wait(min(100, self.consumer_timeout * 1000), self.max_poll_records)
+            for records in batch.values():
+                self.buffer.extend(records)
+            if not self.buffer and time.time() - idle_since >= self.consumer_timeout:
+                raise StopIteration
+        record = self.buffer.popleft()
+        self.consumed[TopicPartition(record.topic, record.partition)] = record.offset + 1
+        return record
+
+    def close(self, autocommit=True):
+        if self.closed:
+            return
+        if autocommit and self.enable_auto_commit:
+            self.commit()
+        self.closed = True
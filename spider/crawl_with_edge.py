@@ -1,7 +1,7 @@
 
 import os
+import sys
 import time
-import json
 import csv
 import random
 import logging
@@ -18,6 +18,10 @@ from selenium.webdriver.common.keys import Keys
 import config
 from database import DatabaseManager
 
+# 与清洗脚本、Kafka 生产者共用 JSON 编解码 (仓库根目录的 job_codec.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import job_codec
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -738,14 +742,14 @@ class EdgeSpider:
                                 self.db_manager.insert_job(job)
                     
                     # 检查数据大小
-                    current_json_str = json.dumps(all_jobs, ensure_ascii=False, indent=2)
+                    current_json_str = job_codec.dumps_pretty(all_jobs)
                     current_size_mb = len(current_json_str.encode('utf-8')) / (1024 * 1024)
                     logger.info(f"当前收集数据: {len(all_jobs)} 条, 大小: {current_size_mb:.2f} MB")
                     
                     # 实时保存到JSON文件
                     try:
                         with open('nowcoder_jobs_edge.json', 'w', encoding='utf-8') as f:
-                            json.dump(self.data_list, f, ensure_ascii=False, indent=2)
+                            f.write(job_codec.dumps_pretty(self.data_list))
                         logger.info(f"实时保存: {len(self.data_list)} 条数据已写入 nowcoder_jobs_edge.json")
                     except Exception as e:
                         logger.warning(f"实时保存失败: {str(e)}")
@@ -899,7 +903,7 @@ class EdgeSpider:
                             # 实时保存
                             try:
                                 with open('nowcoder_jobs_edge.json', 'w', encoding='utf-8') as f:
-                                    json.dump(self.data_list, f, ensure_ascii=False, indent=2)
+                                    f.write(job_codec.dumps_pretty(self.data_list))
                             except Exception as e:
                                 logger.warning(f"保存失败: {str(e)}")
                             
@@ -1057,7 +1061,7 @@ class EdgeSpider:
         
         try:
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.data_list, f, ensure_ascii=False, indent=2)
+                f.write(job_codec.dumps_pretty(self.data_list))
             logger.info(f"数据已保存到 {filename}，共 {len(self.data_list)} 条")
         except Exception as e:
             logger.error(f"保存JSON失败: {str(e)}")
@@ -0,0 +1,214 @@
+import io
+import json
+import subprocess
+import sys
+
+import pytest
+
+import clean_nowcoder_jobs as cleaner
+
+
+def make_job(i, **overrides):
+    job = {
+        '岗位名称': f'Java后端开发工程师{i}',
+        '公司名称': '字节跳动',
+        '薪资': '20-30K·15薪',
+        '学历要求': '本科',
+        '城市': '北京',
+        '职位类型': '后端开发',
+        '职位描述': f'负责后端服务开发，{i % 50}位牛友收藏',
+        'job_id': str(100000 + i),
+    }
+    job.update(overrides)
+    return job
+
+
+def write_ndjson(path, lines):
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+@pytest.fixture
+def corrupt_ndjson(tmp_path):
+    """201 行 NDJSON，第 101 行损坏"""
+    lines = [json.dumps(make_job(i), ensure_ascii=False) for i in range(201)]
+    lines[100] = lines[100][:-10]
+    path = tmp_path / 'jobs.ndjson'
+    write_ndjson(path, lines)
+    return path
+
+
+def test_iter_records_reports_corrupt_line(corrupt_ndjson):
+    records = cleaner.iter_records(str(corrupt_ndjson))
+    for _ in range(100):
+        next(records)
+    with pytest.raises(cleaner.InputFormatError) as excinfo:
+        next(records)
+    assert excinfo.value.lineno == 101
+    assert str(corrupt_ndjson) in str(excinfo.value)
+
+
+@pytest.mark.parametrize('chunk_size', [1 << 20, 97])
+def test_iter_records_reports_corrupt_array_element(tmp_path, monkeypatch, chunk_size):
+    # 小的读取块让出错位置落在多次丢弃缓冲区之后，检查行号的累计
+    monkeypatch.setattr(cleaner, 'READ_CHUNK_SIZE', chunk_size)
+    jobs = [make_job(i) for i in range(50)]
+    text = json.dumps(jobs, ensure_ascii=False, indent=2)
+    lines = text.split('\n')
+    bad = next(i for i, line in enumerate(lines) if '"job_id": "100030"' in line)
+    lines[bad] = '    "job_id": 100030x'
+    path = tmp_path / 'jobs.json'
+    path.write_text('\n'.join(lines), encoding='utf-8')
+    with pytest.raises(cleaner.InputFormatError) as excinfo:
+        list(cleaner.iter_records(str(path)))
+    assert excinfo.value.lineno == bad + 1
+
+
+def test_corrupt_array_element_fails_without_reading_ahead(monkeypatch):
+    monkeypatch.setattr(cleaner, 'READ_CHUNK_SIZE', 4096)
+    jobs = [make_job(i) for i in range(2000)]
+    text = json.dumps(jobs, ensure_ascii=False, indent=2).replace('"job_id": "100002"', '"job_id": 100002x', 1)
+    f = io.StringIO(text)
+    f.read(1)
+    with pytest.raises(cleaner.InputFormatError):
+        list(cleaner._iter_json_array(f, 'jobs.json'))
+    # 损坏的元素在开头，报错前只读取了第一块，而不是整个文件
+    assert f.tell() == 1 + 4096
+
+
+def test_cli_exits_non_zero_on_corrupt_input(corrupt_ndjson, tmp_path):
+    result = subprocess.run(
+        [sys.executable, cleaner.__file__, '--input', str(corrupt_ndjson),
+         '--output', str(tmp_path / 'out.json'), '--high-value', str(tmp_path / 'high.json'),
+         '--report', str(tmp_path / 'report.json')],
+        cwd=tmp_path, capture_output=True, text=True)
+    assert result.returncode != 0
+    assert '第 101 行' in result.stdout
+
+
+def test_parallel_output_matches_serial(tmp_path, monkeypatch):
+    monkeypatch.setattr(cleaner, 'PARALLEL_CHUNK_SIZE', 97)
+    monkeypatch.setattr(cleaner.os, 'cpu_count', lambda: 4)  # 单核机器上也走多进程路径
+    descs = ['负责后端服务开发，工作地点上海，硕士优先，20位牛友收藏', '字节跳动招聘，今日活跃', '', '负责数据平台建设']
+    jobs = [make_job(i % 900, 公司名称=['字节跳动', '某公司', ''][i % 3], 城市='' if i % 4 else '北京',
+                     薪资=['20-30K·15薪', '200-300元/天', '面议', ''][i % 4], 职位描述=descs[i % 4])
+            for i in range(1000)]
+    write_ndjson(tmp_path / 'in.ndjson', [json.dumps(job, ensure_ascii=False) for job in jobs])
+
+    def run(workers):
+        out, high = tmp_path / f'out{workers}.ndjson', tmp_path / f'high{workers}.ndjson'
+        report, stats = cleaner.run_pipeline(str(tmp_path / 'in.ndjson'), str(out), str(high),
+                                             str(tmp_path / 'report.json'), workers=workers)
+        return out.read_bytes(), high.read_bytes(), stats, report['pattern_hits']
+
+    serial, parallel = run(1), run(2)
+    assert parallel == serial
+    assert serial[2]['duplicate_id'] == 100
+
+
+@pytest.mark.parametrize('output_name', ['out.json', 'out.ndjson'])
+def test_incremental_changed_record_replaces_previous_version(tmp_path, output_name):
+    paths = {name: str(tmp_path / name) for name in ('in.ndjson', output_name, 'high.' + output_name.split('.')[1],
+                                                     'report.json', 'state.db')}
+    input_file, output_file, high_file, report_file, state_file = paths.values()
+
+    def run(jobs):
+        write_ndjson(tmp_path / 'in.ndjson', [json.dumps(job, ensure_ascii=False) for job in jobs])
+        return cleaner.run_pipeline(input_file, output_file, high_file, report_file, state_file=state_file)
+
+    def job(i, **overrides):
+        return make_job(i, 职位描述='负责后端服务开发，20位牛友收藏', **overrides)  # 高收藏，同时写入高价值文件
+
+    jobs = [job(i) for i in range(5)]
+    run(jobs)
+    # 第二次运行: 100000 薪资变化，新增 100005，其余不变
+    jobs[0] = job(0, 薪资='30-40K·16薪')
+    _, stats = run(jobs + [job(5)])
+
+    assert stats['incremental_changed'] == 1
+    assert stats['incremental_new'] == 1
+    assert stats['incremental_unchanged'] == 4
+    assert stats['incremental_superseded'] == 1
+    assert stats['duplicate_content_warning'] == 0
+
+    rows = list(cleaner.iter_records(output_file))
+    assert sorted(row['job_id'] for row in rows) == [str(100000 + i) for i in range(6)]
+    changed = [row for row in rows if row['job_id'] == '100000']
+    assert changed[0]['薪资'] == '30-40K·16薪'
+    # 高价值文件同样只保留新版本
+    high = {row['job_id']: row for row in cleaner.iter_records(high_file)}
+    assert len(high) == 6
+    assert high['100000']['薪资'] == '30-40K·16薪'
+
+
+@pytest.mark.parametrize('output_name', ['out.json', 'out.ndjson'])
+def test_incremental_rerun_after_aborted_run(tmp_path, output_name):
+    input_path = tmp_path / 'in.ndjson'
+    output_file, high_file = str(tmp_path / output_name), str(tmp_path / ('high.' + output_name.split('.')[1]))
+    state_file = str(tmp_path / 'state.db')
+
+    def run(lines):
+        write_ndjson(input_path, lines)
+        return cleaner.run_pipeline(str(input_path), output_file, high_file, str(tmp_path / 'report.json'),
+                                    state_file=state_file)
+
+    jobs = [make_job(i) for i in range(5)]
+    run([json.dumps(job, ensure_ascii=False) for job in jobs])
+    before = (tmp_path / output_name).read_bytes()
+    # 第二次运行: 100000 薪资变化、新增 100005，但在末尾的损坏行处中止
+    jobs[0] = make_job(0, 薪资='40-50K')
+    lines = [json.dumps(job, ensure_ascii=False) for job in jobs + [make_job(5)]]
+    with pytest.raises(cleaner.InputFormatError):
+        run(lines + ['{"job_id": '])
+    assert (tmp_path / output_name).read_bytes() == before
+    # 修正输入后重新运行，变化和新增的记录都重新处理
+    _, stats = run(lines)
+
+    assert stats['incremental_changed'] == 1
+    assert stats['incremental_new'] == 1
+    assert stats['incremental_unchanged'] == 4
+    rows = list(cleaner.iter_records(output_file))
+    assert sorted(row['job_id'] for row in rows) == [str(100000 + i) for i in range(6)]
+    assert next(row for row in rows if row['job_id'] == '100000')['薪资'] == '40-50K'
+
+
+@pytest.mark.parametrize('mode', ['flag', 'drop'])
+def test_near_dup_clusters_file(tmp_path, mode):
+    desc = '负责推荐系统后端服务的设计与开发，参与高并发架构优化，熟悉 Java 与分布式系统，3位牛友收藏'
+    jobs = [make_job(0, 职位描述=desc), make_job(1, 岗位名称='Java后端开发工程师0', 职位描述=desc + '。'),
+            make_job(2, 职位描述='负责数据平台建设')]
+    write_ndjson(tmp_path / 'in.ndjson', [json.dumps(job, ensure_ascii=False) for job in jobs])
+    clusters_file = tmp_path / 'clusters.json'
+    _, stats = cleaner.run_pipeline(str(tmp_path / 'in.ndjson'), str(tmp_path / 'out.ndjson'),
+                                    str(tmp_path / 'high.ndjson'), str(tmp_path / 'report.json'),
+                                    near_dup=mode, clusters_file=str(clusters_file))
+
+    assert stats['near_duplicate'] == 1
+    assert json.loads(clusters_file.read_text(encoding='utf-8')) == [
+        {'representative': '100000', 'members': ['100001'], 'size': 2}]
+    rows = list(cleaner.iter_records(str(tmp_path / 'out.ndjson')))
+    assert len(rows) == (3 if mode == 'flag' else 2)
+
+
+@pytest.mark.parametrize('desc, company', [
+    ('欢迎加入中国移动研究院', '中国移动'),  # 取最长的别名
+    ('招商银行信用卡中心招聘', '招商'),  # 同长取最靠前
+    ('base 深圳，vivo 影像团队', 'vivo'),
+    ('VIVO 影像团队', None),  # 别名区分大小写
+])
+def test_description_company_candidate(desc, company):
+    assert cleaner.extract_from_description(desc).get('company_candidate') == company
+
+
+def test_job_cleaners_do_not_share_state(tmp_path):
+    company_dict = tmp_path / 'companies.txt'
+    company_dict.write_text('抖音集团,抖音\n', encoding='utf-8')
+    first = cleaner.JobCleaner()
+    first.clean_batch([make_job(0)])
+    # 第二个清洗器使用另一份别名词典，不应影响第一个的公司解析、缓存和统计
+    second = cleaner.JobCleaner(company_dict=str(company_dict))
+    job = make_job(1, 公司名称='独角兽企业', 职位描述='加入抖音，负责后端开发')
+    assert first.clean_batch([job])[0]['公司名称'] == '未知'
+    assert second.clean_batch([job])[0]['公司名称'] == '抖音集团'
+    assert first.report()['timings']['extract_salary']['calls'] == 2
+    assert first.report()['memo']['extract_salary']['hits'] == 1
+    assert second.report()['timings']['extract_salary']['calls'] == 1
@@ -0,0 +1,30 @@
+import pytest
+
+import job_codec
+
+BACKENDS = [name for name, module in (('orjson', job_codec.orjson), ('msgspec', job_codec.msgspec))
+            if module is not None] + ['json']
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, monkeypatch):
+    monkeypatch.setattr(job_codec, 'BACKEND', request.param)
+    return request.param
+
+
+def test_dumps_fallback_is_valid_utf8(backend):
+    # 加速后端不支持的值 (超出 64 位的整数、孤立代理字符) 回退到标准库
+    job = {'job_id': 2 ** 70, '岗位名称': '后端开发\ud800'}
+    data = job_codec.dumps(job)
+    data.decode('utf-8')
+    assert job_codec.loads(data) == job
+
+
+@pytest.mark.parametrize('value', [2 ** 64, -2 ** 63 - 1, 2 ** 100])
+def test_loads_keeps_big_integers(backend, value):
+    assert job_codec.loads(f'{{"job_id": [{value}], "x": 1.5}}'.encode()) == {'job_id': [value], 'x': 1.5}
+
+
+def test_loads_rejects_corrupt_input(backend):
+    with pytest.raises(job_codec.DecodeError):
+        job_codec.loads(b'{"job_id": ')
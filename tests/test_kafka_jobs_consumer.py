@@ -0,0 +1,40 @@
+import pytest
+
+import kafka_jobs_consumer as consumer_app
+import kafka_jobs_producer as producer_app
+import kafka_transport
+from clean_nowcoder_jobs import JobCleaner
+
+
+@pytest.fixture
+def envelope_topic(monkeypatch):
+    """信封模式 round-robin 发送 600 条记录 (400 个不同的 job_id)，重复的 job_id 分散在不同分区"""
+    transport = kafka_transport.from_spec('memory', producer_app.KAFKA_SERVERS)
+    for module in (producer_app, consumer_app):
+        monkeypatch.setattr(module, 'TRANSPORT', transport)
+        monkeypatch.setattr(module, 'TOPIC_NAME', 'test_jobs')
+    monkeypatch.setattr(producer_app, 'stats', producer_app.ProducerStats())
+    monkeypatch.setattr(producer_app, 'checkpoint', producer_app.Checkpoint())
+    jobs = [{'job_id': str(100000 + i % 400), '岗位名称': f'后端开发{i % 400}', '公司名称': '字节跳动',
+             '城市': '北京', '薪资': '20-30K·15薪', '职位描述': '负责后端服务开发'} for i in range(600)]
+    producer_app.create_topic_if_not_exists()
+    producer_app.send_serial(producer_app.iter_chunks(jobs, 100), 0, producer_app.PARTITIONERS['round-robin'](3),
+                             envelope=50)
+    return jobs
+
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_parallel_clean_dedups_across_partitions(envelope_topic, processes):
+    consumer = consumer_app.create_consumer(from_beginning=True, auto_commit=False)
+    workers = [consumer_app.PartitionWorker(i, True, False, processes) for i in range(3)]
+    cleaner = JobCleaner()
+    try:
+        count = consumer_app.consume_parallel(consumer, workers, {}, cleaner, timeout=0.2)
+    finally:
+        for worker in workers:
+            worker.close()
+        consumer.close()
+    assert count == 600
+    assert sum(len(w.partitions) for w in workers) == 3
+    assert cleaner.output_count == 400
+    assert cleaner.stats['duplicate_id'] == 200
@@ -0,0 +1,91 @@
+import pytest
+
+import kafka_jobs_producer as producer_app
+import kafka_transport
+
+
+def make_jobs(n):
+    # 每 7 条一条没有 job_id / 城市的记录，hash 与 city 策略会对其轮询
+    return [{'job_id': None if i % 7 == 0 else str(100000 + i), '城市': '' if i % 7 == 0 else ['北京', '上海'][i % 2],
+             '岗位名称': f'后端开发{i}'} for i in range(n)]
+
+
+def partitions(encoded_chunks, envelope):
+    if envelope > 0:
+        return [(partition, len(indices)) for _, encoded in encoded_chunks for _, partition, indices in encoded]
+    return [partition for _, encoded in encoded_chunks for _, _, partition in encoded]
+
+
+@pytest.mark.parametrize('name', sorted(producer_app.PARTITIONERS))
+@pytest.mark.parametrize('envelope', [0, 30])
+def test_parallel_encoding_matches_serial_partitions(name, envelope):
+    chunks = list(producer_app.iter_chunks(iter(make_jobs(1000)), 100))
+    serial = producer_app.iter_encoded(chunks, 0, producer_app.PARTITIONERS[name](3), envelope)
+    parallel = producer_app.iter_encoded(chunks, 2, producer_app.PARTITIONERS[name](3), envelope)
+    assert partitions(parallel, envelope) == partitions(serial, envelope)
+
+
+@pytest.fixture
+def memory_transport(monkeypatch):
+    monkeypatch.setattr(producer_app, 'TRANSPORT', kafka_transport.from_spec('memory', producer_app.KAFKA_SERVERS))
+    monkeypatch.setattr(producer_app, 'TOPIC_NAME', 'test_jobs')
+
+
+def test_load_profile_ignores_other_transport(tmp_path, monkeypatch, memory_transport):
+    path = str(tmp_path / 'profile.json')
+    settings = producer_app.current_settings()
+    producer_app.save_profile(path, 0, settings, {}, [])
+    assert producer_app.load_profile(path) == settings
+    # 在 memory 传输上测得的配置不用于真实集群
+    monkeypatch.setattr(producer_app, 'TRANSPORT', kafka_transport.from_spec('kafka', producer_app.KAFKA_SERVERS))
+    assert producer_app.load_profile(path) is None
+
+
+def test_run_trial_counts_into_given_stats(monkeypatch, memory_transport):
+    monkeypatch.setattr(producer_app, 'checkpoint', producer_app.Checkpoint())
+    global_stats = producer_app.stats
+    trial_stats = producer_app.ProducerStats()
+    result = producer_app.run_trial(make_jobs(200), producer_app.current_settings(), producer_app.PARTITIONERS['hash'](3),
+                                    trial_stats)
+    assert result['failed'] == 0
+    assert trial_stats.get_counts() == (200, 0)
+    assert producer_app.stats is global_stats
+    assert global_stats.get_counts() == (0, 0)
+
+
+def test_autotune_searches_only_chunk_size_on_local_transport(tmp_path, monkeypatch, memory_transport):
+    monkeypatch.setattr(producer_app, 'checkpoint', producer_app.Checkpoint())
+    tried = []
+    monkeypatch.setattr(producer_app, 'run_trial', lambda sample, settings, *args: tried.append(settings) or {
+        'settings': dict(settings), 'records_per_s': 1.0, 'p50_ms': None, 'p99_ms': None})
+    default = producer_app.current_settings()
+    producer_app.autotune(make_jobs(10), producer_app.PARTITIONERS['hash'](3), profile_file=str(tmp_path / 'p.json'))
+    for settings in tried:
+        assert {k: v for k, v in settings.items() if k != 'chunk_size'} == \
+            {k: v for k, v in default.items() if k != 'chunk_size'}
+    assert {settings['chunk_size'] for settings in tried} >= set(producer_app.AUTOTUNE_GRID['chunk_size'])
+
+
+def test_checkpoint_advances_up_to_first_failure():
+    checkpoint = producer_app.Checkpoint()
+    checkpoint.start(None, None, 0)
+    checkpoint.ack(2)
+    checkpoint.ack(6)
+    checkpoint.fail(4)
+    checkpoint.fail(5)
+    checkpoint.ack(1)
+    assert checkpoint.watermark == 0
+    # 失败之前的确认乱序到达，水位照常前移，停在第一条失败的记录处
+    checkpoint.ack(0)
+    checkpoint.ack(3)
+    checkpoint.ack(7)
+    assert checkpoint.watermark == 4
+    assert checkpoint.failed
+    # 后到的、位置更早的失败同样生效
+    checkpoint.start(None, None, 0)
+    checkpoint.ack(1)
+    checkpoint.ack(3)
+    checkpoint.fail(4)
+    checkpoint.fail(2)
+    checkpoint.ack(0)
+    assert checkpoint.watermark == 2